@@ -0,0 +1,263 @@
+# analytics/_queries.py
+"""
+GraphQL documents used by TokenAnalytics and TransfersAnalytics
+
+The documents are constants and every per-call value is passed as a
+variable, so the query text never changes between calls and the
+subgraph can reuse its parsed/validated form.
+"""
+
+Q_TOKEN_INFO = """
+query TokenInfo($token: ID!) {
+  token(id: $token) {
+    symbol
+    name
+    decimals
+    derivedETH
+  }
+}
+"""
+
+# The two most recent daily aggregates are enough for a rolling 24h figure
+Q_VOLUME_24H = """
+query Volume24h($token: String!) {
+  tokenDayDatas(
+    first: 2,
+    orderBy: date,
+    orderDirection: desc,
+    where: { token: $token }
+  ) {
+    date
+    volumeUSD
+  }
+}
+"""
+
+# tokenDayDatas selections: price-only for charts and volume stats, and
+# with the daily OHLC candle for callers that read open/high/low/close
+DAY_FIELDS = """
+    date
+    priceUSD
+    volumeUSD"""
+DAY_FIELDS_OHLC = DAY_FIELDS + """
+    open
+    high
+    low
+    close"""
+
+# Day range [since, until) so closed days and the current day can be
+# fetched (and cached) separately
+_PRICE_HISTORY = """
+query PriceHistory($token: String!, $since: Int!, $until: Int!, $days: Int!) {
+  tokenDayDatas(
+    first: $days,
+    orderBy: date,
+    orderDirection: desc,
+    where: {
+      token: $token,
+      date_gte: $since,
+      date_lt: $until
+    }
+  ) {%s
+  }
+}
+"""
+Q_PRICE_HISTORY = _PRICE_HISTORY % DAY_FIELDS
+Q_PRICE_HISTORY_OHLC = _PRICE_HISTORY % DAY_FIELDS_OHLC
+
+Q_FALLBACK_PRICE = """
+query CurrentPrice($token: ID!) {
+  token(id: $token) {
+    derivedETH
+    tokenDayData(first: 1, orderBy: date, orderDirection: desc) {
+      priceUSD
+    }
+  }
+}
+"""
+
+# Swaps are fetched per token position, so every row carries only the
+# amount of the analysed token instead of nested token0/token1 objects.
+# Pages are walked backwards in time with $before as the keyset cursor.
+Q_TOP_TRADERS_TOKEN0 = """
+query TopTradersToken0($token: String!, $since: BigInt!, $before: BigInt!) {
+  swaps(
+    first: 1000,
+    orderBy: timestamp,
+    orderDirection: desc,
+    where: {
+      timestamp_gte: $since,
+      timestamp_lte: $before,
+      token0: $token
+    }
+  ) {
+    id
+    timestamp
+    origin
+    amountUSD
+    amount0
+  }
+}
+"""
+
+Q_TOP_TRADERS_TOKEN1 = """
+query TopTradersToken1($token: String!, $since: BigInt!, $before: BigInt!) {
+  swaps(
+    first: 1000,
+    orderBy: timestamp,
+    orderDirection: desc,
+    where: {
+      timestamp_gte: $since,
+      timestamp_lte: $before,
+      token1: $token
+    }
+  ) {
+    id
+    timestamp
+    origin
+    amountUSD
+    amount1
+  }
+}
+"""
+
+Q_TRADER_PNL = """
+query TraderPnl($trader: Bytes!, $token: String!, $since: BigInt!) {
+  swaps(
+    first: 1000,
+    where: {
+      origin: $trader,
+      timestamp_gte: $since,
+      or: [
+        { token0: $token },
+        { token1: $token }
+      ]
+    }
+  ) {
+    amountUSD
+    amount0
+    amount1
+    token0 {
+      id
+    }
+    token1 {
+      id
+    }
+  }
+}
+"""
+
+# One document with three aliased root fields, so a full report costs a
+# single round-trip instead of three
+_REPORT_BUNDLE = """
+query TokenReport($token: String!, $since7d: BigInt!, $historyStart: Int!,
+                  $days: Int!) {
+  vol: tokenDayDatas(
+    first: 2,
+    orderBy: date,
+    orderDirection: desc,
+    where: { token: $token }
+  ) {
+    date
+    volumeUSD
+  }
+  hist: tokenDayDatas(
+    first: $days,
+    orderBy: date,
+    orderDirection: desc,
+    where: {
+      token: $token,
+      date_gte: $historyStart
+    }
+  ) {%s
+  }
+  traders0: swaps(
+    first: 1000,
+    orderBy: timestamp,
+    orderDirection: desc,
+    where: {
+      timestamp_gte: $since7d,
+      token0: $token
+    }
+  ) {
+    id
+    timestamp
+    origin
+    amountUSD
+    amount0
+  }
+  traders1: swaps(
+    first: 1000,
+    orderBy: timestamp,
+    orderDirection: desc,
+    where: {
+      timestamp_gte: $since7d,
+      token1: $token
+    }
+  ) {
+    id
+    timestamp
+    origin
+    amountUSD
+    amount1
+  }
+}
+"""
+Q_REPORT_BUNDLE = _REPORT_BUNDLE % DAY_FIELDS
+Q_REPORT_BUNDLE_OHLC = _REPORT_BUNDLE % DAY_FIELDS_OHLC
+
+
+# Transfers in a block range, with and without a wallet filter. The
+# wallet variant repeats the token/block filters inside each `or` branch
+# because graph-node does not accept `or` next to column filters. Page
+# size and direction are variables so callers that only want the latest
+# few rows don't download a full page; $skip counts the rows of the
+# cursor block already returned by earlier pages.
+_TRANSFER_FIELDS = """
+    id
+    from
+    to
+    value
+    blockNumber
+    timestamp
+    transaction {
+      id
+    }"""
+
+Q_TRANSFERS = """
+query Transfers($token: String!, $fromBlock: BigInt!, $toBlock: BigInt!,
+                $first: Int!, $skip: Int!, $direction: OrderDirection!) {
+  transfers(
+    first: $first,
+    skip: $skip,
+    orderBy: blockNumber,
+    orderDirection: $direction,
+    where: {
+      token: $token,
+      blockNumber_gte: $fromBlock,
+      blockNumber_lte: $toBlock
+    }
+  ) {%s
+  }
+}
+""" % _TRANSFER_FIELDS
+
+Q_WALLET_TRANSFERS = """
+query WalletTransfers($token: String!, $fromBlock: BigInt!, $toBlock: BigInt!,
+                      $wallet: String!, $first: Int!, $skip: Int!,
+                      $direction: OrderDirection!) {
+  transfers(
+    first: $first,
+    skip: $skip,
+    orderBy: blockNumber,
+    orderDirection: $direction,
+    where: {
+      or: [
+        { token: $token, blockNumber_gte: $fromBlock, blockNumber_lte: $toBlock, from: $wallet },
+        { token: $token, blockNumber_gte: $fromBlock, blockNumber_lte: $toBlock, to: $wallet }
+      ]
+    }
+  ) {%s
+  }
+}
+""" % _TRANSFER_FIELDS
@@ -1,33 +1,55 @@
 from analytics.token_analytics import TokenAnalytics
 from analytics.wallet_analytics import WalletAnalytics
 from utils.hybrid_fetcher import HybridDataFetcher
+import asyncio
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend, no GUI initialisation
 import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 
 class AnalyticsDashboard:
     def __init__(self):
         self.token_analytics = TokenAnalytics()
         self.wallet_analytics = WalletAnalytics()
+        # Price chart figure, created on first use and reused afterwards
+        self._fig = None
+        self._ax = None
     
-    def generate_token_report(self, token_address: str):
+    async def generate_token_report(self, token_address: str):
         """Generate comprehensive token report"""
+        # Volume, price history and top traders share one subgraph round-trip,
+        # which overlaps with the token info lookup
+        info, bundle = await asyncio.gather(
+            self.token_analytics.aget_token_info(token_address),
+            self.token_analytics.aget_report_bundle(token_address, days=7),
+            return_exceptions=True
+        )
+        symbol = info['symbol'] if isinstance(info, dict) else 'Unknown'
+        
         print(f"\n=== Token Analytics Report ===")
-        print(f"Token: {token_address}")
+        print(f"Token: {symbol} ({token_address})")
         print(f"Generated: {datetime.now()}\n")
         
+        volume_24h = bundle['volume_24h']
+        price_df = bundle['price_history']
+        top_traders = bundle['top_traders']
+        
         # 24h Volume
-        volume_24h = self.token_analytics.get_token_volume_24h(token_address)
         print(f"24h Volume: ${volume_24h:,.2f}")
+        if bundle['current_price'] is not None:
+            print(f"Price: ${bundle['current_price']:,.4f}")
         
         # Price history
-        price_df = self.token_analytics.get_price_history(token_address, days=7)
         self._plot_price_history(price_df, token_address)
         
         # Top traders
-        top_traders = self.token_analytics.get_top_traders(token_address)
         print("\nTop 10 Traders:")
         for i, trader in enumerate(top_traders, 1):
-            print(f"{i}. {trader['address']}: ${trader['volume']:,.2f}")
+            print(f"{i}. {trader['address']}: ${trader['total_volume_usd']:,.2f}")
+        
+        self._save_snapshot(price_df, top_traders, token_address)
     
     def generate_wallet_report(self, wallet_address: str):
         """Generate wallet activity report"""
@@ -35,20 +57,43 @@ class AnalyticsDashboard:
         pass
     
     def _plot_price_history(self, df, token_address):
-        """Create price chart"""
-        plt.figure(figsize=(12, 6))
-        plt.plot(df['timestamp'], df['price'])
-        plt.title(f'Price History - {token_address[:10]}...')
-        plt.xlabel('Date')
-        plt.ylabel('Price (USD)')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(f'reports/price_history_{token_address}.png')
-        plt.close()
+        """Create price chart (skipped when there is no day data to plot)"""
+        if df is None or df.empty:
+            return
+        
+        if self._fig is None:
+            self._fig, self._ax = plt.subplots(figsize=(12, 6))
+        ax = self._ax
+        ax.clear()
+        
+        ax.plot(df['timestamp'], df['price_usd'])
+        ax.set_title(f'Price History - {token_address[:10]}...')
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Price (USD)')
+        ax.tick_params(axis='x', labelrotation=45)
+        self._fig.tight_layout()
+        
+        Path('reports').mkdir(exist_ok=True)
+        self._fig.savefig(f'reports/price_history_{token_address}.png', dpi=90)
+
+    def _save_snapshot(self, price_df, top_traders, token_address):
+        """
+        Write the report data as CSV for programmatic consumers
+        
+        Files are bucketed per UTC day (reports/{token}_{date}_*.csv), so
+        repeated reports on the same day overwrite one snapshot.
+        """
+        Path('reports').mkdir(exist_ok=True)
+        prefix = f"reports/{token_address.lower()}_{datetime.now(timezone.utc):%Y-%m-%d}"
+        
+        if not price_df.empty:
+            price_df.to_csv(f"{prefix}_prices.csv", index=False)
+        if top_traders:
+            pd.DataFrame(top_traders).to_csv(f"{prefix}_traders.csv", index=False)
 
 if __name__ == "__main__":
     dashboard = AnalyticsDashboard()
     
     # Example: Analyze USDC
     USDC = "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"
-    dashboard.generate_token_report(USDC)
+    asyncio.run(dashboard.generate_token_report(USDC))
@@ -1,81 +1,456 @@
 # analytics/token_analytics.py
-from utils.graph_helper import GraphClient
-from datetime import datetime, timedelta
+import asyncio
+from utils.graph_helper import GraphClient, CachedGraphClient
+from analytics._queries import (
+    Q_TOKEN_INFO, Q_VOLUME_24H, Q_PRICE_HISTORY, Q_PRICE_HISTORY_OHLC, Q_FALLBACK_PRICE,
+    Q_TOP_TRADERS_TOKEN0, Q_TOP_TRADERS_TOKEN1, Q_TRADER_PNL,
+    Q_REPORT_BUNDLE, Q_REPORT_BUNDLE_OHLC
+)
+from datetime import datetime
+import time
+import numpy as np
 import pandas as pd
-from typing import List, Dict
-from collections import defaultdict
+from typing import List, Dict, Optional
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+
+# GraphClients created by TokenAnalytics, keyed by (url, enable_cache, ttl)
+_SHARED_CLIENTS: Dict[tuple, GraphClient] = {}
+
+# tokenDayDatas fields selected by the price-only and OHLC price queries
+PRICE_HISTORY_FIELDS = ['date', 'priceUSD', 'volumeUSD']
+PRICE_OHLC_FIELDS = PRICE_HISTORY_FIELDS + ['open', 'high', 'low', 'close']
+OHLC_COLUMNS = ['open', 'high', 'low', 'close']
+
+# Subgraph page size and the cap on swaps scanned per token side
+SWAPS_PAGE_SIZE = 1000
+MAX_SWAPS_PER_SIDE = 10000
+
+# How long a prefetched report bundle answers the individual getters
+PREFETCH_TTL_SECONDS = 60
+
+
+def _window_start(days: int, granularity: int, now: Optional[float] = None) -> int:
+    """
+    Start of a lookback window, snapped down to a granularity boundary
+
+    Snapping keeps the query variables (and so the cache key) identical for
+    every call within the same hour/day instead of changing each second.
+
+    Args:
+        days: Length of the window in days
+        granularity: Boundary to snap to in seconds (hour or day)
+        now: Reference unix timestamp (defaults to the current time)
+
+    Returns:
+        Unix timestamp of the window start
+    """
+    if now is None:
+        now = datetime.now().timestamp()
+    return int(now) // granularity * granularity - days * SECONDS_PER_DAY
+
+
+def _merge_swap_page(rows: List[Dict], seen_ids: set, page: List[Dict]) -> Optional[str]:
+    """
+    Append the unseen rows of a swaps page and work out the next cursor
+
+    Pages are ordered by timestamp desc and bounded by timestamp_lte, so
+    swaps sharing the boundary second show up twice and are skipped by id.
+
+    Args:
+        rows: Collected swap rows (extended in place)
+        seen_ids: Ids of the collected rows (updated in place)
+        page: Swap rows returned by the last query
+
+    Returns:
+        The $before cursor for the next page, or None when the scan is done
+    """
+    added = 0
+    for row in page:
+        if row['id'] not in seen_ids:
+            seen_ids.add(row['id'])
+            rows.append(row)
+            added += 1
+
+    if len(page) < SWAPS_PAGE_SIZE or added == 0 or len(rows) >= MAX_SWAPS_PER_SIDE:
+        return None
+    return page[-1]['timestamp']
+
+
+def _aggregate_volume(day_data: List[Dict], now: Optional[float] = None) -> float:
+    """
+    Approximate a rolling 24h volume from the newest tokenDayDatas rows
+
+    The current (partial) day counts in full; a finished day is weighted by
+    the share of it that still falls inside the last 24 hours.
+
+    Args:
+        day_data: tokenDayDatas rows with date and volumeUSD
+        now: Reference unix timestamp (defaults to the current time)
+
+    Returns:
+        Volume in USD over the last 24 hours
+    """
+    if now is None:
+        now = datetime.now().timestamp()
+    window_start = now - SECONDS_PER_DAY
+
+    total_volume = 0.0
+    for day in day_data:
+        day_end = int(day['date']) + SECONDS_PER_DAY
+        weight = min(1.0, max(0.0, (day_end - window_start) / SECONDS_PER_DAY))
+        total_volume += float(day['volumeUSD']) * weight
+    return total_volume
+
+
+def _aggregate_price_history(day_data: List[Dict], ohlc: bool = False) -> pd.DataFrame:
+    """
+    Build the price history DataFrame from already-fetched tokenDayDatas rows
+
+    Args:
+        day_data: tokenDayDatas rows (date, priceUSD, volumeUSD, plus OHLC
+            when ohlc is True)
+        ohlc: Whether the rows carry open/high/low/close
+
+    Returns:
+        DataFrame with columns: timestamp, date, price_usd, volume_usd
+        (and open, high, low, close if ohlc), sorted by date ascending
+    """
+    fields = PRICE_OHLC_FIELDS if ohlc else PRICE_HISTORY_FIELDS
+    
+    # Lock the column order up front and convert all numeric columns in one cast
+    df = pd.DataFrame(day_data, columns=fields)
+    df[fields[1:]] = df[fields[1:]].astype('float64')
+    df = df.rename(columns={'priceUSD': 'price_usd', 'volumeUSD': 'volume_usd'})
+
+    # Convert timestamp to datetime
+    df['timestamp'] = pd.to_datetime(df['date'], unit='s')
+    df['date'] = df['timestamp'].dt.date
+
+    # Sort by date ascending
+    df = df.sort_values('timestamp')
+
+    # Select relevant columns
+    columns = ['timestamp', 'date', 'price_usd', 'volume_usd']
+    return df[columns + OHLC_COLUMNS if ohlc else columns]
+
+
+def _aggregate_top_traders(swaps_token0: List[Dict], swaps_token1: List[Dict],
+                           limit: int = 10) -> List[Dict]:
+    """
+    Aggregate already-fetched swaps into per-trader volume stats
+
+    Args:
+        swaps_token0: Swaps where the token is token0 (origin, amountUSD, amount0)
+        swaps_token1: Swaps where the token is token1 (origin, amountUSD, amount1)
+        limit: Number of top traders to return
+
+    Returns:
+        List of dicts containing trader info: address, total_volume_usd, trade_count,
+        buy_volume_usd, sell_volume_usd
+    """
+    if not swaps_token0 and not swaps_token1:
+        return []
+
+    rows = swaps_token0 + swaps_token1
+    volume = np.array([swap['amountUSD'] for swap in rows]).astype('float64')
+
+    # Signed amount of the analysed token: positive means the trader sold it
+    signed = np.array(
+        [swap['amount0'] for swap in swaps_token0] + [swap['amount1'] for swap in swaps_token1]
+    ).astype('float64')
+    sell_volume = np.where(signed > 0, volume, 0.0)
+
+    # Map every swap to its trader's index, then scatter-add per trader
+    codes, traders = pd.factorize(np.array([swap['origin'] for swap in rows], dtype=object))
+    n_traders = len(traders)
+    totals = np.bincount(codes, weights=volume, minlength=n_traders)
+    sells = np.bincount(codes, weights=sell_volume, minlength=n_traders)
+    buys = np.bincount(codes, weights=volume - sell_volume, minlength=n_traders)
+    counts = np.bincount(codes, minlength=n_traders)
+
+    # Partition out the N largest by total volume, then order just those
+    if limit <= 0:
+        return []
+    if n_traders > limit:
+        # Traders tied with the N-th total are taken in first-seen order, as
+        # a stable sort would; argpartition alone picks among them arbitrarily
+        kth = -np.partition(-totals, limit - 1)[limit - 1]
+        above = np.flatnonzero(totals > kth)
+        ties = np.flatnonzero(totals == kth)[:limit - len(above)]
+        top = np.concatenate([above, ties])
+    else:
+        top = np.arange(n_traders)
+    top = top[np.argsort(-totals[top], kind='stable')]
+
+    return [
+        {
+            'address': traders[i],
+            'total_volume_usd': round(float(totals[i]), 2),
+            'trade_count': int(counts[i]),
+            'buy_volume_usd': round(float(buys[i]), 2),
+            'sell_volume_usd': round(float(sells[i]), 2)
+        }
+        for i in top
+    ]
+
+
+def _token_info_from_row(token_data: Dict) -> Dict:
+    """
+    Convert a subgraph token row into the token info dict
+
+    Args:
+        token_data: token row with symbol, name, decimals, derivedETH
+
+    Returns:
+        Dict with symbol, name, decimals and price_eth
+    """
+    return {
+        'symbol': token_data['symbol'],
+        'name': token_data['name'],
+        'decimals': int(token_data['decimals']),
+        'price_eth': float(token_data['derivedETH'])
+    }
+
+
+def _fallback_price(token_data: Optional[Dict]) -> Optional[float]:
+    """
+    Extract the latest USD price from the fallback price query
+
+    Args:
+        token_data: token row with its latest tokenDayData (may be None)
+
+    Returns:
+        Price in USD, or None if no price is known
+    """
+    if token_data and token_data.get('tokenDayData'):
+        return float(token_data['tokenDayData'][0]['priceUSD'])
+    return None
+
+
+def _price_snapshot(price: Optional[float], ohlc: bool = False) -> pd.DataFrame:
+    """
+    Build a single-row price DataFrame from a fallback price
+
+    Args:
+        price: Price in USD (may be None)
+        ohlc: Whether to add open/high/low/close columns (all equal to price)
+
+    Returns:
+        DataFrame with current price data (empty if no price is known)
+    """
+    if price is None:
+        return pd.DataFrame()
+
+    now = datetime.now()
+    row = {
+        'timestamp': now,
+        'date': now.date(),
+        'price_usd': price,
+        'volume_usd': 0.0
+    }
+    if ohlc:
+        row.update(dict.fromkeys(OHLC_COLUMNS, price))
+    return pd.DataFrame([row])
+
 
 class TokenAnalytics:
-    def __init__(self, subgraph_url=None, graph_client=None):
+    """
+    Token analytics on top of any GraphClient
+
+    When the client is a CachedGraphClient each query is tagged with a
+    query type so it gets the matching cache TTL.
+    """
+
+    def __init__(
+        self,
+        subgraph_url: Optional[str] = None,
+        graph_client: Optional[GraphClient] = None,
+        enable_cache: bool = True,
+        cache_ttl_minutes: int = 5
+    ):
         """
         Initialize TokenAnalytics
         
         Args:
-            subgraph_url: Subgraph endpoint URL
+            subgraph_url: Subgraph endpoint URL (defaults to Config.UNISWAP_V3_SUBGRAPH)
             graph_client: Pre-configured GraphClient instance
+            enable_cache: Enable caching (only if creating new client)
+            cache_ttl_minutes: Cache TTL (only if creating new client)
         """
+        # Report bundles from prefetch(), keyed by lowercased token address
+        self._prefetched: Dict[str, tuple] = {}
+        # aprefetch() fetches in flight, keyed by (address, days, limit, ohlc)
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+
         if graph_client:
+            # Use provided client
             self.client = graph_client
-        elif subgraph_url:
-            from utils.graph_helper import GraphClient
-            self.client = GraphClient(subgraph_url)
         else:
-            from utils.graph_helper import GraphClient
+            self.client = self._shared_client(subgraph_url, enable_cache, cache_ttl_minutes)
+
+        # Resolve the client's capabilities once instead of on every call
+        self._supports_cache = isinstance(self.client, CachedGraphClient)
+        self._cache = getattr(self.client, 'cache', None)
+
+    @staticmethod
+    def _shared_client(subgraph_url: Optional[str], enable_cache: bool,
+                       cache_ttl_minutes: int) -> GraphClient:
+        """GraphClient shared by every instance built from the same settings"""
+        if not subgraph_url:
             from config import Config
-            self.client = GraphClient(Config.UNISWAP_V3_SUBGRAPH)
+            subgraph_url = Config.UNISWAP_V3_SUBGRAPH
 
-    def get_token_info(self, token_address: str) -> Dict:
+        # Instances built from the same settings share one client, and with
+        # it the connection pool, cache and rate limit
+        key = (subgraph_url, enable_cache, cache_ttl_minutes)
+        client = _SHARED_CLIENTS.get(key)
+        if client is None:
+            if enable_cache:
+                client = CachedGraphClient(
+                    endpoint=subgraph_url,
+                    cache_enabled=True,
+                    cache_ttl_minutes=cache_ttl_minutes,
+                    rate_limit_per_second=10.0
+                )
+            else:
+                client = GraphClient(
+                    endpoint=subgraph_url,
+                    cache_enabled=False
+                )
+            _SHARED_CLIENTS[key] = client
+        return client
+
+    def _query(self, query: str, variables: Dict, query_type: str = 'default') -> Dict:
         """
-        Get basic token information (symbol, name, decimals)
+        Run a query, using the TTL of query_type when the client supports it
+        
+        Args:
+            query: GraphQL document
+            variables: Query variables
+            query_type: Type of query for TTL selection (CachedGraphClient only)
+            
+        Returns:
+            Query result
         """
-        query = """
-        {
-          token(id: "%s") {
-            symbol
-            name
-            decimals
-            derivedETH
-          }
-        }
-        """ % token_address.lower()
+        if self._supports_cache:
+            return self.client.query_with_custom_ttl(query, variables, query_type=query_type)
+        return self.client.query(query, variables)
+
+    async def _aquery(self, query: str, variables: Dict, query_type: str = 'default') -> Dict:
+        """Async counterpart of _query()"""
+        if self._supports_cache:
+            return await self.client.aquery_with_custom_ttl(query, variables, query_type=query_type)
+        return await self.client.aquery(query, variables)
+
+    def prefetch(self, token_address: str, days: int = 7, limit: int = 10,
+                 ohlc: bool = False) -> Dict:
+        """
+        Fetch a report bundle and let the getters reuse it for a while
         
-        result = self.client.query(query)
-        token_data = result['data']['token']
+        For the next PREFETCH_TTL_SECONDS, get_token_volume_24h(),
+        get_price_history() (up to `days`), get_price_history_ohlc() (if
+        prefetched with ohlc) and get_top_traders() (up to `limit`) answer
+        from this bundle instead of querying the subgraph.
         
-        return {
-            'symbol': token_data['symbol'],
-            'name': token_data['name'],
-            'decimals': int(token_data['decimals']),
-            'price_eth': float(token_data['derivedETH'])
-        }
+        Args:
+            token_address: The token contract address
+            days: Number of days of price history to fetch (default: 7)
+            limit: Number of top traders to keep (default: 10)
+            ohlc: Include daily open/high/low/close (default: False)
+            
+        Returns:
+            The report bundle, see get_report_bundle()
+        """
+        addr = token_address.lower()
+        bundle = self.get_report_bundle(addr, days=days, limit=limit, ohlc=ohlc)
+        self._keep_prefetched(addr, days, limit, ohlc, bundle)
+        return bundle
+
+    async def aprefetch(self, token_address: str, days: int = 7, limit: int = 10,
+                        ohlc: bool = False) -> Dict:
+        """
+        Async version of prefetch()
+        
+        Concurrent calls with the same arguments share one in-flight fetch.
+        """
+        key = (token_address.lower(), days, limit, ohlc)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._aprefetch(*key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded, so one cancelled caller doesn't cancel the shared fetch
+        return await asyncio.shield(task)
+
+    async def _aprefetch(self, addr: str, days: int, limit: int, ohlc: bool) -> Dict:
+        """Fetch and keep one report bundle for aprefetch()"""
+        bundle = await self.aget_report_bundle(addr, days=days, limit=limit, ohlc=ohlc)
+        self._keep_prefetched(addr, days, limit, ohlc, bundle)
+        return bundle
+
+    def _keep_prefetched(self, addr: str, days: int, limit: int, ohlc: bool, bundle: Dict):
+        """Store a prefetched bundle for the getters"""
+        # A failed or empty bundle is not kept, so the getters query normally
+        if not bundle['price_history'].empty or bundle['current_price'] is not None:
+            self._prefetched[addr] = (time.monotonic(), days, limit, ohlc, bundle)
+
+    def _prefetched_bundle(self, addr: str, days: int = 0, limit: int = 0,
+                           ohlc: bool = False) -> Optional[Dict]:
+        """
+        Prefetched bundle for a lowercased token address, if fresh and
+        covering days/limit/ohlc
+        """
+        entry = self._prefetched.get(addr)
+        if entry is None:
+            return None
+        
+        fetched_at, bundle_days, bundle_limit, bundle_ohlc, bundle = entry
+        if time.monotonic() - fetched_at > PREFETCH_TTL_SECONDS:
+            del self._prefetched[addr]
+            return None
+        if days > bundle_days or limit > bundle_limit or (ohlc and not bundle_ohlc):
+            return None
+        return bundle
+
+    def get_token_info(self, token_address: str) -> Dict:
+        """
+        Get basic token information (symbol, name, decimals)
+        
+        This data rarely changes, so cache for 24 hours
+        """
+        result = self._query(Q_TOKEN_INFO, {'token': token_address.lower()}, 'token_info')
+        return _token_info_from_row(result['data']['token'])
+
+    async def aget_token_info(self, token_address: str) -> Dict:
+        """Async version of get_token_info()"""
+        result = await self._aquery(Q_TOKEN_INFO, {'token': token_address.lower()}, 'token_info')
+        return _token_info_from_row(result['data']['token'])
     
     def get_token_volume_24h(self, token_address: str) -> float:
-        """Get 24h trading volume for a token"""
-        timestamp_24h_ago = int((datetime.now() - timedelta(days=1)).timestamp())
-        
-        query = """
-        {
-          swaps(
-            where: {
-              timestamp_gte: %d,
-              token0: "%s"
-            }
-          ) {
-            amountUSD
-          }
-        }
-        """ % (timestamp_24h_ago, token_address.lower())
+        """
+        Get 24h trading volume for a token
         
-        result = self.client.query(query)
-        swaps = result['data']['swaps']
+        Uses cache with 5-minute TTL for volume queries
+        """
+        addr = token_address.lower()
+        bundle = self._prefetched_bundle(addr)
+        if bundle is not None:
+            return bundle['volume_24h']
         
-        total_volume = sum(float(swap['amountUSD']) for swap in swaps)
-        return total_volume
+        result = self._query(Q_VOLUME_24H, {'token': addr}, 'volume')
+        return _aggregate_volume(result['data']['tokenDayDatas'])
     
     def get_price_history(self, token_address: str, days: int = 7) -> pd.DataFrame:
         """
         Get historical price data for a token
         
+        Closed UTC days never change, so they are fetched separately from the
+        current day and cached for a week; today's and yesterday's rows are
+        refreshed on the short price TTL (yesterday's last blocks may still
+        be indexing shortly after UTC midnight).
+        
         Args:
             token_address: The token contract address
             days: Number of days of history to fetch (default: 7)
@@ -83,67 +458,77 @@ class TokenAnalytics:
         Returns:
             DataFrame with columns: timestamp, date, price_usd, volume_usd
         """
-        timestamp_start = int((datetime.now() - timedelta(days=days)).timestamp())
+        return self._price_history(token_address.lower(), days, ohlc=False)
+
+    def get_price_history_ohlc(self, token_address: str, days: int = 7) -> pd.DataFrame:
+        """
+        Get historical price data with the daily OHLC candle
         
-        # Query token day data which contains daily OHLC and volume
-        query = """
-        {
-          tokenDayDatas(
-            first: %d,
-            orderBy: date,
-            orderDirection: desc,
-            where: {
-              token: "%s",
-              date_gte: %d
-            }
-          ) {
-            date
-            priceUSD
-            volumeUSD
-            open
-            high
-            low
-            close
-          }
+        Same as get_price_history() but also selects open/high/low/close,
+        which makes the response roughly twice as large.
+        
+        Args:
+            token_address: The token contract address
+            days: Number of days of history to fetch (default: 7)
+            
+        Returns:
+            DataFrame with columns: timestamp, date, price_usd, volume_usd,
+            open, high, low, close
+        """
+        return self._price_history(token_address.lower(), days, ohlc=True)
+
+    def _price_history(self, addr: str, days: int, ohlc: bool) -> pd.DataFrame:
+        """Shared implementation of get_price_history()/get_price_history_ohlc()"""
+        today = _window_start(0, SECONDS_PER_DAY)
+        
+        bundle = self._prefetched_bundle(addr, days=days, ohlc=ohlc)
+        if bundle is not None:
+            df = bundle['price_history']
+            if df.empty:
+                return _price_snapshot(bundle['current_price'], ohlc)
+            since = pd.to_datetime(today - days * SECONDS_PER_DAY, unit='s')
+            df = df[df['timestamp'] >= since].tail(days).reset_index(drop=True)
+            # An OHLC bundle also serves price-only callers
+            return df if ohlc else df.drop(columns=OHLC_COLUMNS, errors='ignore')
+        # The most recent closed day stays with today on the short TTL, so a
+        # row fetched before the subgraph finished indexing it isn't cached
+        # for a week
+        recent_start = today - SECONDS_PER_DAY
+        finalized_vars = {
+            'token': addr,
+            'since': today - days * SECONDS_PER_DAY,
+            'until': recent_start,
+            'days': days
+        }
+        recent_vars = {
+            'token': addr,
+            'since': recent_start,
+            'until': today + SECONDS_PER_DAY,
+            'days': 2
         }
-        """ % (days, token_address.lower(), timestamp_start)
+        
+        query = Q_PRICE_HISTORY_OHLC if ohlc else Q_PRICE_HISTORY
         
         try:
-            result = self.client.query(query)
-            day_data = result['data']['tokenDayDatas']
+            # Query token day data which contains daily price and volume
+            current = self._query(query, recent_vars, 'current_price')
+            day_data = current['data']['tokenDayDatas']
+            if finalized_vars['since'] < recent_start:
+                finalized = self._query(query, finalized_vars, 'finalized')
+                day_data = day_data + finalized['data']['tokenDayDatas']
             
             if not day_data:
                 # If no day data available, try to get current price from pools
-                return self._get_current_price_fallback(token_address)
-            
-            # Convert to DataFrame
-            df = pd.DataFrame(day_data)
-            
-            # Convert timestamp to datetime
-            df['timestamp'] = pd.to_datetime(df['date'], unit='s')
-            df['date'] = df['timestamp'].dt.date
-            
-            # Convert price and volume to float
-            df['price_usd'] = df['priceUSD'].astype(float)
-            df['volume_usd'] = df['volumeUSD'].astype(float)
-            df['open'] = df['open'].astype(float)
-            df['high'] = df['high'].astype(float)
-            df['low'] = df['low'].astype(float)
-            df['close'] = df['close'].astype(float)
+                return _price_snapshot(self._get_current_price_fallback(addr), ohlc)
             
-            # Sort by date ascending
-            df = df.sort_values('timestamp')
-            
-            # Select relevant columns
-            df = df[['timestamp', 'date', 'price_usd', 'volume_usd', 'open', 'high', 'low', 'close']]
-            
-            return df
+            # Newest `days` rows, like a single first: days query
+            return _aggregate_price_history(day_data[:days], ohlc)
             
         except Exception as e:
             print(f"Error fetching price history: {e}")
             return pd.DataFrame()
     
-    def _get_current_price_fallback(self, token_address: str) -> pd.DataFrame:
+    def _get_current_price_fallback(self, token_address: str) -> Optional[float]:
         """
         Fallback method to get current price from pool data if no historical data exists
         
@@ -151,41 +536,26 @@ class TokenAnalytics:
             token_address: The token contract address
             
         Returns:
-            DataFrame with current price data
+            Current price in USD, or None if unavailable
         """
-        query = """
-        {
-          token(id: "%s") {
-            derivedETH
-            tokenDayData(first: 1, orderBy: date, orderDirection: desc) {
-              priceUSD
-            }
-          }
-        }
-        """ % token_address.lower()
-        
         try:
-            result = self.client.query(query)
-            token_data = result['data']['token']
-            
-            if token_data and token_data.get('tokenDayData'):
-                price = float(token_data['tokenDayData'][0]['priceUSD'])
-                now = datetime.now()
-                
-                return pd.DataFrame([{
-                    'timestamp': now,
-                    'date': now.date(),
-                    'price_usd': price,
-                    'volume_usd': 0.0,
-                    'open': price,
-                    'high': price,
-                    'low': price,
-                    'close': price
-                }])
+            # Current price uses short cache
+            result = self._query(Q_FALLBACK_PRICE, {'token': token_address.lower()}, 'current_price')
+            return _fallback_price(result['data']['token'])
         except Exception as e:
             print(f"Error in fallback price fetch: {e}")
         
-        return pd.DataFrame()
+        return None
+
+    async def _aget_current_price_fallback(self, token_address: str) -> Optional[float]:
+        """Async version of _get_current_price_fallback()"""
+        try:
+            result = await self._aquery(Q_FALLBACK_PRICE, {'token': token_address.lower()}, 'current_price')
+            return _fallback_price(result['data']['token'])
+        except Exception as e:
+            print(f"Error in fallback price fetch: {e}")
+
+        return None
     
     def get_top_traders(self, token_address: str, limit: int = 10) -> List[Dict]:
         """
@@ -199,100 +569,179 @@ class TokenAnalytics:
             List of dicts containing trader info: address, total_volume_usd, trade_count, 
             buy_volume_usd, sell_volume_usd
         """
-        # We need to query swaps and aggregate by origin (trader address)
-        # Note: This queries recent swaps (last 7 days) due to potential data size
-        timestamp_7d_ago = int((datetime.now() - timedelta(days=7)).timestamp())
+        addr = token_address.lower()
+        bundle = self._prefetched_bundle(addr, limit=limit)
+        if bundle is not None:
+            return bundle['top_traders'][:limit]
         
-        # Query swaps where the token is either token0 or token1
-        query = """
-        {
-          swaps(
-            first: 1000,
-            orderBy: timestamp,
-            orderDirection: desc,
-            where: {
-              timestamp_gte: %d,
-              or: [
-                { token0: "%s" },
-                { token1: "%s" }
-              ]
-            }
-          ) {
-            origin
-            amountUSD
-            amount0
-            amount1
-            token0 {
-              id
-            }
-            token1 {
-              id
-            }
-          }
-        }
-        """ % (timestamp_7d_ago, token_address.lower(), token_address.lower())
+        # We need to query swaps and aggregate by origin (trader address)
+        # Note: This scans recent swaps (last 7 days, at most
+        # MAX_SWAPS_PER_SIDE per token side) due to potential data size
+        variables = self._swap_window_variables(addr)
         
         try:
-            result = self.client.query(query)
-            swaps = result['data']['swaps']
-            
-            if not swaps:
-                return []
-            
-            # Aggregate by trader
-            trader_stats = defaultdict(lambda: {
-                'total_volume_usd': 0.0,
-                'trade_count': 0,
-                'buy_volume_usd': 0.0,
-                'sell_volume_usd': 0.0
-            })
-            
-            for swap in swaps:
-                trader = swap['origin']
-                volume = float(swap['amountUSD'])
-                
-                trader_stats[trader]['total_volume_usd'] += volume
-                trader_stats[trader]['trade_count'] += 1
-                
-                # Determine if buy or sell based on token position
-                token0_id = swap['token0']['id'].lower()
-                is_token0 = token0_id == token_address.lower()
-                
-                amount0 = float(swap['amount0'])
-                amount1 = float(swap['amount1'])
-                
-                # If token is token0 and amount0 is positive, it's a sell
-                # If token is token0 and amount0 is negative, it's a buy
-                if is_token0:
-                    if amount0 > 0:
-                        trader_stats[trader]['sell_volume_usd'] += volume
-                    else:
-                        trader_stats[trader]['buy_volume_usd'] += volume
-                else:
-                    if amount1 > 0:
-                        trader_stats[trader]['sell_volume_usd'] += volume
-                    else:
-                        trader_stats[trader]['buy_volume_usd'] += volume
-            
-            # Convert to list and sort by total volume
-            top_traders = []
-            for address, stats in trader_stats.items():
-                top_traders.append({
-                    'address': address,
-                    'total_volume_usd': round(stats['total_volume_usd'], 2),
-                    'trade_count': stats['trade_count'],
-                    'buy_volume_usd': round(stats['buy_volume_usd'], 2),
-                    'sell_volume_usd': round(stats['sell_volume_usd'], 2)
-                })
+            token0_rows = self._collect_swaps(Q_TOP_TRADERS_TOKEN0, variables)
+            token1_rows = self._collect_swaps(Q_TOP_TRADERS_TOKEN1, variables)
             
-            # Sort by total volume and return top N
-            top_traders.sort(key=lambda x: x['total_volume_usd'], reverse=True)
-            
-            return top_traders[:limit]
+            return _aggregate_top_traders(token0_rows, token1_rows, limit)
             
         except Exception as e:
             print(f"Error fetching top traders: {e}")
             return []
+
+    @staticmethod
+    def _swap_window_variables(addr: str, now: Optional[float] = None) -> Dict:
+        """
+        Variables for the first page of the 7d swap scan (addr lowercased)
+        
+        The upper bound is the end of the current hour, which admits every
+        swap so far while keeping the variables stable for caching.
+        """
+        return {
+            'token': addr,
+            'since': str(_window_start(7, SECONDS_PER_HOUR, now)),
+            'before': str(_window_start(0, SECONDS_PER_HOUR, now) + SECONDS_PER_HOUR)
+        }
+
+    def _collect_swaps(self, query: str, variables: Dict,
+                       first_page: Optional[List[Dict]] = None) -> List[Dict]:
+        """
+        Walk a swaps query page by page using the timestamp as keyset cursor
+        
+        Args:
+            query: Paginated swaps document (takes $before)
+            variables: Variables of the first page
+            first_page: Already-fetched first page, if any
+            
+        Returns:
+            All collected swap rows, newest first
+        """
+        rows, seen_ids = [], set()
+        if first_page is None:
+            first_page = self._query(query, variables)['data']['swaps']
+        cursor = _merge_swap_page(rows, seen_ids, first_page)
+        
+        while cursor is not None:
+            page = self._query(query, {**variables, 'before': cursor})['data']['swaps']
+            cursor = _merge_swap_page(rows, seen_ids, page)
+        
+        return rows
+
+    async def _acollect_swaps(self, query: str, variables: Dict,
+                              first_page: Optional[List[Dict]] = None) -> List[Dict]:
+        """Async version of _collect_swaps()"""
+        rows, seen_ids = [], set()
+        if first_page is None:
+            first_page = (await self._aquery(query, variables))['data']['swaps']
+        cursor = _merge_swap_page(rows, seen_ids, first_page)
+        
+        while cursor is not None:
+            page = (await self._aquery(query, {**variables, 'before': cursor}))['data']['swaps']
+            cursor = _merge_swap_page(rows, seen_ids, page)
+        
+        return rows
+
+    def get_report_bundle(self, token_address: str, days: int = 7, limit: int = 10,
+                          ohlc: bool = False) -> Dict:
+        """
+        Fetch 24h volume, price history and top traders in one round-trip
+
+        Args:
+            token_address: The token contract address
+            days: Number of days of price history (default: 7)
+            limit: Number of top traders to return (default: 10)
+            ohlc: Include daily open/high/low/close in price_history
+                (default: False)
+
+        Returns:
+            Dict with volume_24h (float), price_history (DataFrame),
+            current_price (float or None) and top_traders (list of dicts).
+            Tokens without day data get an empty price_history and only
+            the spot current_price.
+        """
+        addr = token_address.lower()
+        now = datetime.now()
+        swap_variables = self._swap_window_variables(addr, now.timestamp())
+
+        try:
+            # The bundle carries volume data, so it gets the volume TTL
+            query = Q_REPORT_BUNDLE_OHLC if ohlc else Q_REPORT_BUNDLE
+            result = self._query(query, self._bundle_variables(addr, days, now), 'volume')
+            data = result['data']
+
+            # Busy tokens fill the first swaps page; fetch the rest separately
+            traders0 = self._collect_swaps(Q_TOP_TRADERS_TOKEN0, swap_variables, data['traders0'])
+            traders1 = self._collect_swaps(Q_TOP_TRADERS_TOKEN1, swap_variables, data['traders1'])
+        except Exception as e:
+            print(f"Error fetching report bundle: {e}")
+            return self._empty_bundle()
+
+        # Without day data only a spot price is fetched; no history frame is built
+        current_price = None if data['hist'] else self._get_current_price_fallback(addr)
+
+        return self._assemble_bundle(data, traders0, traders1, current_price, limit, now, ohlc)
+
+    async def aget_report_bundle(self, token_address: str, days: int = 7, limit: int = 10,
+                                 ohlc: bool = False) -> Dict:
+        """Async version of get_report_bundle()"""
+        addr = token_address.lower()
+        now = datetime.now()
+        swap_variables = self._swap_window_variables(addr, now.timestamp())
+
+        try:
+            query = Q_REPORT_BUNDLE_OHLC if ohlc else Q_REPORT_BUNDLE
+            result = await self._aquery(query, self._bundle_variables(addr, days, now), 'volume')
+            data = result['data']
+
+            traders0, traders1 = await asyncio.gather(
+                self._acollect_swaps(Q_TOP_TRADERS_TOKEN0, swap_variables, data['traders0']),
+                self._acollect_swaps(Q_TOP_TRADERS_TOKEN1, swap_variables, data['traders1'])
+            )
+        except Exception as e:
+            print(f"Error fetching report bundle: {e}")
+            return self._empty_bundle()
+
+        current_price = None if data['hist'] else await self._aget_current_price_fallback(addr)
+
+        return self._assemble_bundle(data, traders0, traders1, current_price, limit, now, ohlc)
+
+    @staticmethod
+    def _bundle_variables(addr: str, days: int, now: datetime) -> Dict:
+        """Variables for Q_REPORT_BUNDLE (addr lowercased)"""
+        return {
+            'token': addr,
+            'since7d': str(_window_start(7, SECONDS_PER_HOUR, now.timestamp())),
+            'historyStart': _window_start(days, SECONDS_PER_DAY, now.timestamp()),
+            'days': days
+        }
+
+    @staticmethod
+    def _empty_bundle() -> Dict:
+        """Report bundle returned when the query fails"""
+        return {
+            'volume_24h': 0.0,
+            'price_history': pd.DataFrame(),
+            'current_price': None,
+            'top_traders': []
+        }
+
+    @staticmethod
+    def _assemble_bundle(data: Dict, traders0: List[Dict], traders1: List[Dict],
+                         current_price: Optional[float], limit: int, now: datetime,
+                         ohlc: bool = False) -> Dict:
+        """Aggregate the raw bundle fields into the report bundle dict"""
+        if data['hist']:
+            price_history = _aggregate_price_history(data['hist'], ohlc)
+            current_price = float(price_history['price_usd'].iloc[-1])
+        else:
+            price_history = pd.DataFrame()
+
+        return {
+            'volume_24h': _aggregate_volume(data['vol'], now.timestamp()),
+            'price_history': price_history,
+            'current_price': current_price,
+            'top_traders': _aggregate_top_traders(traders0, traders1, limit)
+        }
     
     def get_trader_pnl(self, trader_address: str, token_address: str) -> Dict:
         """
@@ -305,37 +754,15 @@ class TokenAnalytics:
         Returns:
             Dict with pnl_usd, total_bought, total_sold, avg_buy_price, avg_sell_price
         """
-        timestamp_30d_ago = int((datetime.now() - timedelta(days=30)).timestamp())
-        
-        query = """
-        {
-          swaps(
-            first: 1000,
-            where: {
-              origin: "%s",
-              timestamp_gte: %d,
-              or: [
-                { token0: "%s" },
-                { token1: "%s" }
-              ]
-            }
-          ) {
-            amountUSD
-            amount0
-            amount1
-            token0 {
-              id
-            }
-            token1 {
-              id
-            }
-          }
+        token_lc = token_address.lower()
+        variables = {
+            'trader': trader_address.lower(),
+            'token': token_lc,
+            'since': str(_window_start(30, SECONDS_PER_HOUR))
         }
-        """ % (trader_address.lower(), timestamp_30d_ago, 
-               token_address.lower(), token_address.lower())
         
         try:
-            result = self.client.query(query)
+            result = self._query(Q_TRADER_PNL, variables)
             swaps = result['data']['swaps']
             
             total_bought_usd = 0.0
@@ -343,8 +770,8 @@ class TokenAnalytics:
             
             for swap in swaps:
                 volume = float(swap['amountUSD'])
-                token0_id = swap['token0']['id'].lower()
-                is_token0 = token0_id == token_address.lower()
+                # Subgraph entity ids are already lowercase hex
+                is_token0 = swap['token0']['id'] == token_lc
                 
                 amount0 = float(swap['amount0'])
                 
@@ -377,3 +804,25 @@ class TokenAnalytics:
                 'total_sold_usd': 0.0,
                 'trade_count': 0
             }
+    
+    def get_client_stats(self) -> Dict:
+        """
+        Get GraphClient statistics
+        
+        Returns:
+            Dictionary with client and cache statistics
+        """
+        stats = self.client.get_stats()
+        
+        if self._cache is not None:
+            stats['cache'] = self._cache.get_stats()
+        
+        return stats
+    
+    def clear_cache(self):
+        """Clear all cached queries"""
+        if self._cache is not None:
+            self.client.clear_cache()
+            print("Cache cleared")
+        else:
+            print("Client does not support caching")
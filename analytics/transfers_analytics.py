@@ -3,12 +3,358 @@
 Hybrid transfer analytics combining RPC calls and subgraph queries.
 Provides comprehensive token transfer tracking.
 """
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple, Union
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from decimal import Context, Decimal
+from functools import cached_property, lru_cache
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from web3 import Web3
 from web3.exceptions import Web3Exception
+from analytics._queries import Q_TRANSFERS, Q_WALLET_TRANSFERS
+import hashlib
+import heapq
+import itertools
 import json
-from collections import defaultdict
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Blocks per eth_getBlockByNumber batch (providers cap JSON-RPC batch sizes)
+BLOCK_BATCH_SIZE = 100
+
+# In-memory cache sizes. Block timestamps never change; token metadata
+# is refreshed after a day.
+BLOCK_TIMESTAMP_CACHE_SIZE = 65536
+TOKEN_META_CACHE_SIZE = 1024
+TOKEN_META_TTL_SECONDS = 86400
+
+# Concurrent eth_getLogs requests for chunked range scans; keep this under
+# the RPC provider's per-second request limit
+RPC_CHUNK_WORKERS = 8
+
+# keccak256("Transfer(address,address,uint256)"), the ERC20 Transfer topic
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+# Left padding that widens a 20-byte address into a 32-byte log topic
+ZERO_TOPIC_PAD = "0" * 24
+
+# Ethereum mainnet block rate (12s slots); other chains pass their own
+# blocks_per_day (Config.BLOCKS_PER_DAY)
+BLOCKS_PER_DAY_ETH = 7200
+
+# Standard ERC20 ABI for transfers
+ERC20_ABI = json.loads('''[
+    {
+        "anonymous": false,
+        "inputs": [
+            {"indexed": true, "name": "from", "type": "address"},
+            {"indexed": true, "name": "to", "type": "address"},
+            {"indexed": false, "name": "value", "type": "uint256"}
+        ],
+        "name": "Transfer",
+        "type": "event"
+    },
+    {
+        "constant": true,
+        "inputs": [],
+        "name": "decimals",
+        "outputs": [{"name": "", "type": "uint8"}],
+        "type": "function"
+    },
+    {
+        "constant": true,
+        "inputs": [],
+        "name": "symbol",
+        "outputs": [{"name": "", "type": "string"}],
+        "type": "function"
+    },
+    {
+        "constant": true,
+        "inputs": [],
+        "name": "name",
+        "outputs": [{"name": "", "type": "string"}],
+        "type": "function"
+    }
+]''')
+
+# RPC connection pool (sized above RPC_CHUNK_WORKERS) and request timeout
+RPC_POOL_SIZE = 32
+RPC_TIMEOUT_SECONDS = 30
+
+# eth_getLogs errors that mean "ask for a smaller block range": the -32005
+# limit code and the block-span / result-size messages providers send
+LOG_RANGE_ERROR = re.compile(
+    r'-32005|block range|query returned more than|response size|range (is )?too (large|wide)'
+    r'|limited to a [\d,]+ (block )?range',
+    re.IGNORECASE
+)
+# Throttling is not a range problem; splitting would only add requests
+RATE_LIMIT_ERROR = re.compile(r'\b429\b|too many requests|rate.?limit', re.IGNORECASE)
+# Successful calls at the learned span before it is doubled again
+LOG_RANGE_GROW_AFTER = 16
+
+# Enough digits to scale any uint256 amount without rounding
+AMOUNT_CONTEXT = Context(prec=100)
+
+# Above this many transfers analyze_transfers() estimates unique
+# counterparties with HyperLogLog instead of holding every address in a set
+HLL_THRESHOLD = 100000
+
+# Subgraph page size and the cap on transfers collected per query
+SUBGRAPH_PAGE_SIZE = 1000
+MAX_SUBGRAPH_TRANSFERS = 100000
+
+
+@lru_cache(maxsize=None)
+def _rpc_session() -> requests.Session:
+    """
+    requests.Session shared by every TransfersAnalytics RPC provider
+    
+    Keeps TLS connections alive across calls and instances, and retries
+    transient gateway errors. JSON-RPC reads are idempotent, so POST is
+    retried too.
+    """
+    retry = Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({'POST'})
+    )
+    adapter = HTTPAdapter(pool_connections=RPC_POOL_SIZE, pool_maxsize=RPC_POOL_SIZE, max_retries=retry)
+    
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _is_log_range_error(error: Exception) -> bool:
+    """True if an eth_getLogs error asks for a smaller block range"""
+    # HTTP failures (including urllib3 giving up after its own retries)
+    if isinstance(error, requests.RequestException):
+        return False
+    message = str(error)
+    return not RATE_LIMIT_ERROR.search(message) and LOG_RANGE_ERROR.search(message) is not None
+
+
+def _stop_on_error(transfers: Iterator[Dict]) -> Iterator[Dict]:
+    """Iterate transfers, ending quietly on an error as get_transfers_hybrid() does"""
+    try:
+        yield from transfers
+    except Exception as e:
+        print(f"Error in get_transfers_hybrid: {e}")
+
+
+def _next_block_page(variables: Dict, page: List[Dict], cursor: str) -> Dict:
+    """
+    Variables for the transfers page after a full one
+    
+    Pages are ordered by block number (graph-node breaks ties by id), and
+    the cursor variable (fromBlock ascending, toBlock descending) moves to
+    the page's last block, with skip counting that block's rows already
+    returned.
+    """
+    last_block = page[-1]['blockNumber']
+    if page[0]['blockNumber'] == last_block and int(last_block) == int(variables[cursor]):
+        # The whole page is the cursor block: move further into it
+        return {**variables, 'skip': variables['skip'] + len(page)}
+    in_last_block = sum(1 for row in page if row['blockNumber'] == last_block)
+    return {**variables, cursor: last_block, 'skip': in_last_block}
+
+
+def parse_transfer_logs(
+    logs: List,
+    decimals: int,
+    symbol: str,
+    wallet_address: Optional[str] = None
+) -> List[Dict]:
+    """
+    Decode raw ERC20 Transfer logs into transfer dicts (without timestamps)
+    
+    This is the CPU-heavy part of an RPC scan against a fast node, so it
+    is kept as a standalone function with everything it uses bound to
+    locals.
+    
+    Args:
+        logs: Logs returned by eth_getLogs for the Transfer topic
+        decimals: Token decimals
+        symbol: Token symbol
+        wallet_address: Optional lowercase wallet; other transfers are skipped
+        
+    Returns:
+        List of transfers with from, to (lowercase hex), value, value_raw,
+        decimals, symbol, block_number, tx_hash and log_index
+    """
+    divisor = 10 ** decimals
+    to_hex = Web3.to_hex
+    from_bytes = int.from_bytes
+    
+    filter_wallet = bool(wallet_address)
+    
+    transfers = []
+    append = transfers.append
+    for log in logs:
+        try:
+            # Decode transfer event straight from the raw bytes:
+            # indexed addresses are the last 20 bytes of each topic,
+            # the value is the big-endian uint256 in data. Addresses stay
+            # lowercase; EIP-55 casing costs a keccak per address and is
+            # only needed for display.
+            topics = log['topics']
+            from_addr = '0x' + bytes(topics[1][-20:]).hex()
+            to_addr = '0x' + bytes(topics[2][-20:]).hex()
+            value_raw = from_bytes(log['data'], 'big')
+            
+            # Filter by wallet if specified
+            if filter_wallet and wallet_address != from_addr and wallet_address != to_addr:
+                continue
+            
+            append({
+                'from': from_addr,
+                'to': to_addr,
+                'value': value_raw / divisor,
+                'value_raw': value_raw,
+                'decimals': decimals,
+                'symbol': symbol,
+                'block_number': log['blockNumber'],
+                'tx_hash': to_hex(log['transactionHash']),
+                'log_index': log['logIndex']
+            })
+            
+        except Exception as e:
+            print(f"Error parsing log: {e}")
+            continue
+    
+    return transfers
+
+
+def _token_amount_raw(value: str, decimals: int) -> int:
+    """
+    Exact integer base units from a subgraph value in token units
+    
+    The transfers schema's value is a BigDecimal in token units ("1.5",
+    or "5" for a whole amount), so it is always scaled by decimals.
+    Neither step goes through float, which cannot hold uint256 amounts
+    above 2**53 exactly.
+    """
+    return int(Decimal(value).scaleb(decimals, context=AMOUNT_CONTEXT))
+
+
+class _HyperLogLog:
+    """
+    HyperLogLog cardinality estimator
+    
+    2**p one-byte registers (16 KB at the default p=14) give a standard
+    error of about 1.04 / sqrt(2**p), i.e. under 1%.
+    """
+    
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+        self.alpha = 0.7213 / (1 + 1.079 / self.m)
+    
+    def add(self, item: str):
+        """Add an item (any string, e.g. an address)"""
+        x = int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), 'big')
+        index = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+    
+    def __len__(self) -> int:
+        estimate = self.alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        
+        # Small-range correction (linear counting)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+        
+        return int(round(estimate))
+
+
+@dataclass
+class TransferBatch:
+    """
+    Columnar (struct-of-arrays) form of a list of transfers
+    
+    One NumPy array per field instead of one dict per transfer, so large
+    batches take a fraction of the memory and can be scanned with
+    vectorised comparisons. symbol and decimals are constant per token
+    and stored once.
+    """
+    block_number: np.ndarray
+    log_index: np.ndarray
+    timestamp: np.ndarray
+    from_addr: np.ndarray
+    to_addr: np.ndarray
+    value: np.ndarray
+    value_raw: np.ndarray
+    tx_hash: np.ndarray
+    decimals: int = 18
+    symbol: str = 'TOKEN'
+    
+    @classmethod
+    def from_transfers(cls, transfers: List[Dict]) -> 'TransferBatch':
+        """Build a batch from transfer dicts as returned by get_transfers_hybrid()"""
+        first = transfers[0] if transfers else {}
+        return cls(
+            block_number=np.array([t['block_number'] for t in transfers], dtype=np.int64),
+            log_index=np.array([t.get('log_index', 0) for t in transfers], dtype=np.int64),
+            timestamp=np.array([t['timestamp'] for t in transfers], dtype=np.int64),
+            # Fixed-width strings compare in C, unlike object arrays
+            from_addr=np.array([t['from'] for t in transfers], dtype='U42'),
+            to_addr=np.array([t['to'] for t in transfers], dtype='U42'),
+            value=np.array([t['value'] for t in transfers], dtype=np.float64),
+            # uint256 does not fit a NumPy integer type
+            value_raw=np.array([t['value_raw'] for t in transfers], dtype=object),
+            tx_hash=np.array([t['tx_hash'] for t in transfers], dtype='U66'),
+            decimals=first.get('decimals', 18),
+            symbol=first.get('symbol', 'TOKEN')
+        )
+    
+    def __len__(self) -> int:
+        return len(self.block_number)
+    
+    @cached_property
+    def participants(self) -> frozenset:
+        """
+        Every address that sent or received in this batch
+        
+        Built on first use and reused for later wallets, so a wallet with
+        no transfers in the batch is ruled out with one set lookup.
+        """
+        return frozenset(self.from_addr.tolist()) | frozenset(self.to_addr.tolist())
+    
+    def row(self, i: int) -> Dict:
+        """Transfer i as a dict, in the get_transfers_hybrid() format"""
+        timestamp = int(self.timestamp[i])
+        return {
+            'from': str(self.from_addr[i]),
+            'to': str(self.to_addr[i]),
+            'value': float(self.value[i]),
+            'value_raw': self.value_raw[i],
+            'decimals': self.decimals,
+            'symbol': self.symbol,
+            'block_number': int(self.block_number[i]),
+            'tx_hash': str(self.tx_hash[i]),
+            'log_index': int(self.log_index[i]),
+            'timestamp': timestamp,
+            'datetime': datetime.fromtimestamp(timestamp).isoformat()
+        }
+    
+    def to_dicts(self) -> List[Dict]:
+        """Convert back to a list of transfer dicts"""
+        return [self.row(i) for i in range(len(self))]
 
 class TransfersAnalytics:
     """
@@ -17,55 +363,60 @@ class TransfersAnalytics:
     - Subgraph: Historical data, faster for large ranges
     """
     
-    def __init__(self, rpc_url: str, subgraph_client=None):
+    def __init__(
+        self,
+        rpc_url: str,
+        subgraph_client=None,
+        cache_db_path: Optional[str] = None,
+        blocks_per_day: int = BLOCKS_PER_DAY_ETH,
+        subgraph_value_in_base_units: bool = False
+    ):
         """
         Initialize with RPC endpoint and optional subgraph client
         
         Args:
             rpc_url: Ethereum RPC endpoint (e.g., Infura, Alchemy)
             subgraph_client: Optional GraphClient for historical queries
+            cache_db_path: Optional SQLite file that persists block
+                timestamps across restarts (e.g. Config.DATABASE_PATH)
+            blocks_per_day: Average blocks per day on the RPC's chain,
+                used to turn day windows into block ranges
+            subgraph_value_in_base_units: The subgraph's Transfer.value is a
+                BigInt in base units rather than a BigDecimal in token units
         """
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.w3 = Web3(Web3.HTTPProvider(
+            rpc_url,
+            request_kwargs={'timeout': RPC_TIMEOUT_SECONDS},
+            session=_rpc_session()
+        ))
         self.subgraph_client = subgraph_client
+        # Units are a property of the schema, so they are fixed per
+        # instance: "5" is 5 tokens in a BigDecimal field, 5 wei in a BigInt
+        self.subgraph_value_in_base_units = subgraph_value_in_base_units
+        self.blocks_per_day = blocks_per_day
         
-        # ERC20 Transfer event signature
-        # Transfer(address indexed from, address indexed to, uint256 value)
-        self.TRANSFER_EVENT_SIGNATURE = self.w3.keccak(text="Transfer(address,address,uint256)").hex()
-        
-        # Standard ERC20 ABI for transfers
-        self.ERC20_ABI = json.loads('''[
-            {
-                "anonymous": false,
-                "inputs": [
-                    {"indexed": true, "name": "from", "type": "address"},
-                    {"indexed": true, "name": "to", "type": "address"},
-                    {"indexed": false, "name": "value", "type": "uint256"}
-                ],
-                "name": "Transfer",
-                "type": "event"
-            },
-            {
-                "constant": true,
-                "inputs": [],
-                "name": "decimals",
-                "outputs": [{"name": "", "type": "uint8"}],
-                "type": "function"
-            },
-            {
-                "constant": true,
-                "inputs": [],
-                "name": "symbol",
-                "outputs": [{"name": "", "type": "string"}],
-                "type": "function"
-            },
-            {
-                "constant": true,
-                "inputs": [],
-                "name": "name",
-                "outputs": [{"name": "", "type": "string"}],
-                "type": "function"
-            }
-        ]''')
+        # LRU caches: block number -> timestamp, token -> (decimals, symbol, fetched_at)
+        self._block_timestamps: OrderedDict = OrderedDict()
+        self._token_meta_cache: OrderedDict = OrderedDict()
+        # ERC20 contract objects by checksummed address
+        self._contract_cache: Dict[str, object] = {}
+        # Chunked scans run _get_transfers_rpc from several threads
+        self._cache_lock = threading.Lock()
+        
+        # Largest eth_getLogs block span the provider accepted after a
+        # split; None until the provider has rejected a range. It doubles
+        # after LOG_RANGE_GROW_AFTER successes, so one bad spell doesn't
+        # pin it for the life of the process.
+        self._log_range_limit: Optional[int] = None
+        self._log_range_successes = 0
+        
+        self.cache_db_path = cache_db_path
+        if cache_db_path:
+            self._load_block_timestamps()
+        
+        # Shared module-level constants, kept as attributes for existing callers
+        self.TRANSFER_EVENT_SIGNATURE = TRANSFER_TOPIC
+        self.ERC20_ABI = ERC20_ABI
     
     def get_transfers_hybrid(
         self,
@@ -74,8 +425,11 @@ class TransfersAnalytics:
         from_block: Optional[int] = None,
         to_block: Optional[int] = None,
         max_blocks: int = 10000,
-        use_subgraph: bool = True
-    ) -> List[Dict]:
+        use_subgraph: bool = True,
+        stream: bool = False,
+        limit: Optional[int] = None,
+        order: str = 'asc'
+    ) -> Union[List[Dict], Iterator[Dict]]:
         """
         Hybrid method to get token transfers using both RPC and subgraph.
         
@@ -91,9 +445,21 @@ class TransfersAnalytics:
             to_block: Ending block number (default: latest)
             max_blocks: Maximum block range for RPC queries (default: 10000)
             use_subgraph: Whether to use subgraph for historical data
+            stream: Return an iterator instead of a list. Chunked RPC scans
+                then fetch chunks as the iterator is consumed, so only a few
+                chunks are held in memory at a time; an error while
+                iterating is reported like any other and ends the iterator
+                after the transfers already yielded.
+            limit: Return at most this many transfers. The sources are asked
+                for no more than that, and block timestamps are only fetched
+                for the rows kept.
+            order: 'asc' (oldest first) or 'desc' (newest first); with
+                limit, selects the oldest or newest transfers
             
         Returns:
-            List of transfer events with: from, to, value, block_number, tx_hash, timestamp
+            List (or iterator, with stream=True) of transfer events with:
+            from, to, value, block_number, tx_hash, timestamp.
+            Addresses are lowercase hex; apply Web3.to_checksum_address for display.
         """
         try:
             # Get current block
@@ -111,12 +477,15 @@ class TransfersAnalytics:
             if block_range <= max_blocks:
                 # Small range: Use RPC only
                 print(f"Using RPC only (range: {block_range} blocks)")
-                return self._get_transfers_rpc(
+                transfers = self._get_transfers_rpc(
                     token_address, 
                     wallet_address, 
                     from_block, 
-                    to_block
+                    to_block,
+                    limit,
+                    order
                 )
+                return iter(transfers) if stream else transfers
             
             elif use_subgraph and self.subgraph_client:
                 # Large range: Combine subgraph (historical) + RPC (recent)
@@ -125,42 +494,68 @@ class TransfersAnalytics:
                 # Define cutoff: last 1000 blocks via RPC
                 rpc_cutoff = current_block - 1000
                 
-                # Get historical via subgraph
-                historical_transfers = []
-                if from_block < rpc_cutoff:
-                    print(f"Fetching historical data via subgraph (blocks {from_block} to {rpc_cutoff})")
-                    historical_transfers = self._get_transfers_subgraph(
-                        token_address,
-                        wallet_address,
-                        from_block,
-                        rpc_cutoff
-                    )
+                # The subgraph (historical) and RPC (recent) halves hit
+                # different endpoints, so fetch them concurrently
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    historical_future = None
+                    if from_block < rpc_cutoff:
+                        print(f"Fetching historical data via subgraph (blocks {from_block} to {rpc_cutoff})")
+                        historical_future = executor.submit(
+                            self._get_transfers_subgraph,
+                            token_address,
+                            wallet_address,
+                            from_block,
+                            rpc_cutoff,
+                            limit,
+                            order
+                        )
+                    
+                    recent_future = None
+                    if to_block > rpc_cutoff:
+                        print(f"Fetching recent data via RPC (blocks {rpc_cutoff} to {to_block})")
+                        recent_future = executor.submit(
+                            self._get_transfers_rpc,
+                            token_address,
+                            wallet_address,
+                            rpc_cutoff,
+                            to_block,
+                            limit,
+                            order
+                        )
+                    
+                    historical_transfers = historical_future.result() if historical_future else []
+                    recent_transfers = recent_future.result() if recent_future else []
                 
-                # Get recent via RPC
-                recent_transfers = []
-                if to_block > rpc_cutoff:
-                    print(f"Fetching recent data via RPC (blocks {rpc_cutoff} to {to_block})")
-                    recent_transfers = self._get_transfers_rpc(
-                        token_address,
-                        wallet_address,
-                        rpc_cutoff,
-                        to_block
-                    )
+                # The merge expects block order
+                if order == 'desc':
+                    historical_transfers.reverse()
+                    recent_transfers.reverse()
                 
                 # Merge and deduplicate
                 all_transfers = self._merge_transfers(historical_transfers, recent_transfers)
-                return all_transfers
+                if order == 'desc':
+                    all_transfers.reverse()
+                if limit is not None:
+                    del all_transfers[limit:]
+                return iter(all_transfers) if stream else all_transfers
             
             else:
                 # No subgraph available: chunk RPC queries
                 print(f"Using chunked RPC queries (range: {block_range} blocks)")
-                return self._get_transfers_rpc_chunked(
+                chunks = self._iter_transfers_rpc_chunked(
                     token_address,
                     wallet_address,
                     from_block,
                     to_block,
                     max_blocks
                 )
+                transfers = itertools.chain.from_iterable(chunks)
+                if order == 'desc':
+                    transfers = list(transfers)[::-1]
+                if limit is not None:
+                    # Ascending scans stop fetching chunks once enough are seen
+                    transfers = itertools.islice(transfers, limit)
+                return _stop_on_error(transfers) if stream else list(transfers)
                 
         except Exception as e:
             print(f"Error in get_transfers_hybrid: {e}")
@@ -171,7 +566,9 @@ class TransfersAnalytics:
         token_address: str,
         wallet_address: Optional[str] = None,
         from_block: int = 0,
-        to_block: Optional[int] = None
+        to_block: Optional[int] = None,
+        limit: Optional[int] = None,
+        order: str = 'asc'
     ) -> List[Dict]:
         """
         Get transfers directly from RPC using eth_getLogs
@@ -181,6 +578,8 @@ class TransfersAnalytics:
             wallet_address: Optional wallet to filter
             from_block: Starting block
             to_block: Ending block
+            limit: Keep at most this many transfers
+            order: 'asc' or 'desc' (newest first)
             
         Returns:
             List of transfer events
@@ -193,68 +592,33 @@ class TransfersAnalytics:
                 'fromBlock': from_block,
                 'toBlock': to_block or 'latest',
                 'address': token_address,
-                'topics': [self.TRANSFER_EVENT_SIGNATURE]
+                'topics': [TRANSFER_TOPIC]
             }
             
-            # Add wallet filter if specified
             if wallet_address:
-                wallet_address = self.w3.to_checksum_address(wallet_address)
-                # Pad address to 32 bytes (64 hex chars)
-                padded_wallet = '0x' + wallet_address[2:].zfill(64)
-                
-                # Filter for transfers FROM or TO the wallet
-                # Note: We can't filter both in one query, so we'll filter after
-                filter_params['topics'].append(None)  # This allows any from/to
-            
-            # Get logs
-            logs = self.w3.eth.get_logs(filter_params)
+                # The node filters on the indexed from/to topics, so only the
+                # wallet's own transfers are returned
+                logs = self._get_wallet_logs(filter_params, wallet_address)
+            else:
+                logs = self._get_logs_adaptive(filter_params)
             
             # Get token info for decimals
-            token_contract = self.w3.eth.contract(address=token_address, abi=self.ERC20_ABI)
-            try:
-                decimals = token_contract.functions.decimals().call()
-                symbol = token_contract.functions.symbol().call()
-            except:
-                decimals = 18
-                symbol = "UNKNOWN"
+            decimals, symbol = self._token_meta(token_address)
             
-            # Parse logs
-            transfers = []
-            for log in logs:
-                try:
-                    # Decode transfer event
-                    from_addr = self.w3.to_checksum_address('0x' + log['topics'][1].hex()[26:])
-                    to_addr = self.w3.to_checksum_address('0x' + log['topics'][2].hex()[26:])
-                    value_raw = int(log['data'].hex(), 16)
-                    value = value_raw / (10 ** decimals)
-                    
-                    # Filter by wallet if specified
-                    if wallet_address and wallet_address not in [from_addr, to_addr]:
-                        continue
-                    
-                    # Get block timestamp
-                    block = self.w3.eth.get_block(log['blockNumber'])
-                    timestamp = block['timestamp']
-                    
-                    transfer = {
-                        'from': from_addr,
-                        'to': to_addr,
-                        'value': value,
-                        'value_raw': value_raw,
-                        'decimals': decimals,
-                        'symbol': symbol,
-                        'block_number': log['blockNumber'],
-                        'tx_hash': log['transactionHash'].hex(),
-                        'log_index': log['logIndex'],
-                        'timestamp': timestamp,
-                        'datetime': datetime.fromtimestamp(timestamp).isoformat()
-                    }
-                    
-                    transfers.append(transfer)
-                    
-                except Exception as e:
-                    print(f"Error parsing log: {e}")
-                    continue
+            # Parse logs (timestamps are filled in afterwards, one batch
+            # request for all distinct blocks instead of one call per log)
+            transfers = parse_transfer_logs(logs, decimals, symbol)
+            if order == 'desc':
+                transfers.reverse()
+            if limit is not None:
+                del transfers[limit:]
+            
+            # Get block timestamps
+            timestamps = self._get_block_timestamps(t['block_number'] for t in transfers)
+            for transfer in transfers:
+                timestamp = timestamps[transfer['block_number']]
+                transfer['timestamp'] = timestamp
+                transfer['datetime'] = datetime.fromtimestamp(timestamp).isoformat()
             
             return transfers
             
@@ -262,6 +626,223 @@ class TransfersAnalytics:
             print(f"Error in RPC transfer query: {e}")
             return []
     
+    def _get_logs_adaptive(self, filter_params: Dict) -> List:
+        """
+        eth_getLogs that splits the block range when the provider rejects it
+        
+        Providers cap the block span or result size of eth_getLogs. On such
+        an error the range is bisected and both halves are retried; the
+        largest span that worked is remembered, so later calls (and chunked
+        scans) start from it. Other errors, rate limits included, are raised.
+        
+        Args:
+            filter_params: eth_getLogs filter with integer fromBlock/toBlock
+            
+        Returns:
+            Logs of the whole range, in block order
+        """
+        start, end = filter_params['fromBlock'], filter_params['toBlock']
+        if not isinstance(end, int):
+            return self.w3.eth.get_logs(filter_params)
+        
+        # Pre-split ranges the provider is already known to reject
+        limit = self._log_range_limit
+        if limit and end - start + 1 > limit:
+            logs = []
+            for chunk_start in range(start, end + 1, limit):
+                chunk_end = min(chunk_start + limit - 1, end)
+                logs.extend(self._get_logs_adaptive(
+                    {**filter_params, 'fromBlock': chunk_start, 'toBlock': chunk_end}
+                ))
+            return logs
+        
+        try:
+            logs = self.w3.eth.get_logs(filter_params)
+        except Exception as e:
+            if start >= end or not _is_log_range_error(e):
+                raise
+        else:
+            if limit:
+                self._log_range_accepted(limit)
+            return logs
+        
+        mid = (start + end) // 2
+        with self._cache_lock:
+            self._log_range_limit = max(1, mid - start + 1)
+            self._log_range_successes = 0
+        print(f"Block range {start}-{end} rejected, splitting at {mid}")
+        
+        return (
+            self._get_logs_adaptive({**filter_params, 'toBlock': mid})
+            + self._get_logs_adaptive({**filter_params, 'fromBlock': mid + 1})
+        )
+    
+    def _log_range_accepted(self, limit: int):
+        """Count a call under the learned span, doubling it every LOG_RANGE_GROW_AFTER"""
+        with self._cache_lock:
+            if self._log_range_limit != limit:
+                return
+            self._log_range_successes += 1
+            if self._log_range_successes >= LOG_RANGE_GROW_AFTER:
+                self._log_range_limit = limit * 2
+                self._log_range_successes = 0
+    
+    def _get_wallet_logs(self, filter_params: Dict, wallet_address: str) -> List:
+        """
+        Transfer logs sent or received by a wallet
+        
+        A topic filter can't OR across positions, so the outgoing (topic1)
+        and incoming (topic2) transfers are two eth_getLogs queries, merged
+        back into chain order. Self-transfers match both and are kept once.
+        
+        Args:
+            filter_params: Transfer filter without wallet topics
+            wallet_address: Wallet address
+            
+        Returns:
+            Logs of the wallet's transfers, in block order
+        """
+        # Pad address to 32 bytes (64 hex chars)
+        padded_wallet = '0x' + ZERO_TOPIC_PAD + wallet_address[2:].lower()
+        
+        # Pin 'latest' so both queries see the same range
+        if not isinstance(filter_params['toBlock'], int):
+            filter_params = {**filter_params, 'toBlock': self.w3.eth.block_number}
+        
+        sent = self._get_logs_adaptive({**filter_params, 'topics': [TRANSFER_TOPIC, padded_wallet]})
+        received = self._get_logs_adaptive({**filter_params, 'topics': [TRANSFER_TOPIC, None, padded_wallet]})
+        
+        logs, seen = [], set()
+        for log in heapq.merge(sent, received, key=lambda l: (l['blockNumber'], l['logIndex'])):
+            key = (log['blockNumber'], log['logIndex'])
+            if key not in seen:
+                seen.add(key)
+                logs.append(log)
+        return logs
+    
+    def _contract(self, token_address: str):
+        """ERC20 contract for a checksummed address, built once per token"""
+        contract = self._contract_cache.get(token_address)
+        if contract is None:
+            contract = self.w3.eth.contract(address=token_address, abi=ERC20_ABI)
+            self._contract_cache[token_address] = contract
+        return contract
+    
+    def _token_meta(self, token_address: str) -> Tuple[int, str]:
+        """
+        Get (decimals, symbol) for a checksummed token address
+        
+        Results are kept in an LRU cache for TOKEN_META_TTL_SECONDS.
+        """
+        with self._cache_lock:
+            cached = self._token_meta_cache.get(token_address)
+            if cached and time.monotonic() - cached[2] < TOKEN_META_TTL_SECONDS:
+                self._token_meta_cache.move_to_end(token_address)
+                return cached[0], cached[1]
+        
+        token_contract = self._contract(token_address)
+        try:
+            decimals = token_contract.functions.decimals().call()
+            symbol = token_contract.functions.symbol().call()
+        except:
+            # Not cached, so a transient RPC failure is retried next time
+            return 18, "UNKNOWN"
+        
+        with self._cache_lock:
+            self._token_meta_cache[token_address] = (decimals, symbol, time.monotonic())
+            self._token_meta_cache.move_to_end(token_address)
+            if len(self._token_meta_cache) > TOKEN_META_CACHE_SIZE:
+                self._token_meta_cache.popitem(last=False)
+        
+        return decimals, symbol
+    
+    def _get_block_timestamps(self, block_numbers) -> Dict[int, int]:
+        """
+        Get timestamps for a set of blocks using batched JSON-RPC requests
+        
+        Cached blocks are answered from the LRU cache; only the rest are
+        requested from the RPC.
+        
+        Args:
+            block_numbers: Iterable of block numbers (duplicates allowed)
+            
+        Returns:
+            Dict mapping block number to its timestamp
+        """
+        timestamps = {}
+        missing = []
+        with self._cache_lock:
+            for number in set(block_numbers):
+                if number in self._block_timestamps:
+                    self._block_timestamps.move_to_end(number)
+                    timestamps[number] = self._block_timestamps[number]
+                else:
+                    missing.append(number)
+        
+        blocks = sorted(missing)
+        fetched = {}
+        
+        for i in range(0, len(blocks), BLOCK_BATCH_SIZE):
+            chunk = blocks[i:i + BLOCK_BATCH_SIZE]
+            try:
+                with self.w3.batch_requests() as batch:
+                    for number in chunk:
+                        batch.add(self.w3.eth.get_block(number))
+                    results = batch.execute()
+            except Exception as e:
+                # Provider without batch support: one request per block
+                print(f"Batch block request failed, fetching blocks one by one: {e}")
+                results = [self.w3.eth.get_block(number) for number in chunk]
+            
+            for block in results:
+                fetched[block['number']] = block['timestamp']
+        
+        if fetched:
+            self._cache_block_timestamps(fetched)
+            timestamps.update(fetched)
+        
+        return timestamps
+    
+    def _cache_block_timestamps(self, fetched: Dict[int, int]):
+        """Add timestamps to the LRU cache and, if configured, to SQLite"""
+        with self._cache_lock:
+            self._block_timestamps.update(fetched)
+            while len(self._block_timestamps) > BLOCK_TIMESTAMP_CACHE_SIZE:
+                self._block_timestamps.popitem(last=False)
+        
+        if not self.cache_db_path:
+            return
+        try:
+            with sqlite3.connect(self.cache_db_path) as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO block_timestamps (block_number, timestamp) VALUES (?, ?)",
+                    fetched.items()
+                )
+        except sqlite3.Error as e:
+            print(f"Error persisting block timestamps: {e}")
+    
+    def _load_block_timestamps(self):
+        """Create the block_timestamps table and warm the cache from it"""
+        try:
+            with sqlite3.connect(self.cache_db_path) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS block_timestamps (
+                        block_number INTEGER PRIMARY KEY,
+                        timestamp INTEGER NOT NULL
+                    )
+                """)
+                # Most recent blocks are the likeliest to be queried again
+                rows = conn.execute(
+                    "SELECT block_number, timestamp FROM block_timestamps "
+                    "ORDER BY block_number DESC LIMIT ?",
+                    (BLOCK_TIMESTAMP_CACHE_SIZE,)
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error loading block timestamps: {e}")
+            return
+        
+        self._block_timestamps.update(reversed(rows))
+    
     def _get_transfers_rpc_chunked(
         self,
         token_address: str,
@@ -283,40 +864,99 @@ class TransfersAnalytics:
         Returns:
             Combined list of transfers
         """
-        all_transfers = []
-        current_from = from_block
-        
-        while current_from < to_block:
-            current_to = min(current_from + chunk_size, to_block)
-            
-            print(f"Fetching blocks {current_from} to {current_to}...")
-            chunk_transfers = self._get_transfers_rpc(
-                token_address,
-                wallet_address,
-                current_from,
-                current_to
-            )
+        chunks = self._iter_transfers_rpc_chunked(
+            token_address, wallet_address, from_block, to_block, chunk_size
+        )
+        return [t for chunk in chunks for t in chunk]
+    
+    def _iter_transfers_rpc_chunked(
+        self,
+        token_address: str,
+        wallet_address: Optional[str],
+        from_block: int,
+        to_block: int,
+        chunk_size: int = 10000
+    ) -> Iterator[List[Dict]]:
+        """
+        Yield the transfers of a large block range one chunk at a time
+        
+        Chunks are independent, so up to RPC_CHUNK_WORKERS of them are
+        fetched concurrently. New chunks are only requested as earlier ones
+        are consumed, which bounds memory to a few chunks however long the
+        range is.
+        
+        Args:
+            token_address: Token contract address
+            wallet_address: Optional wallet filter
+            from_block: Starting block
+            to_block: Ending block
+            chunk_size: Size of each chunk
             
-            all_transfers.extend(chunk_transfers)
-            current_from = current_to + 1
+        Yields:
+            Transfers of each chunk, in block order
+        """
+        # Don't plan chunks the provider is known to reject (a chunk spans
+        # chunk_size + 1 blocks)
+        if self._log_range_limit:
+            chunk_size = min(chunk_size, self._log_range_limit - 1)
+        
+        chunks = [
+            (start, min(start + chunk_size, to_block))
+            for start in range(from_block, to_block, chunk_size + 1)
+        ]
+        if not chunks:
+            return
         
-        return all_transfers
+        # Resolve token metadata once instead of racing for it in every chunk
+        try:
+            self._token_meta(self.w3.to_checksum_address(token_address))
+        except Exception as e:
+            print(f"Error fetching token metadata: {e}")
+        
+        def fetch_chunk(chunk):
+            start, end = chunk
+            print(f"Fetching blocks {start} to {end}...")
+            return self._get_transfers_rpc(token_address, wallet_address, start, end)
+        
+        # A window of in-flight chunks, consumed in submission order so the
+        # output stays sorted by block
+        workers = min(RPC_CHUNK_WORKERS, len(chunks))
+        pending_chunks = iter(chunks)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            in_flight = deque(
+                executor.submit(fetch_chunk, chunk)
+                for chunk in itertools.islice(pending_chunks, workers)
+            )
+            while in_flight:
+                chunk_transfers = in_flight.popleft().result()
+                next_chunk = next(pending_chunks, None)
+                if next_chunk is not None:
+                    in_flight.append(executor.submit(fetch_chunk, next_chunk))
+                yield chunk_transfers
     
     def _get_transfers_subgraph(
         self,
         token_address: str,
         wallet_address: Optional[str],
         from_block: int,
-        to_block: int
+        to_block: int,
+        limit: Optional[int] = None,
+        order: str = 'asc'
     ) -> List[Dict]:
         """
         Get transfers from subgraph (e.g., Uniswap, custom indexer)
         
+        Pages through the range with (block number, rows of that block
+        already seen) as the cursor, so ranges with more than one page of
+        transfers are not truncated, even inside one busy block.
+        
         Args:
             token_address: Token contract address
             wallet_address: Optional wallet filter
             from_block: Starting block
             to_block: Ending block
+            limit: Fetch at most this many transfers
+            order: 'asc' or 'desc' (newest first)
             
         Returns:
             List of transfer events
@@ -325,57 +965,57 @@ class TransfersAnalytics:
             return []
         
         try:
-            # Build GraphQL query
-            wallet_filter = ""
+            # Constant documents; only the variables change between calls
+            max_rows = min(limit, MAX_SUBGRAPH_TRANSFERS) if limit is not None else MAX_SUBGRAPH_TRANSFERS
+            variables = {
+                'token': token_address.lower(),
+                'fromBlock': str(from_block),
+                'toBlock': str(to_block),
+                'first': min(SUBGRAPH_PAGE_SIZE, max_rows),
+                'skip': 0,
+                'direction': order
+            }
+            # Descending pages walk the upper bound down instead
+            cursor = 'toBlock' if order == 'desc' else 'fromBlock'
+            query = Q_TRANSFERS
             if wallet_address:
-                wallet_filter = f'''
-                or: [
-                    {{ from: "{wallet_address.lower()}" }},
-                    {{ to: "{wallet_address.lower()}" }}
-                ]
-                '''
-            
-            query = f"""
-            {{
-              transfers(
-                first: 1000,
-                orderBy: blockNumber,
-                orderDirection: asc,
-                where: {{
-                  token: "{token_address.lower()}",
-                  blockNumber_gte: {from_block},
-                  blockNumber_lte: {to_block}
-                  {wallet_filter}
-                }}
-              ) {{
-                id
-                from
-                to
-                value
-                blockNumber
-                timestamp
-                transaction {{
-                  id
-                }}
-              }}
-            }}
-            """
-            
-            result = self.subgraph_client.query(query)
-            
-            if 'data' not in result or 'transfers' not in result['data']:
-                return []
+                variables['wallet'] = wallet_address.lower()
+                query = Q_WALLET_TRANSFERS
+            
+            rows = []
+            while True:
+                result = self.subgraph_client.query(query, variables)
+                
+                if 'data' not in result or 'transfers' not in result['data']:
+                    break
+                
+                page = result['data']['transfers']
+                rows.extend(page)
+                
+                # A short page is the last one
+                if len(page) < variables['first'] or len(rows) >= max_rows:
+                    break
+                variables = _next_block_page(variables, page, cursor)
+            del rows[max_rows:]
+            
+            # Amounts are kept as integer base units; only the display
+            # value is scaled by the token's decimals
+            decimals, symbol = self._token_meta(self.w3.to_checksum_address(token_address))
+            divisor = 10 ** decimals
+            in_base_units = self.subgraph_value_in_base_units
             
             # Convert to standard format
             transfers = []
-            for t in result['data']['transfers']:
+            for t in rows:
+                value_raw = int(t['value']) if in_base_units else _token_amount_raw(t['value'], decimals)
                 transfers.append({
-                    'from': self.w3.to_checksum_address(t['from']),
-                    'to': self.w3.to_checksum_address(t['to']),
-                    'value': float(t['value']),
-                    'value_raw': int(float(t['value']) * 1e18),  # Approximate
-                    'decimals': 18,  # Default, should fetch from contract
-                    'symbol': 'TOKEN',
+                    # Subgraph addresses are already lowercase hex
+                    'from': t['from'],
+                    'to': t['to'],
+                    'value': value_raw / divisor,
+                    'value_raw': value_raw,
+                    'decimals': decimals,
+                    'symbol': symbol,
                     'block_number': int(t['blockNumber']),
                     'tx_hash': t['transaction']['id'],
                     'timestamp': int(t['timestamp']),
@@ -397,6 +1037,11 @@ class TransfersAnalytics:
         """
         Merge and deduplicate transfer lists from different sources
         
+        Both inputs are already ordered by block number (the subgraph query
+        sorts by blockNumber, eth_getLogs returns logs in chain order), so
+        they are merged in one streaming pass instead of concatenated and
+        re-sorted.
+        
         Args:
             historical: Transfers from subgraph
             recent: Transfers from RPC
@@ -404,33 +1049,49 @@ class TransfersAnalytics:
         Returns:
             Deduplicated and sorted list
         """
-        # Use tx_hash + log_index as unique key
-        seen = set()
-        merged = []
-        
-        for transfer in historical + recent:
-            key = f"{transfer['tx_hash']}_{transfer.get('log_index', 0)}"
-            if key not in seen:
-                seen.add(key)
-                merged.append(transfer)
+        ordered = heapq.merge(
+            historical, recent,
+            key=lambda x: (x['block_number'], x.get('log_index', 0))
+        )
         
-        # Sort by block number and log index
-        merged.sort(key=lambda x: (x['block_number'], x.get('log_index', 0)))
+        # Use tx_hash + log_index as unique key. Dicts keep insertion order,
+        # so the values come out in merge order; setdefault keeps the first
+        # row seen for a key, as before.
+        merged = {}
+        for transfer in ordered:
+            merged.setdefault((transfer['tx_hash'], transfer.get('log_index', 0)), transfer)
         
-        return merged
+        return list(merged.values())
     
-    def analyze_transfers(self, transfers: List[Dict], wallet_address: str) -> Dict:
+    def analyze_transfers(
+        self,
+        transfers: Union[Iterable[Dict], TransferBatch],
+        wallet_address: str,
+        use_hll: Optional[bool] = None
+    ) -> Dict:
         """
         Analyze transfers for a specific wallet
         
+        Runs in a single pass with running totals, so transfers may be an
+        iterator (get_transfers_hybrid(..., stream=True)) that is never
+        held in memory as a whole.
+        
         Args:
-            transfers: List of transfer events
+            transfers: Transfer events (list or any iterable), or a TransferBatch
             wallet_address: Wallet to analyze
+            use_hll: Estimate unique_counterparties with HyperLogLog (~1%
+                error, constant memory). Default: only above HLL_THRESHOLD
+                transfers; for iterators of unknown length, once more than
+                HLL_THRESHOLD counterparties have been seen.
             
         Returns:
             Dict with statistics
         """
-        wallet_address = self.w3.to_checksum_address(wallet_address)
+        # Transfers carry lowercase addresses
+        wallet_address = wallet_address.lower()
+        
+        if isinstance(transfers, TransferBatch):
+            return self._analyze_batch(transfers, wallet_address)
         
         stats = {
             'total_transfers': 0,
@@ -438,24 +1099,44 @@ class TransfersAnalytics:
             'sent_count': 0,
             'total_received': 0.0,
             'total_sent': 0.0,
+            'total_received_raw': 0,
+            'total_sent_raw': 0,
             'net_change': 0.0,
-            'unique_counterparties': set(),
+            'unique_counterparties': 0,
             'first_transfer': None,
             'last_transfer': None
         }
         
+        # Iterators have no length; count exactly until the set gets large
+        promote_at = None
+        if use_hll is None:
+            if hasattr(transfers, '__len__'):
+                use_hll = len(transfers) > HLL_THRESHOLD
+            else:
+                use_hll, promote_at = False, HLL_THRESHOLD
+        counterparties = _HyperLogLog() if use_hll else set()
+        
+        # Sum integer base units and scale once at the end, so long
+        # histories don't accumulate float rounding
+        received_raw = sent_raw = 0
         for transfer in transfers:
             if transfer['to'] == wallet_address:
                 # Received
                 stats['received_count'] += 1
-                stats['total_received'] += transfer['value']
-                stats['unique_counterparties'].add(transfer['from'])
+                received_raw += transfer['value_raw']
+                counterparties.add(transfer['from'])
                 
             elif transfer['from'] == wallet_address:
                 # Sent
                 stats['sent_count'] += 1
-                stats['total_sent'] += transfer['value']
-                stats['unique_counterparties'].add(transfer['to'])
+                sent_raw += transfer['value_raw']
+                counterparties.add(transfer['to'])
+            
+            if promote_at and len(counterparties) > promote_at:
+                hll = _HyperLogLog()
+                for address in counterparties:
+                    hll.add(address)
+                counterparties, promote_at = hll, None
             
             stats['total_transfers'] += 1
             
@@ -464,11 +1145,58 @@ class TransfersAnalytics:
                 stats['first_transfer'] = transfer
             stats['last_transfer'] = transfer
         
-        stats['net_change'] = stats['total_received'] - stats['total_sent']
-        stats['unique_counterparties'] = len(stats['unique_counterparties'])
+        divisor = 10 ** (stats['first_transfer'] or {}).get('decimals', 18)
+        stats['total_received_raw'] = received_raw
+        stats['total_sent_raw'] = sent_raw
+        stats['total_received'] = received_raw / divisor
+        stats['total_sent'] = sent_raw / divisor
+        stats['net_change'] = (received_raw - sent_raw) / divisor
+        stats['unique_counterparties'] = len(counterparties)
         
         return stats
     
+    @staticmethod
+    def _analyze_batch(batch: TransferBatch, wallet_address: str) -> Dict:
+        """Vectorised analyze_transfers() for a TransferBatch (lowercase wallet)"""
+        n = len(batch)
+        if wallet_address not in batch.participants:
+            return {
+                'total_transfers': n,
+                'received_count': 0,
+                'sent_count': 0,
+                'total_received': 0.0,
+                'total_sent': 0.0,
+                'total_received_raw': 0,
+                'total_sent_raw': 0,
+                'net_change': 0.0,
+                'unique_counterparties': 0,
+                'first_transfer': batch.row(0) if n else None,
+                'last_transfer': batch.row(n - 1) if n else None
+            }
+        
+        received = batch.to_addr == wallet_address
+        sent = ~received & (batch.from_addr == wallet_address)
+        
+        # value_raw is an object array of Python ints, so these sums are exact
+        received_raw = int(batch.value_raw[received].sum())
+        sent_raw = int(batch.value_raw[sent].sum())
+        divisor = 10 ** batch.decimals
+        counterparties = np.concatenate([batch.from_addr[received], batch.to_addr[sent]])
+        
+        return {
+            'total_transfers': len(batch),
+            'received_count': int(received.sum()),
+            'sent_count': int(sent.sum()),
+            'total_received': received_raw / divisor,
+            'total_sent': sent_raw / divisor,
+            'total_received_raw': received_raw,
+            'total_sent_raw': sent_raw,
+            'net_change': (received_raw - sent_raw) / divisor,
+            'unique_counterparties': len(np.unique(counterparties)),
+            'first_transfer': batch.row(0) if len(batch) else None,
+            'last_transfer': batch.row(len(batch) - 1) if len(batch) else None
+        }
+    
     def get_transfer_summary(
         self,
         token_address: str,
@@ -486,9 +1214,8 @@ class TransfersAnalytics:
         Returns:
             Complete summary with transfers and statistics
         """
-        # Calculate block range (approximate: 1 block per 12 seconds)
-        blocks_per_day = int(24 * 60 * 60 / 12)
-        from_block = self.w3.eth.block_number - (blocks_per_day * days)
+        # Calculate block range from the chain's average block rate
+        from_block = self.w3.eth.block_number - (self.blocks_per_day * days)
         
         # Get transfers
         transfers = self.get_transfers_hybrid(
@@ -5,30 +5,15 @@ Sets up handlers and starts the bot using polling.
 """
 import logging
 from telegram import Update
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, TypeHandler
 
 from config import Config
+from utils.http_session import aclose_async_client
+from utils.rate_limiter import TelegramRateLimiter
 
-# Import existing handlers
-from handlers.basic import start_command, help_command, error_handler
-from handlers.callbacks import button_callback
-
-from handlers.blockchain import (
-    balance_command,
-    gas_command,
-    price_command,
-    track_command,
-    my_wallets_command,
-    untrack_command
-)
-
-# Import new analytics handlers
-from handlers.analytics_commands import (
-    analytics_command,
-    wallet_report_command
-)
-
-from handlers.analytics_callbacks import analytics_callback_handler
+# The handler modules (and the database and clients they create on
+# import) are imported in main(): chart workers are spawned, and spawn
+# re-imports this module in every worker.
 
 # Configure logging
 logging.basicConfig(
@@ -37,8 +22,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def post_shutdown(application: Application):
+    """Close the database, the chart workers and the shared HTTP client once polling has stopped."""
+    from handlers.analytics_commands import shutdown_chart_pool
+    from utils.database import db
+    
+    await aclose_async_client()
+    shutdown_chart_pool()
+    db.close()
+
 def main():
     """Start the bot with all features enabled."""
+    from handlers.basic import start_command, help_command, error_handler
+    from handlers.callbacks import button_callback
+    
+    from handlers.blockchain import (
+        balance_command,
+        gas_command,
+        price_command,
+        track_command,
+        my_wallets_command,
+        untrack_command,
+        rate_limit_check
+    )
+    
+    # Analytics handlers
+    from handlers.analytics_commands import (
+        analytics_command,
+        wallet_report_command
+    )
+    
+    from handlers.analytics_callbacks import analytics_callback_handler
     
     # Validate configuration
     try:
@@ -49,7 +63,17 @@ def main():
         return
     
     # Create application
-    application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+    # Outgoing requests are rate limited here, for every handler at once
+    application = (
+        Application.builder()
+        .token(Config.TELEGRAM_BOT_TOKEN)
+        .rate_limiter(TelegramRateLimiter(max_retries=3))
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    
+    # Per-user command rate limit, checked before any other handler
+    application.add_handler(TypeHandler(Update, rate_limit_check), group=-1)
     
     # ==========================================
     # BASIC COMMANDS
@@ -16,6 +16,10 @@ class Config:
     # Your RPC for real-time data
     RPC_URL = os.getenv("RPC_URL", "https://mainnet.infura.io/v3/YOUR_PROJECT_ID")
     
+    # Average blocks per day on the RPC_URL chain (Ethereum 7200,
+    # BSC ~28800, Polygon ~43200)
+    BLOCKS_PER_DAY = int(os.getenv("BLOCKS_PER_DAY", "7200"))
+    
     # Database path
     DATABASE_PATH = os.getenv("DATABASE_PATH", "bot_data.db")
     
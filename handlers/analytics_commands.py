@@ -2,20 +2,23 @@
 """
 Telegram bot handlers for analytics with chart generation
 """
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
-import matplotlib
-matplotlib.use('Agg')  # Non-interactive backend for server use
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict
+import asyncio
 import io
-import os
+import multiprocessing
 from pathlib import Path
+import numpy as np
+import pandas as pd
+from web3 import Web3
 
 from analytics.token_analytics import TokenAnalytics
 from analytics.transfers_analytics import TransfersAnalytics
+from handlers.charts import render_analytics_png, render_wallet_png
 from utils.graph_helper import CachedGraphClient
 from config import Config
 
@@ -30,9 +33,96 @@ token_analytics = TokenAnalytics(graph_client=graph_client)
 
 transfers_analytics = TransfersAnalytics(
     rpc_url=Config.RPC_URL,
-    subgraph_client=graph_client
+    subgraph_client=graph_client,
+    cache_db_path=Config.DATABASE_PATH,
+    blocks_per_day=Config.BLOCKS_PER_DAY
 )
 
+# Report layouts, formatted with one format_map call per report
+_ANALYTICS_TEMPLATE = (
+    "📊 *{symbol} Analytics* ({days} days)\n\n"
+    "*Token Info:*\n"
+    "Name: {name}\n"
+    "Symbol: {symbol}\n"
+    "Address: `{address_start}...{address_end}`\n\n"
+    "*Price Statistics:*\n"
+    "Current: ${current_price:,.4f}\n"
+    "Change: {price_change:+.2f}%\n"
+    "High: ${high_price:,.4f}\n"
+    "Low: ${low_price:,.4f}\n\n"
+    "*Volume:*\n"
+    "24h: ${volume_24h:,.2f}\n"
+    "{days}d Total: ${total_volume:,.2f}\n\n"
+)
+_TOP_TRADER_LINE = "{rank}. `{address}...`\n   Volume: ${volume:,.0f} ({trades} trades)\n"
+
+_WALLET_TEMPLATE = (
+    "💼 *Wallet Report* ({days} days)\n\n"
+    "*Wallet:*\n`{wallet_address}`\n\n"
+    "*Token:* {symbol}\n\n"
+    "*Activity Summary:*\n"
+    "├ Total Transfers: {total_transfers}\n"
+    "├ Received: {received_count} transfers\n"
+    "├ Sent: {sent_count} transfers\n"
+    "└ Unique Addresses: {unique_counterparties}\n\n"
+    "*Balance Changes:*\n"
+    "├ Total Received: {total_received:,.2f} {symbol}\n"
+    "├ Total Sent: {total_sent:,.2f} {symbol}\n"
+    "└ Net Change: {net_change:+,.2f} {symbol}\n\n"
+)
+_COUNTERPARTY_LINE = "{rank}. `{address}...` ({amount:,.2f} {symbol})\n"
+
+# Transfer fields exported by the CSV button, and their column order
+CSV_SOURCE_COLUMNS = [
+    'timestamp', 'datetime', 'from', 'to', 'value', 'symbol',
+    'tx_hash', 'block_number'
+]
+CSV_COLUMNS = [
+    'timestamp', 'date', 'from', 'to', 'value', 'symbol',
+    'tx_hash', 'block_number'
+]
+
+
+@lru_cache(maxsize=4096)
+def cached_token_info(token_address: str) -> Dict:
+    """
+    Token info for a lowercase address, memoized for the process lifetime
+    
+    The handlers only read symbol and name, which don't change, so every
+    report and button press after the first skips the subgraph lookup.
+    price_eth in the cached dict is not refreshed. Failed lookups raise
+    and are not cached.
+    """
+    return token_analytics.get_token_info(token_address)
+
+
+# Charts render in worker processes so matplotlib never blocks the event
+# loop and concurrent requests use separate cores. Workers are spawned
+# rather than forked, since the bot process is multi-threaded. A render
+# takes well under a second, so a couple of workers keep up.
+CHART_WORKERS = 2
+
+
+@lru_cache(maxsize=None)
+def chart_pool() -> ProcessPoolExecutor:
+    """The chart worker pool, started on the first chart"""
+    return ProcessPoolExecutor(
+        max_workers=CHART_WORKERS,
+        mp_context=multiprocessing.get_context('spawn')
+    )
+
+
+def shutdown_chart_pool():
+    """Stop the chart workers, if any were started"""
+    if chart_pool.cache_info().currsize:
+        chart_pool().shutdown()
+        chart_pool.cache_clear()
+
+# Price history columns plotted by render_analytics_png(). They are sent
+# to the workers as float32 arrays: half the bytes to pickle and plot, and
+# more precision than a chart can show.
+CHART_PRICE_COLUMNS = ['price_usd', 'low', 'high', 'volume_usd']
+
 
 async def analytics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -64,20 +154,39 @@ async def analytics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Invalid token address format")
         return
     
+    await run_analytics(update.message, token_address, days)
+
+
+async def run_analytics(message, token_address: str, days: int):
+    """
+    Build and send a token analytics report (chart, summary, buttons)
+    
+    Shared by /analytics and the analytics refresh buttons, which pass
+    already-parsed arguments.
+    
+    Args:
+        message: Message to reply to
+        token_address: Token contract address
+        days: Days of price history
+    """
     # Send processing message
-    processing_msg = await update.message.reply_text(
+    processing_msg = await message.reply_text(
         "⏳ Generating analytics...\n"
         "This may take a moment."
     )
     
     try:
-        # 1. Get token info
-        token_info = token_analytics.get_token_info(token_address)
+        # 1-2. Get token info and prefetch price history, volume and top
+        # traders (one subgraph response) concurrently
+        token_info, _ = await asyncio.gather(
+            asyncio.to_thread(cached_token_info, token_address.lower()),
+            token_analytics.aprefetch(token_address, days=days, limit=10, ohlc=True)
+        )
         symbol = token_info['symbol']
         name = token_info['name']
         
-        # 2. Get price history
-        price_df = token_analytics.get_price_history(token_address, days=days)
+        # Served from the prefetched bundle
+        price_df = token_analytics.get_price_history_ohlc(token_address, days=days)
         
         if price_df.empty:
             await processing_msg.edit_text(
@@ -93,9 +202,14 @@ async def analytics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         top_traders = token_analytics.get_top_traders(token_address, limit=10)
         
         # 5. Generate charts
-        chart_path = _generate_analytics_chart(price_df, symbol, days)
+        chart_data = {'timestamp': price_df['timestamp'].to_numpy()}
+        for column in CHART_PRICE_COLUMNS:
+            chart_data[column] = price_df[column].to_numpy(dtype=np.float32)
+        png = await asyncio.get_running_loop().run_in_executor(
+            chart_pool(), render_analytics_png, chart_data, symbol, days
+        )
         
-        # 6. Prepare summary text
+        # 6. Prepare summary text (from the float64 frame)
         current_price = price_df['price_usd'].iloc[-1]
         first_price = price_df['price_usd'].iloc[0]
         price_change = ((current_price - first_price) / first_price) * 100
@@ -103,35 +217,36 @@ async def analytics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         low_price = price_df['low'].min()
         total_volume = price_df['volume_usd'].sum()
         
-        summary = f"📊 *{symbol} Analytics* ({days} days)\n\n"
-        summary += f"*Token Info:*\n"
-        summary += f"Name: {name}\n"
-        summary += f"Symbol: {symbol}\n"
-        summary += f"Address: `{token_address[:10]}...{token_address[-8:]}`\n\n"
-        
-        summary += f"*Price Statistics:*\n"
-        summary += f"Current: ${current_price:,.4f}\n"
-        summary += f"Change: {price_change:+.2f}%\n"
-        summary += f"High: ${high_price:,.4f}\n"
-        summary += f"Low: ${low_price:,.4f}\n\n"
-        
-        summary += f"*Volume:*\n"
-        summary += f"24h: ${volume_24h:,.2f}\n"
-        summary += f"{days}d Total: ${total_volume:,.2f}\n\n"
-        
+        summary = _ANALYTICS_TEMPLATE.format_map({
+            'symbol': symbol,
+            'name': name,
+            'days': days,
+            'address_start': token_address[:10],
+            'address_end': token_address[-8:],
+            'current_price': current_price,
+            'price_change': price_change,
+            'high_price': high_price,
+            'low_price': low_price,
+            'volume_24h': volume_24h,
+            'total_volume': total_volume
+        })
         if top_traders:
-            summary += f"*Top 3 Traders (7d):*\n"
-            for i, trader in enumerate(top_traders[:3], 1):
-                summary += f"{i}. `{trader['address'][:10]}...`\n"
-                summary += f"   Volume: ${trader['total_volume_usd']:,.0f} ({trader['trade_count']} trades)\n"
+            summary += "*Top 3 Traders (7d):*\n" + ''.join(
+                _TOP_TRADER_LINE.format(
+                    rank=i,
+                    address=trader['address'][:10],
+                    volume=trader['total_volume_usd'],
+                    trades=trader['trade_count']
+                )
+                for i, trader in enumerate(top_traders[:3], 1)
+            )
         
         # 7. Send chart
-        with open(chart_path, 'rb') as photo:
-            await update.message.reply_photo(
-                photo=photo,
-                caption=summary,
-                parse_mode=ParseMode.MARKDOWN
-            )
+        await message.reply_photo(
+            photo=io.BytesIO(png),
+            caption=summary,
+            parse_mode=ParseMode.MARKDOWN
+        )
         
         # 8. Add action buttons
         keyboard = [
@@ -146,14 +261,13 @@ async def analytics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(
+        await message.reply_text(
             "What would you like to see next?",
             reply_markup=reply_markup
         )
         
         # 9. Clean up
         await processing_msg.delete()
-        os.remove(chart_path)
         
     except Exception as e:
         await processing_msg.edit_text(
@@ -194,28 +308,54 @@ async def wallet_report_command(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text("❌ Invalid wallet address format")
         return
     
+    await run_wallet_report(update.message, wallet_address, token_address, days)
+
+
+async def run_wallet_report(message, wallet_address: str, token_address: str, days: int):
+    """
+    Build and send a wallet transfer report (chart, summary, buttons)
+    
+    Shared by /wallet_report and the wallet refresh buttons, which pass
+    already-parsed arguments.
+    
+    Args:
+        message: Message to reply to
+        wallet_address: Wallet to report on
+        token_address: Token contract address
+        days: Days of transfer history
+    """
     # Send processing message
-    processing_msg = await update.message.reply_text(
+    processing_msg = await message.reply_text(
         "⏳ Generating wallet report...\n"
         "Analyzing transfer history and generating charts.\n"
         "This may take up to a minute for large wallets."
     )
     
     try:
-        # 1. Get token info
-        token_info = token_analytics.get_token_info(token_address)
-        symbol = token_info['symbol']
-        
-        # 2. Get transfer summary
-        summary = transfers_analytics.get_transfer_summary(
-            token_address=token_address,
-            wallet_address=wallet_address,
-            days=days
+        # 1-2. Get token info and the transfer summary concurrently, off the
+        # event loop. Only the symbol depends on token info, so a failed
+        # lookup falls back to the symbol on the transfers.
+        token_info, summary = await asyncio.gather(
+            asyncio.to_thread(cached_token_info, token_address.lower()),
+            asyncio.to_thread(
+                transfers_analytics.get_transfer_summary,
+                token_address=token_address,
+                wallet_address=wallet_address,
+                days=days
+            ),
+            return_exceptions=True
         )
+        if isinstance(summary, BaseException):
+            raise summary
         
         transfers = summary['transfers']
         stats = summary['stats']
         
+        if isinstance(token_info, dict):
+            symbol = token_info['symbol']
+        else:
+            symbol = transfers[0]['symbol'] if transfers else 'Unknown'
+        
         if not transfers:
             await processing_msg.edit_text(
                 f"❌ No {symbol} transfers found for this wallet in the last {days} days."
@@ -223,78 +363,85 @@ async def wallet_report_command(update: Update, context: ContextTypes.DEFAULT_TY
             return
         
         # 3. Generate charts
-        chart_path = _generate_wallet_chart(transfers, wallet_address, symbol, days)
-        
-        # 4. Analyze counterparties
-        from collections import Counter
-        senders = Counter()
-        receivers = Counter()
+        png = await asyncio.get_running_loop().run_in_executor(
+            chart_pool(), render_wallet_png,
+            {
+                'timestamp': [t['timestamp'] for t in transfers],
+                'to': [t['to'] for t in transfers],
+                'value': np.fromiter((t['value'] for t in transfers), dtype=np.float32,
+                                     count=len(transfers))
+            },
+            wallet_address, symbol, days
+        )
         
-        for t in transfers:
-            if t['to'].lower() == wallet_address.lower():
-                senders[t['from']] += t['value']
-            else:
-                receivers[t['to']] += t['value']
+        # 4. Analyze counterparties: one grouped sum over
+        # (direction, counterparty) instead of per-transfer dict updates
+        df = pd.DataFrame(transfers, columns=['from', 'to', 'value'])
+        received = df['to'].str.lower().to_numpy() == wallet_address.lower()
+        totals = df['value'].groupby(
+            [np.where(received, 'in', 'out'), np.where(received, df['from'], df['to'])],
+            sort=False
+        ).sum()
         
-        top_senders = senders.most_common(3)
-        top_receivers = receivers.most_common(3)
+        senders = totals.get('in')
+        receivers = totals.get('out')
+        top_senders = list(senders.nlargest(3).items()) if senders is not None else []
+        top_receivers = list(receivers.nlargest(3).items()) if receivers is not None else []
         
         # 5. Prepare report
-        report = f"💼 *Wallet Report* ({days} days)\n\n"
-        report += f"*Wallet:*\n`{wallet_address}`\n\n"
-        report += f"*Token:* {symbol}\n\n"
-        
-        report += f"*Activity Summary:*\n"
-        report += f"├ Total Transfers: {stats['total_transfers']}\n"
-        report += f"├ Received: {stats['received_count']} transfers\n"
-        report += f"├ Sent: {stats['sent_count']} transfers\n"
-        report += f"└ Unique Addresses: {stats['unique_counterparties']}\n\n"
-        
-        report += f"*Balance Changes:*\n"
-        report += f"├ Total Received: {stats['total_received']:,.2f} {symbol}\n"
-        report += f"├ Total Sent: {stats['total_sent']:,.2f} {symbol}\n"
-        report += f"└ Net Change: {stats['net_change']:+,.2f} {symbol}\n\n"
+        parts = [_WALLET_TEMPLATE.format_map({
+            **stats,
+            'days': days,
+            'wallet_address': wallet_address,
+            'symbol': symbol
+        })]
         
         if top_senders:
-            report += f"*Top Senders:*\n"
-            for i, (addr, amount) in enumerate(top_senders, 1):
-                report += f"{i}. `{addr[:10]}...` ({amount:,.2f} {symbol})\n"
-            report += "\n"
+            parts.append("*Top Senders:*\n")
+            parts.extend(
+                _COUNTERPARTY_LINE.format(rank=i, address=addr[:10], amount=amount, symbol=symbol)
+                for i, (addr, amount) in enumerate(top_senders, 1)
+            )
+            parts.append("\n")
         
         if top_receivers:
-            report += f"*Top Receivers:*\n"
-            for i, (addr, amount) in enumerate(top_receivers, 1):
-                report += f"{i}. `{addr[:10]}...` ({amount:,.2f} {symbol})\n"
+            parts.append("*Top Receivers:*\n")
+            parts.extend(
+                _COUNTERPARTY_LINE.format(rank=i, address=addr[:10], amount=amount, symbol=symbol)
+                for i, (addr, amount) in enumerate(top_receivers, 1)
+            )
         
         # 6. Calculate activity metrics
         if stats['total_transfers'] > 0:
             avg_per_day = stats['total_transfers'] / days
-            report += f"\n*Activity Metrics:*\n"
-            report += f"├ Avg transfers/day: {avg_per_day:.1f}\n"
+            parts.append(f"\n*Activity Metrics:*\n")
+            parts.append(f"├ Avg transfers/day: {avg_per_day:.1f}\n")
             
             if stats['received_count'] > 0:
                 avg_received = stats['total_received'] / stats['received_count']
-                report += f"├ Avg received/transfer: {avg_received:,.2f} {symbol}\n"
+                parts.append(f"├ Avg received/transfer: {avg_received:,.2f} {symbol}\n")
             
             if stats['sent_count'] > 0:
                 avg_sent = stats['total_sent'] / stats['sent_count']
-                report += f"└ Avg sent/transfer: {avg_sent:,.2f} {symbol}\n"
+                parts.append(f"└ Avg sent/transfer: {avg_sent:,.2f} {symbol}\n")
         
         # 7. Add timestamps
         if stats['first_transfer']:
-            first_date = datetime.fromisoformat(stats['first_transfer']['datetime']).strftime('%Y-%m-%d')
-            last_date = datetime.fromisoformat(stats['last_transfer']['datetime']).strftime('%Y-%m-%d')
-            report += f"\n*Period:*\n"
-            report += f"First: {first_date}\n"
-            report += f"Last: {last_date}\n"
+            # ISO 8601 strings start with the YYYY-MM-DD date
+            first_date = stats['first_transfer']['datetime'][:10]
+            last_date = stats['last_transfer']['datetime'][:10]
+            parts.append(f"\n*Period:*\n")
+            parts.append(f"First: {first_date}\n")
+            parts.append(f"Last: {last_date}\n")
+        
+        report = ''.join(parts)
         
         # 8. Send chart
-        with open(chart_path, 'rb') as photo:
-            await update.message.reply_photo(
-                photo=photo,
-                caption=report,
-                parse_mode=ParseMode.MARKDOWN
-            )
+        await message.reply_photo(
+            photo=io.BytesIO(png),
+            caption=report,
+            parse_mode=ParseMode.MARKDOWN
+        )
         
         # 9. Add action buttons
         keyboard = [
@@ -309,14 +456,13 @@ async def wallet_report_command(update: Update, context: ContextTypes.DEFAULT_TY
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(
+        await message.reply_text(
             "Additional options:",
             reply_markup=reply_markup
         )
         
         # 10. Clean up
         await processing_msg.delete()
-        os.remove(chart_path)
         
     except Exception as e:
         import traceback
@@ -328,125 +474,6 @@ async def wallet_report_command(update: Update, context: ContextTypes.DEFAULT_TY
         print(f"Wallet report error: {error_details}")
 
 
-def _generate_analytics_chart(df, symbol: str, days: int) -> str:
-    """
-    Generate analytics chart with price and volume
-    
-    Returns:
-        Path to saved chart image
-    """
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), height_ratios=[2, 1])
-    
-    # Price chart
-    ax1.plot(df['timestamp'], df['price_usd'], linewidth=2, color='#2962FF', label='Price')
-    ax1.fill_between(df['timestamp'], df['low'], df['high'], alpha=0.2, color='#2962FF')
-    ax1.set_ylabel('Price (USD)', fontsize=12, fontweight='bold')
-    ax1.set_title(f'{symbol} Price & Volume ({days} days)', fontsize=14, fontweight='bold')
-    ax1.grid(True, alpha=0.3)
-    ax1.legend()
-    
-    # Format price axis
-    current_price = df['price_usd'].iloc[-1]
-    if current_price < 0.01:
-        ax1.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:.6f}'))
-    elif current_price < 1:
-        ax1.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:.4f}'))
-    else:
-        ax1.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.2f}'))
-    
-    # Volume chart
-    colors = ['#4CAF50' if df['price_usd'].iloc[i] >= df['price_usd'].iloc[i-1] 
-              else '#F44336' if i > 0 else '#4CAF50' for i in range(len(df))]
-    ax2.bar(df['timestamp'], df['volume_usd'], color=colors, alpha=0.7)
-    ax2.set_ylabel('Volume (USD)', fontsize=12, fontweight='bold')
-    ax2.set_xlabel('Date', fontsize=12, fontweight='bold')
-    ax2.grid(True, alpha=0.3, axis='y')
-    
-    # Format volume axis
-    ax2.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x/1e6:.1f}M' if x >= 1e6 else f'${x/1e3:.1f}K'))
-    
-    # Format x-axis
-    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
-    ax2.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
-    
-    plt.tight_layout()
-    
-    # Save to file
-    chart_path = f'/tmp/analytics_{symbol}_{int(datetime.now().timestamp())}.png'
-    plt.savefig(chart_path, dpi=100, bbox_inches='tight')
-    plt.close()
-    
-    return chart_path
-
-
-def _generate_wallet_chart(transfers, wallet_address: str, symbol: str, days: int) -> str:
-    """
-    Generate wallet activity chart
-    
-    Returns:
-        Path to saved chart image
-    """
-    # Convert to DataFrame for easier plotting
-    import pandas as pd
-    df = pd.DataFrame(transfers)
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-    df['date'] = df['timestamp'].dt.date
-    
-    # Separate incoming and outgoing
-    df['direction'] = df.apply(
-        lambda row: 'in' if row['to'].lower() == wallet_address.lower() else 'out',
-        axis=1
-    )
-    
-    # Daily aggregation
-    daily_in = df[df['direction'] == 'in'].groupby('date')['value'].sum()
-    daily_out = df[df['direction'] == 'out'].groupby('date')['value'].sum()
-    
-    # Create date range
-    date_range = pd.date_range(
-        start=df['date'].min(),
-        end=df['date'].max(),
-        freq='D'
-    )
-    daily_in = daily_in.reindex(date_range, fill_value=0)
-    daily_out = daily_out.reindex(date_range, fill_value=0)
-    
-    # Plot
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), height_ratios=[2, 1])
-    
-    # Cumulative balance chart
-    cumulative = (daily_in - daily_out).cumsum()
-    ax1.fill_between(date_range, 0, cumulative, alpha=0.3, color='#2196F3')
-    ax1.plot(date_range, cumulative, linewidth=2, color='#2196F3', label='Net Balance Change')
-    ax1.set_ylabel(f'Cumulative {symbol}', fontsize=12, fontweight='bold')
-    ax1.set_title(f'Wallet Activity Report ({days} days)', fontsize=14, fontweight='bold')
-    ax1.grid(True, alpha=0.3)
-    ax1.legend()
-    ax1.axhline(y=0, color='gray', linestyle='--', alpha=0.5)
-    
-    # Daily transfer volume chart
-    ax2.bar(date_range, daily_in, alpha=0.7, color='#4CAF50', label='Received')
-    ax2.bar(date_range, -daily_out, alpha=0.7, color='#F44336', label='Sent')
-    ax2.set_ylabel(f'{symbol} Volume', fontsize=12, fontweight='bold')
-    ax2.set_xlabel('Date', fontsize=12, fontweight='bold')
-    ax2.grid(True, alpha=0.3, axis='y')
-    ax2.legend()
-    ax2.axhline(y=0, color='gray', linestyle='-', alpha=0.5)
-    
-    # Format x-axis
-    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
-    ax2.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
-    
-    plt.tight_layout()
-    
-    # Save to file
-    chart_path = f'/tmp/wallet_{wallet_address[:10]}_{int(datetime.now().timestamp())}.png'
-    plt.savefig(chart_path, dpi=100, bbox_inches='tight')
-    plt.close()
-    
-    return chart_path
-
-
 async def export_csv_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Export wallet transfers to CSV"""
     query = update.callback_query
@@ -454,14 +481,16 @@ async def export_csv_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     # Parse callback data
     parts = query.data.split('_')
-    wallet_address = parts[1]
-    token_address = parts[2]
-    
+    await export_transfers_csv(query, parts[1], parts[2])
+
+
+async def export_transfers_csv(query, wallet_address: str, token_address: str):
+    """Send a CSV of a wallet's token transfers in reply to a callback query"""
     await query.message.reply_text("⏳ Generating CSV export...")
     
     try:
         # Get token info
-        token_info = token_analytics.get_token_info(token_address)
+        token_info = cached_token_info(token_address.lower())
         symbol = token_info['symbol']
         
         # Get transfers
@@ -471,38 +500,28 @@ async def export_csv_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
             days=90
         )
         
-        # Create CSV
-        import csv
-        csv_path = f'/tmp/transfers_{wallet_address[:10]}_{symbol}.csv'
+        # Create CSV: one DataFrame and pandas' C writer instead of a
+        # DictWriter row at a time
+        df = pd.DataFrame(summary['transfers'], columns=CSV_SOURCE_COLUMNS)
+        df = df.rename(columns={'datetime': 'date'})
+        df['symbol'] = df['symbol'].fillna(symbol)
         
-        with open(csv_path, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                'timestamp', 'date', 'from', 'to', 'value', 'symbol', 
-                'tx_hash', 'block_number'
-            ])
-            writer.writeheader()
-            
-            for t in summary['transfers']:
-                writer.writerow({
-                    'timestamp': t['timestamp'],
-                    'date': t['datetime'],
-                    'from': t['from'],
-                    'to': t['to'],
-                    'value': t['value'],
-                    'symbol': t.get('symbol', symbol),
-                    'tx_hash': t['tx_hash'],
-                    'block_number': t['block_number']
-                })
+        # Transfers carry lowercase addresses; export EIP-55 form, computed
+        # once per distinct address
+        for column in ('from', 'to'):
+            checksummed = {a: Web3.to_checksum_address(a) for a in df[column].unique()}
+            df[column] = df[column].map(checksummed)
         
-        # Send file
-        with open(csv_path, 'rb') as f:
-            await query.message.reply_document(
-                document=f,
-                filename=f'transfers_{symbol}_{wallet_address[:10]}.csv',
-                caption=f"📊 Transfer history exported\n{len(summary['transfers'])} transfers"
-            )
+        # Built in memory and sent from the buffer, no temp file
+        buf = io.BytesIO()
+        df.to_csv(buf, index=False, columns=CSV_COLUMNS, encoding='utf-8')
+        buf.seek(0)
         
-        os.remove(csv_path)
+        # Send file
+        await query.message.reply_document(
+            document=InputFile(buf, filename=f'transfers_{symbol}_{wallet_address[:10]}.csv'),
+            caption=f"📊 Transfer history exported\n{len(summary['transfers'])} transfers"
+        )
         
     except Exception as e:
         await query.message.reply_text(f"❌ Export failed: {str(e)}")
@@ -3,22 +3,20 @@ Basic bot command handlers.
 Handles /start, /help, and general user interactions.
 """
 import logging
+import traceback
+from functools import cache
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, Forbidden, InvalidToken, NetworkError, TelegramError, TimedOut
+
+from config import Config
 
 logger = logging.getLogger(__name__)
 
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """
-    Handler for /start command.
-    
-    This is the first command users will interact with.
-    Should be welcoming and explain what the bot can do.
-    """
-    user = update.effective_user
-    welcome_message = f"""
-👋 Welcome {user.mention_html()}, 
+# Reply texts are built once at import; /start only substitutes the user
+_WELCOME_TEMPLATE = """
+👋 Welcome {user}, 
 
 I'm your *Crypto Analytics Bot*! Here's what I can do:
 
@@ -43,13 +41,8 @@ Try: <code>/analytics 0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2 7</code>
 - All addresses must start with 0x
 - Use /help for detailed examples
 """
-    
-    await update.message.reply_html(welcome_message)
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Send a message when the command /help is issued."""
-    
-    help_text = """
+_HELP_TEXT = """
 📚 *Bot Commands Guide*
 
 ━━━━━━━━━━━━━━━━━━━━━━━
@@ -102,9 +95,40 @@ List all your tracked wallets
 
 ━━━━━━━━━━━━━━━━━━━━━━━
 """
+
+# User-friendly error messages, keyed by exception class (exact type, as
+# the lookup by class name was). InvalidToken is PTB's successor of the
+# old Unauthorized error.
+_ERROR_MESSAGES = {
+    BadRequest: "⚠️ Invalid request. Please check your input and try again.",
+    InvalidToken: "⚠️ Bot token is invalid. Please contact support.",
+    Forbidden: "⚠️ I don't have permission to do that.",
+    NetworkError: "⚠️ Network error. Please try again in a moment.",
+    TimedOut: "⚠️ Request timed out. Please try again.",
+}
+_DEFAULT_ERROR_MESSAGE = "⚠️ An unexpected error occurred."
+
+
+@cache
+def _admin_chat_id():
+    """Chat that receives error reports (Config.ADMIN_USER_ID), if configured"""
+    return getattr(Config, 'ADMIN_USER_ID', None)
+
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handler for /start command.
     
+    This is the first command users will interact with.
+    Should be welcoming and explain what the bot can do.
+    """
+    user = update.effective_user
+    await update.message.reply_html(_WELCOME_TEMPLATE.format(user=user.mention_html()))
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send a message when the command /help is issued."""
     await update.message.reply_text(
-        help_text,
+        _HELP_TEXT,
         parse_mode=ParseMode.MARKDOWN
     )
 
@@ -113,30 +137,14 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Comprehensive error handler.
     Logs errors and provides user-friendly messages.
     """
-    import traceback
-    from telegram.error import TelegramError
-    from config import Config
+    error = context.error
     
     # Log the error
-    logger = logging.getLogger(__name__)
-    logger.error("Exception while handling an update:", exc_info=context.error)
-    
-    # Extract error information
-    tb_list = traceback.format_exception(None, context.error, context.error.__traceback__)
-    tb_string = ''.join(tb_list)
-    
-    # User-friendly error messages
-    error_messages = {
-        'BadRequest': "⚠️ Invalid request. Please check your input and try again.",
-        'Unauthorized': "⚠️ Bot token is invalid. Please contact support.",
-        'Forbidden': "⚠️ I don't have permission to do that.",
-        'NetworkError': "⚠️ Network error. Please try again in a moment.",
-        'TimedOut': "⚠️ Request timed out. Please try again.",
-    }
+    logger.error("Exception while handling an update:", exc_info=error)
     
     # Get error type
-    error_type = type(context.error).__name__
-    user_message = error_messages.get(error_type, "⚠️ An unexpected error occurred.")
+    error_type = type(error)
+    user_message = _ERROR_MESSAGES.get(error_type, _DEFAULT_ERROR_MESSAGE)
     
     # Send message to user
     if update and update.effective_message:
@@ -145,15 +153,22 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"{user_message}\n\n"
                 "If this persists, please contact support."
             )
-        except:
-            pass  # Can't send message to user
+        except TelegramError as e:
+            # Can't send message to user
+            logger.warning("Failed to send error message to user: %s", e)
     
     # Optionally send error to admin
-    if hasattr(Config, 'ADMIN_USER_ID') and Config.ADMIN_USER_ID:
+    admin_chat_id = _admin_chat_id()
+    if admin_chat_id:
+        # Only the admin sees the traceback, so only format it here (and
+        # only its innermost frames)
+        tb_string = ''.join(traceback.format_exception(
+            None, error, error.__traceback__, limit=-5
+        ))
         try:
             await context.bot.send_message(
-                chat_id=Config.ADMIN_USER_ID,
-                text=f"⚠️ Error occurred:\n\n{error_type}\n\n{str(context.error)[:500]}"
+                chat_id=admin_chat_id,
+                text=f"⚠️ Error occurred:\n\n{error_type.__name__}\n\n{str(error)[:500]}\n\n{tb_string[-2000:]}"
             )
-        except:
-            pass
+        except TelegramError as e:
+            logger.warning("Failed to send error report to admin: %s", e)
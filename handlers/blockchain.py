@@ -2,33 +2,128 @@
 Blockchain-related command handlers.
 Implements /balance, /gas, /price, /track commands.
 """
-from functools import wraps
+import asyncio
+from functools import lru_cache
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from telegram.constants import ParseMode
 
 from utils.web3_helper import web3_helper
 from utils.validators import Validators
 from utils.database import db
 from utils.rate_limiter import rate_limiter
+from utils.cache_helper import AsyncTTLCache
 
-def rate_limited(func):
-    """Decorator to add rate limiting to commands."""
-    @wraps(func)
-    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_id = update.effective_user.id
-        
-        if not rate_limiter.is_allowed(user_id):
-            wait_time = rate_limiter.get_wait_time(user_id)
-            await update.message.reply_text(
-                f"⏳ Rate limit exceeded. Please wait {wait_time} seconds."
-            )
-            return
-        
-        return await func(update, context)
+# Short-lived cache for RPC/price lookups, so bursts of identical
+# requests share one upstream call
+BALANCE_TTL_SECONDS = 15
+GAS_TTL_SECONDS = 5
+PRICE_TTL_SECONDS = 30
+rpc_cache = AsyncTTLCache()
+
+# Lookups that finish within this time are answered with a single reply;
+# slower ones first post a "Fetching..." message and then edit it
+FAST_REPLY_SECONDS = 0.4
+
+
+@lru_cache(maxsize=4096)
+def short_address(address: str, head: int = 6, tail: int = 4) -> str:
+    """Shortened address for display, e.g. 0xd8dA...6045"""
+    return f"{address[:head]}...{address[-tail:]}"
+
+
+ETHERSCAN_ADDRESS_URL = "https://etherscan.io/address/{}"
+
+
+@lru_cache(maxsize=1024)
+def balance_keyboard(address: str) -> InlineKeyboardMarkup:
+    """
+    Inline keyboard with action buttons for a balance report
+    
+    Telegram objects are immutable, so one markup per address is reused.
+    """
+    keyboard = [
+        [
+            InlineKeyboardButton("🔄 Refresh", callback_data=f"refresh_balance:{address}"),
+            InlineKeyboardButton("📊 Track", callback_data=f"track_wallet:{address}")
+        ],
+        [
+            InlineKeyboardButton("🔗 View on Etherscan", url=ETHERSCAN_ADDRESS_URL.format(address))
+        ]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+
+async def cached_eth_balance(address: str, force: bool = False) -> float:
+    """ETH balance of address, cached for BALANCE_TTL_SECONDS (force skips the cache)"""
+    return await rpc_cache.get_or_fetch(
+        f"bal:{address.lower()}", BALANCE_TTL_SECONDS,
+        lambda: asyncio.to_thread(web3_helper.get_eth_balance, address),
+        force=force
+    )
+
+
+async def cached_gas_prices() -> dict:
+    """Current gas prices, cached for GAS_TTL_SECONDS"""
+    return await rpc_cache.get_or_fetch(
+        "gas", GAS_TTL_SECONDS,
+        lambda: asyncio.to_thread(web3_helper.get_gas_prices)
+    )
+
+
+async def cached_token_price(symbol: str) -> dict:
+    """CoinGecko price data for symbol, cached for PRICE_TTL_SECONDS"""
+    return await rpc_cache.get_or_fetch(
+        f"price:{symbol.lower()}", PRICE_TTL_SECONDS,
+        lambda: web3_helper.aget_token_price(symbol)
+    )
+
+
+async def start_lookup(update: Update, coro, progress_text: str):
+    """
+    Start a lookup, posting progress_text only if it is not done within
+    FAST_REPLY_SECONDS
     
-    return wrapper
+    Returns:
+        (task, processing_msg): the lookup task, and the progress message
+        or None if none was sent
+    """
+    task = asyncio.ensure_future(coro)
+    done, _ = await asyncio.wait({task}, timeout=FAST_REPLY_SECONDS)
+    if done:
+        return task, None
+    return task, await update.message.reply_text(progress_text)
+
+
+async def send_result(update: Update, processing_msg, text: str, **kwargs):
+    """Edit the progress message into the result, or reply if there is none"""
+    if processing_msg is None:
+        return await update.message.reply_text(text, **kwargs)
+    return await processing_msg.edit_text(text, **kwargs)
+
+
+async def rate_limit_check(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Rate limit commands per user.
+    
+    Registered once as a TypeHandler in a group before all other handlers,
+    so every command passes one check and no handler needs wrapping.
+    Other updates (button presses, plain messages) are not counted.
+    """
+    message = update.message
+    if not (message and message.text and message.text.startswith('/')):
+        return
+    if update.effective_user is None:
+        return
+    
+    user_id = update.effective_user.id
+    if not rate_limiter.is_allowed(user_id):
+        wait_time = rate_limiter.get_wait_time(user_id)
+        await message.reply_text(
+            f"⏳ Rate limit exceeded. Please wait {wait_time} seconds."
+        )
+        raise ApplicationHandlerStop
 
-@rate_limited
 async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for /balance command with inline keyboard."""
     if not context.args:
@@ -44,52 +139,46 @@ async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"❌ Invalid address: {error_msg}")
         return
     
-    processing_msg = await update.message.reply_text("🔍 Fetching balance...")
+    task, processing_msg = await start_lookup(
+        update, cached_eth_balance(address), "🔍 Fetching balance..."
+    )
     
     try:
-        balance = web3_helper.get_eth_balance(address)
+        balance = await task
         
-        # Create inline keyboard with action buttons
-        keyboard = [
-            [
-                InlineKeyboardButton("🔄 Refresh", callback_data=f"refresh_balance:{address}"),
-                InlineKeyboardButton("📊 Track", callback_data=f"track_wallet:{address}")
-            ],
-            [
-                InlineKeyboardButton("🔗 View on Etherscan", url=f"https://etherscan.io/address/{address}")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = balance_keyboard(address)
         
         response = f"""
 💰 **Balance Report**
 
-**Address:** `{address[:6]}...{address[-4:]}`
-**Balance:** {Validators.format_eth_amount(balance)} ETH
+**Address:** `{short_address(address)}`
+**Balance:** {balance:.4f} ETH
 
 _Click buttons below for actions_
 """
         
-        await processing_msg.edit_text(
+        await send_result(
+            update, processing_msg,
             response,
-            parse_mode='Markdown',
+            parse_mode=ParseMode.MARKDOWN,
             reply_markup=reply_markup
         )
         
     except Exception as e:
-        await processing_msg.edit_text(f"❌ Error: {str(e)}")
+        await send_result(update, processing_msg, f"❌ Error: {str(e)}")
 
-@rate_limited
 async def gas_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handler for /gas command.
     
     Returns current gas prices for slow/average/fast transactions.
     """
-    processing_msg = await update.message.reply_text("⛽ Fetching gas prices...")
+    task, processing_msg = await start_lookup(
+        update, cached_gas_prices(), "⛽ Fetching gas prices..."
+    )
     
     try:
-        gas_prices = web3_helper.get_gas_prices()
+        gas_prices = await task
         
         response = f"""
 ⛽ **Current Gas Prices**
@@ -108,14 +197,14 @@ async def gas_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 💡 **Tip:** Use slow gas for non-urgent transactions to save money!
 """
         
-        await processing_msg.edit_text(response, parse_mode='Markdown')
+        await send_result(update, processing_msg, response, parse_mode=ParseMode.MARKDOWN)
         
     except Exception as e:
-        await processing_msg.edit_text(
+        await send_result(
+            update, processing_msg,
             f"❌ Error fetching gas prices: {str(e)}"
         )
 
-@rate_limited
 async def price_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handler for /price command.
@@ -133,10 +222,12 @@ async def price_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     symbol = context.args[0]
-    processing_msg = await update.message.reply_text(f"💱 Fetching {symbol.upper()} price...")
+    task, processing_msg = await start_lookup(
+        update, cached_token_price(symbol), f"💱 Fetching {symbol.upper()} price..."
+    )
     
     try:
-        price_data = web3_helper.get_token_price(symbol)
+        price_data = await task
         
         # Format change with emoji
         change = price_data['change_24h']
@@ -155,14 +246,14 @@ async def price_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 _Data from CoinGecko_
 """
         
-        await processing_msg.edit_text(response, parse_mode='Markdown')
+        await send_result(update, processing_msg, response, parse_mode=ParseMode.MARKDOWN)
         
     except Exception as e:
-        await processing_msg.edit_text(
+        await send_result(
+            update, processing_msg,
             f"❌ Error fetching price: {str(e)}"
         )
 
-@rate_limited
 async def track_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handler for /track command.
@@ -191,20 +282,20 @@ async def track_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     
     # Add to database
-    success = db.add_tracked_wallet(user_id, address, label)
+    success = await asyncio.to_thread(db.add_tracked_wallet, user_id, address, label)
     
     if success:
         # Get current balance
         try:
-            balance = web3_helper.get_eth_balance(address)
-            db.update_last_balance(user_id, address, balance)
+            balance = await cached_eth_balance(address)
+            await asyncio.to_thread(db.update_last_balance, user_id, address, balance)
             
             response = f"""
 ✅ **Wallet Added to Tracking**
 
-**Address:** `{address[:10]}...{address[-8:]}`
+**Address:** `{short_address(address, 10, 8)}`
 **Label:** {label or 'No label'}
-**Current Balance:** {Validators.format_eth_amount(balance)} ETH
+**Current Balance:** {balance:.4f} ETH
 
 Use /mywallets to see all tracked wallets.
 """
@@ -212,13 +303,13 @@ Use /mywallets to see all tracked wallets.
             response = f"""
 ✅ **Wallet Added to Tracking**
 
-**Address:** `{address[:10]}...{address[-8:]}`
+**Address:** `{short_address(address, 10, 8)}`
 **Label:** {label or 'No label'}
 
 ⚠️ Could not fetch initial balance: {str(e)}
 """
         
-        await update.message.reply_text(response, parse_mode='Markdown')
+        await update.message.reply_text(response, parse_mode=ParseMode.MARKDOWN)
     else:
         await update.message.reply_text(
             "⚠️ You're already tracking this wallet!\n"
@@ -228,7 +319,7 @@ Use /mywallets to see all tracked wallets.
 async def my_wallets_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show all wallets being tracked by this user."""
     user_id = update.effective_user.id
-    wallets = db.get_tracked_wallets(user_id)
+    wallets = await asyncio.to_thread(db.get_tracked_wallets, user_id)
     
     if not wallets:
         await update.message.reply_text(
@@ -237,24 +328,40 @@ async def my_wallets_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return
     
-    response = "👛 **Your Tracked Wallets**\n\n"
+    # Refresh all balances concurrently; a failed lookup shows the last
+    # known balance instead
+    balances = await asyncio.gather(
+        *(cached_eth_balance(wallet['wallet_address']) for wallet in wallets),
+        return_exceptions=True
+    )
+    fresh = [
+        (wallet['wallet_address'], balance)
+        for wallet, balance in zip(wallets, balances)
+        if not isinstance(balance, BaseException)
+    ]
+    if fresh:
+        await asyncio.to_thread(db.update_last_balances, user_id, fresh)
     
-    for wallet in wallets:
+    parts = ["👛 **Your Tracked Wallets**\n\n"]
+    
+    for wallet, balance in zip(wallets, balances):
         address = wallet['wallet_address']
         label = wallet['label'] or 'No label'
-        balance = wallet['last_balance']
+        if isinstance(balance, BaseException):
+            balance = wallet['last_balance']
         balance_text = f"{balance:.4f} ETH" if balance else "Unknown"
         
-        response += f"""
+        parts.append(f"""
 **{label}**
-`{address[:10]}...{address[-8:]}`
+`{short_address(address, 10, 8)}`
 Balance: {balance_text}
 ---
-"""
+""")
     
-    response += "\n💡 Use /untrack <address> to stop tracking a wallet"
+    parts.append("\n💡 Use /untrack <address> to stop tracking a wallet")
+    response = ''.join(parts)
     
-    await update.message.reply_text(response, parse_mode='Markdown')
+    await update.message.reply_text(response, parse_mode=ParseMode.MARKDOWN)
 
 async def untrack_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Remove a wallet from tracking."""
@@ -268,12 +375,12 @@ async def untrack_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     address = context.args[0]
     user_id = update.effective_user.id
     
-    success = db.remove_tracked_wallet(user_id, address)
+    success = await asyncio.to_thread(db.remove_tracked_wallet, user_id, address)
     
     if success:
         await update.message.reply_text(
-            f"✅ Stopped tracking `{address[:10]}...{address[-8:]}`",
-            parse_mode='Markdown'
+            f"✅ Stopped tracking `{short_address(address, 10, 8)}`",
+            parse_mode=ParseMode.MARKDOWN
         )
     else:
         await update.message.reply_text(
@@ -1,12 +1,14 @@
 """
 Callback query handlers for inline keyboard buttons.
 """
+import asyncio
+
 from telegram import Update
 from telegram.ext import ContextTypes
+from telegram.constants import ParseMode
 
-from utils.web3_helper import web3_helper
-from utils.validators import Validators
 from utils.database import db
+from handlers.blockchain import cached_eth_balance, short_address
 
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle button presses from inline keyboards."""
@@ -14,26 +16,26 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()  # Acknowledge the button press
     
     # Parse callback data
-    action, data = query.data.split(':', 1)
+    action, _, data = query.data.partition(':')
     
     if action == 'refresh_balance':
-        # Refresh balance
+        # Refresh balance, bypassing the cached value
         address = data
         try:
-            balance = web3_helper.get_eth_balance(address)
+            balance = await cached_eth_balance(address, force=True)
             
             response = f"""
 💰 **Balance Report** _(refreshed)_
 
-**Address:** `{address[:6]}...{address[-4:]}`
-**Balance:** {Validators.format_eth_amount(balance)} ETH
+**Address:** `{short_address(address)}`
+**Balance:** {balance:.4f} ETH
 
 _Last updated: just now_
 """
             # Keep the same keyboard
             await query.edit_message_text(
                 response,
-                parse_mode='Markdown',
+                parse_mode=ParseMode.MARKDOWN,
                 reply_markup=query.message.reply_markup
             )
         except Exception as e:
@@ -44,7 +46,7 @@ _Last updated: just now_
         address = data
         user_id = update.effective_user.id
         
-        success = db.add_tracked_wallet(user_id, address)
+        success = await asyncio.to_thread(db.add_tracked_wallet, user_id, address)
         
         if success:
             await query.answer("✅ Added to tracking!", show_alert=True)
@@ -0,0 +1,171 @@
+# handlers/charts.py
+"""
+Chart rendering for the analytics handlers
+
+The render_* functions run in the handlers' process pool: they take plain
+column dicts (cheap to pickle) and return PNG bytes, and use no bot state.
+"""
+# pyplot is not used: a bare Figure drawn on the Agg canvas needs no
+# backend selection, figure manager or global state
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import matplotlib.dates as mdates
+import matplotlib.ticker as mticker
+import io
+import threading
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# One figure reused by both chart types: axes are cleared between renders
+# instead of allocating (and laying out) a new figure per request. The
+# margins are fixed, so saving needs no bbox_inches='tight' trial render.
+_CHART_FIG = Figure(figsize=(12, 8))
+FigureCanvasAgg(_CHART_FIG)
+_CHART_AX1, _CHART_AX2 = _CHART_FIG.subplots(2, 1, height_ratios=[2, 1])
+_CHART_FIG.subplots_adjust(left=0.1, right=0.97, top=0.94, bottom=0.08, hspace=0.25)
+_chart_lock = threading.Lock()
+
+# Telegram re-encodes photos anyway, so PNGs are written with fast zlib
+# compression, trading slightly larger files for a much shorter zlib pass
+PNG_COMPRESS_LEVEL = 1
+
+# Axis formatters, built once
+_PRICE_FORMATTER_MICRO = mticker.FuncFormatter(lambda x, p: f'${x:.6f}')
+_PRICE_FORMATTER_SMALL = mticker.FuncFormatter(lambda x, p: f'${x:.4f}')
+_PRICE_FORMATTER = mticker.FuncFormatter(lambda x, p: f'${x:,.2f}')
+_VOLUME_FORMATTER = mticker.FuncFormatter(lambda x, p: f'${x/1e6:.1f}M' if x >= 1e6 else f'${x/1e3:.1f}K')
+_DATE_FORMATTER = mdates.DateFormatter('%m/%d')
+
+
+def _render_chart(fig) -> bytes:
+    """Save the figure as PNG"""
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=100, pil_kwargs={'compress_level': PNG_COMPRESS_LEVEL})
+    return buf.getvalue()
+
+
+def render_analytics_png(data: Dict[str, List], symbol: str, days: int) -> bytes:
+    """
+    Generate analytics chart with price and volume
+    
+    Args:
+        data: Price history columns (timestamp, price_usd, low, high, volume_usd)
+        symbol: Token symbol for the title
+        days: Number of days shown
+    
+    Returns:
+        PNG image bytes
+    """
+    df = pd.DataFrame(data)
+    
+    with _chart_lock:
+        ax1, ax2 = _CHART_AX1, _CHART_AX2
+        ax1.cla()
+        ax2.cla()
+        
+        # Price chart
+        ax1.plot(df['timestamp'], df['price_usd'], linewidth=2, color='#2962FF', label='Price')
+        ax1.fill_between(df['timestamp'], df['low'], df['high'], alpha=0.2, color='#2962FF')
+        ax1.set_ylabel('Price (USD)', fontsize=12, fontweight='bold')
+        ax1.set_title(f'{symbol} Price & Volume ({days} days)', fontsize=14, fontweight='bold')
+        ax1.grid(True, alpha=0.3)
+        ax1.legend()
+        
+        # Format price axis
+        current_price = df['price_usd'].iloc[-1]
+        if current_price < 0.01:
+            ax1.yaxis.set_major_formatter(_PRICE_FORMATTER_MICRO)
+        elif current_price < 1:
+            ax1.yaxis.set_major_formatter(_PRICE_FORMATTER_SMALL)
+        else:
+            ax1.yaxis.set_major_formatter(_PRICE_FORMATTER)
+        
+        # Volume chart: green when the price did not fall from the previous
+        # day (the first bar is always green)
+        prices = df['price_usd'].to_numpy()
+        up = np.concatenate(([True], prices[1:] >= prices[:-1]))
+        colors = np.where(up, '#4CAF50', '#F44336')
+        ax2.bar(df['timestamp'], df['volume_usd'], color=colors, alpha=0.7)
+        ax2.set_ylabel('Volume (USD)', fontsize=12, fontweight='bold')
+        ax2.set_xlabel('Date', fontsize=12, fontweight='bold')
+        ax2.grid(True, alpha=0.3, axis='y')
+        
+        # Format volume axis
+        ax2.yaxis.set_major_formatter(_VOLUME_FORMATTER)
+        
+        # Format x-axis
+        ax1.xaxis.set_major_formatter(_DATE_FORMATTER)
+        ax2.xaxis.set_major_formatter(_DATE_FORMATTER)
+        
+        return _render_chart(_CHART_FIG)
+
+
+def render_wallet_png(data: Dict[str, List], wallet_address: str, symbol: str, days: int) -> bytes:
+    """
+    Generate wallet activity chart
+    
+    Args:
+        data: Transfer columns (timestamp, to, value)
+        wallet_address: Wallet the report is for
+        symbol: Token symbol for the labels
+        days: Number of days shown
+    
+    Returns:
+        PNG image bytes
+    """
+    timestamps = np.asarray(data['timestamp'], dtype=np.int64)
+    values = np.asarray(data['value'], dtype=np.float64)
+    
+    # Separate incoming and outgoing (one vectorised compare, not a
+    # Python callback per row)
+    received = pd.Series(data['to'], dtype=object).str.lower().to_numpy() == wallet_address.lower()
+    
+    # Daily aggregation: bin by UTC day, one bincount per direction covers
+    # the groupby, the gap-filling reindex and the in/out split
+    day = timestamps // 86400
+    first_day = int(day.min())
+    day -= first_day
+    n_days = int(day.max()) + 1
+    daily_in = np.bincount(day[received], weights=values[received], minlength=n_days)
+    daily_out = np.bincount(day[~received], weights=values[~received], minlength=n_days)
+    
+    # Create date range
+    date_range = pd.date_range(
+        start=pd.to_datetime(first_day * 86400, unit='s'),
+        periods=n_days,
+        freq='D'
+    )
+    
+    # Cumulative balance
+    cumulative = np.cumsum(daily_in - daily_out)
+    
+    with _chart_lock:
+        ax1, ax2 = _CHART_AX1, _CHART_AX2
+        ax1.cla()
+        ax2.cla()
+        
+        # Cumulative balance chart
+        ax1.fill_between(date_range, 0, cumulative, alpha=0.3, color='#2196F3')
+        ax1.plot(date_range, cumulative, linewidth=2, color='#2196F3', label='Net Balance Change')
+        ax1.set_ylabel(f'Cumulative {symbol}', fontsize=12, fontweight='bold')
+        ax1.set_title(f'Wallet Activity Report ({days} days)', fontsize=14, fontweight='bold')
+        ax1.grid(True, alpha=0.3)
+        ax1.legend()
+        ax1.axhline(y=0, color='gray', linestyle='--', alpha=0.5)
+        
+        # Daily transfer volume chart
+        ax2.bar(date_range, daily_in, alpha=0.7, color='#4CAF50', label='Received')
+        ax2.bar(date_range, -daily_out, alpha=0.7, color='#F44336', label='Sent')
+        ax2.set_ylabel(f'{symbol} Volume', fontsize=12, fontweight='bold')
+        ax2.set_xlabel('Date', fontsize=12, fontweight='bold')
+        ax2.grid(True, alpha=0.3, axis='y')
+        ax2.legend()
+        ax2.axhline(y=0, color='gray', linestyle='-', alpha=0.5)
+        
+        # Format x-axis
+        ax1.xaxis.set_major_formatter(_DATE_FORMATTER)
+        ax2.xaxis.set_major_formatter(_DATE_FORMATTER)
+        
+        return _render_chart(_CHART_FIG)
@@ -1,37 +1,31 @@
 """
 Unit tests for bot functionality.
 """
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
 import pytest
-from unittest.mock import MagicMock, patch
+import requests
+from unittest.mock import AsyncMock, MagicMock, patch
 from utils.validators import Validators
 
 
 class TestValidators:
     """Test input validation."""
 
-    def test_valid_address(self):
-        """Test valid Ethereum address."""
-        address = "0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045"
-        is_valid, _ = Validators.validate_eth_address(address)
-        assert is_valid
-
-    def test_invalid_address_no_prefix(self):
-        """Test address without 0x prefix."""
-        address = "d8dA6BF26964aF9D7eEd9e03E53415D37aA96045"
-        is_valid, error = Validators.validate_eth_address(address)
-        assert not is_valid
-        assert "0x" in error
-
-    def test_invalid_address_wrong_length(self):
-        """Test address with wrong length."""
-        address = "0x123"
+    @pytest.mark.parametrize("address,valid,needle", [
+        # Valid checksummed address
+        ("0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045", True, None),
+        # Missing 0x prefix
+        ("d8dA6BF26964aF9D7eEd9e03E53415D37aA96045", False, "0x"),
+        # Wrong length
+        ("0x123", False, "42 characters"),
+        # Right length, non-hex digits
+        ("0xd8dA6BF26964aF9D7eEd9e03E53415D37aA9604G", False, "invalid characters"),
+    ])
+    def test_validate_eth_address(self, address, valid, needle):
+        """Test Ethereum address validation and its error messages."""
         is_valid, error = Validators.validate_eth_address(address)
-        assert not is_valid
-        assert "42 characters" in error
+        assert is_valid is valid
+        if needle:
+            assert needle in error
 
     def test_format_eth_amount(self):
         """Test ETH amount formatting."""
@@ -48,15 +42,19 @@ class TestWeb3Helper:
         # Set up mock
         mock_w3 = MagicMock()
         mock_w3.is_connected.return_value = True
-        mock_w3.to_checksum_address.return_value = "0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045"
         mock_w3.eth.get_balance.return_value = 1_000_000_000_000_000_000  # 1 ETH in Wei
         mock_w3.from_wei.return_value = 1.0
         mock_web3_class.return_value = mock_w3
 
         from utils.web3_helper import Web3Helper
         helper = Web3Helper()
-        balance = helper.get_eth_balance("0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045")
+        # Any casing is checksummed before it reaches the node
+        balance = helper.get_eth_balance("0xd8da6bf26964af9d7eed9e03e53415d37aa96045")
         assert balance == 1.0
+        mock_w3.eth.get_balance.assert_called_with("0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045")
+
+        helper.get_eth_balance("0xD8DA6BF26964AF9D7EED9E03E53415D37AA96045")
+        mock_w3.eth.get_balance.assert_called_with("0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045")
 
     @patch('utils.web3_helper.Web3')
     def test_is_valid_address(self, mock_web3_class):
@@ -80,3 +78,797 @@ class TestWeb3Helper:
         from utils.web3_helper import Web3Helper
         with pytest.raises(ConnectionError):
             Web3Helper()
+
+
+class FakeSubgraph:
+    """
+    Serves transfers like graph-node: inclusive block range, ordered by
+    blockNumber with ties broken by id, then skip/first.
+    """
+
+    def __init__(self, blocks, head=None):
+        self.rows = [
+            {
+                'id': f'{i:03d}', 'from': '0x1', 'to': '0x2', 'value': '1', 'amount': '1',
+                'blockNumber': str(block), 'timestamp': str(1_700_000_000 + block),
+                'transaction': {'id': f'{i:03d}'},
+            }
+            for i, block in enumerate(blocks)
+        ]
+        self.head = head if head is not None else max(blocks, default=0)
+        self.calls = []
+
+    def ordered(self, direction='asc'):
+        rows = sorted(self.rows, key=lambda r: (int(r['blockNumber']), r['id']))
+        return rows[::-1] if direction == 'desc' else rows
+
+    def query(self, query, variables=None, **kwargs):
+        self.calls.append(dict(variables))
+        rows = [
+            r for r in self.ordered(variables.get('direction', 'asc'))
+            if int(variables['fromBlock']) <= int(r['blockNumber']) <= int(variables['toBlock'])
+        ]
+        skip = variables['skip']
+        data = {'transfers': rows[skip:skip + variables['first']]}
+        if '_meta' in query:
+            data['_meta'] = {'block': {'number': self.head}}
+        return {'data': data}
+
+
+TOKEN = "0x" + "ab" * 20
+
+
+class TestSubgraphTransferPagination:
+    """Test TransfersAnalytics subgraph paging against scripted pages."""
+
+    def fetch(self, subgraph, **kwargs):
+        from analytics.transfers_analytics import TransfersAnalytics
+        analytics = TransfersAnalytics("http://localhost:8545", subgraph_client=subgraph)
+        with patch('analytics.transfers_analytics.SUBGRAPH_PAGE_SIZE', 3), \
+                patch.object(TransfersAnalytics, '_token_meta', return_value=(0, 'TKN')):
+            rows = analytics._get_transfers_subgraph(TOKEN, None, 0, 100, **kwargs)
+        return [r['tx_hash'] for r in rows]
+
+    def test_page_ending_mid_block(self):
+        """Rows of a block split across pages are neither lost nor repeated."""
+        subgraph = FakeSubgraph([1, 2, 2, 3, 3, 3, 4])
+        assert self.fetch(subgraph) == [r['id'] for r in subgraph.ordered()]
+
+    def test_page_inside_one_block(self):
+        """A block holding more than a page is walked with skip."""
+        subgraph = FakeSubgraph([5] * 7 + [6])
+        assert self.fetch(subgraph) == [r['id'] for r in subgraph.ordered()]
+        assert [c['skip'] for c in subgraph.calls] == [0, 3, 6]
+
+    def test_desc_with_limit(self):
+        """Descending pages walk toBlock down and stop at the limit."""
+        subgraph = FakeSubgraph([1, 2, 2, 3, 3, 3, 4])
+        ids = self.fetch(subgraph, limit=5, order='desc')
+        assert ids == [r['id'] for r in subgraph.ordered('desc')][:5]
+        assert int(subgraph.calls[-1]['toBlock']) < 100
+
+    def test_empty_range(self):
+        """An empty first page ends the walk."""
+        subgraph = FakeSubgraph([])
+        assert self.fetch(subgraph) == []
+        assert len(subgraph.calls) == 1
+
+
+class TestHybridTransferPagination:
+    """Test HybridDataFetcher paging against scripted pages."""
+
+    def fetcher(self, subgraph):
+        from utils.hybrid_fetcher import HybridDataFetcher
+        fetcher = HybridDataFetcher.__new__(HybridDataFetcher)
+        fetcher.graph = subgraph
+        return fetcher
+
+    def fetch(self, subgraph):
+        with patch('utils.hybrid_fetcher.HYBRID_PAGE_SIZE', 3):
+            return [r['id'] for r in self.fetcher(subgraph).get_transfers_hybrid(TOKEN, 0, 100)]
+
+    def test_page_ending_mid_block(self):
+        """Rows of a block split across pages are neither lost nor repeated."""
+        subgraph = FakeSubgraph([1, 2, 2, 3, 3, 3, 4])
+        assert self.fetch(subgraph) == [r['id'] for r in subgraph.ordered()]
+        assert [(c['fromBlock'], c['skip']) for c in subgraph.calls] == [('0', 0), ('2', 2), ('3', 3)]
+
+    def test_page_inside_one_block(self):
+        """A block holding more than a page is walked with skip."""
+        subgraph = FakeSubgraph([5] * 7 + [6])
+        assert self.fetch(subgraph) == [r['id'] for r in subgraph.ordered()]
+        assert [(c['fromBlock'], c['skip']) for c in subgraph.calls] == [('0', 0), ('5', 3), ('5', 6)]
+
+    def test_short_and_empty_pages(self):
+        """A short first page, or an exactly full last one followed by an empty page, ends the walk."""
+        short = FakeSubgraph([1, 2])
+        assert self.fetch(short) == ['000', '001']
+        assert len(short.calls) == 1
+
+        full = FakeSubgraph([1, 2, 3])
+        assert self.fetch(full) == ['000', '001', '002']
+        assert len(full.calls) == 2
+
+    def test_async_matches_sync(self):
+        """aget_transfers_hybrid walks the same pages."""
+        import asyncio
+
+        subgraph = FakeSubgraph([1, 2, 2, 3, 3, 3, 4])
+
+        async def aquery(query, variables=None, **kwargs):
+            return subgraph.query(query, variables)
+
+        subgraph.aquery = aquery
+        with patch('utils.hybrid_fetcher.HYBRID_PAGE_SIZE', 3):
+            rows = asyncio.run(self.fetcher(subgraph).aget_transfers_hybrid(TOKEN, 0, 100))
+        assert [r['id'] for r in rows] == [r['id'] for r in subgraph.ordered()]
+
+
+class TestQueryCache:
+    """QueryCache keeps its in-memory index in step with the database."""
+
+    QUERY = "query { tokens { id } }"
+
+    def cache(self, tmp_path, **kwargs):
+        from utils.cache_helper import QueryCache
+
+        kwargs.setdefault('ttl_minutes', 1)
+        return QueryCache(cache_dir=str(tmp_path), compress=False, **kwargs)
+
+    def test_set_get_and_expire(self, tmp_path):
+        """A stale entry without an ETag is dropped; one with an ETag is kept for revalidation."""
+        cache = self.cache(tmp_path)
+        with patch('utils.cache_helper.time.time', return_value=1000.0):
+            cache.set(self.QUERY, {'n': 1}, {'v': 1})
+            cache.set(self.QUERY, {'n': 2}, {'v': 2}, etag='"abc"')
+            assert cache.get(self.QUERY, {'v': 1}) == {'n': 1}
+            assert cache.get_entry(self.QUERY, {'v': 2}) == (1000.0, {'n': 2})
+
+        with patch('utils.cache_helper.time.time', return_value=1061.0):
+            assert cache.get(self.QUERY, {'v': 1}) is None
+            assert cache.get(self.QUERY, {'v': 2}) is None
+            assert cache.get_etag(self.QUERY, {'v': 1}) is None
+            assert cache.get_etag(self.QUERY, {'v': 2}) == '"abc"'
+        assert cache.get_stats()['entry_count'] == 1
+        assert cache.stats['expired'] == 2
+
+    def test_revalidate_restarts_ttl(self, tmp_path):
+        """revalidate() makes a stale entry fresh again, and is a no-op for a missing key."""
+        cache = self.cache(tmp_path)
+        with patch('utils.cache_helper.time.time', return_value=1000.0):
+            cache.set(self.QUERY, {'n': 1}, etag='"abc"')
+        with patch('utils.cache_helper.time.time', return_value=1100.0):
+            assert cache.get(self.QUERY) is None
+            assert cache.revalidate(self.QUERY) == 1100.0
+            assert cache.get_entry(self.QUERY) == (1100.0, {'n': 1})
+            assert cache.revalidate(self.QUERY, {'missing': True}) is None
+
+    def test_size_limit_evicts_oldest_first(self, tmp_path):
+        """Over the limit, entries go in write order, with rewrites and revalidations counting as new."""
+        cache = self.cache(tmp_path)
+        for i in range(3):
+            cache.set(self.QUERY, {'n': i}, {'v': i})
+        cache.max_cache_size_bytes = cache.get_stats()['size_bytes']
+
+        cache.revalidate(self.QUERY, {'v': 0})
+        cache.set(self.QUERY, {'n': 3}, {'v': 3})
+
+        assert [cache.get(self.QUERY, {'v': i}) for i in range(4)] == [{'n': 0}, None, None, {'n': 3}]
+        stats = cache.get_stats()
+        assert stats['entry_count'] == 2
+        assert stats['size_bytes'] <= cache.max_cache_size_bytes * 0.9
+
+    def test_reopen_rebuilds_index(self, tmp_path):
+        """A second cache on the same directory loads the same entries, sizes and ETags."""
+        cache = self.cache(tmp_path)
+        for i in range(5):
+            cache.set(self.QUERY, {'n': 'x' * i}, {'v': i}, etag=f'"{i}"' if i % 2 else None)
+        cache.delete(self.QUERY, {'v': 4})
+        cache.set(self.QUERY, {'n': 'rewritten'}, {'v': 0})
+
+        # As after a restart: forget the open database
+        with patch.dict('utils.cache_helper._stores', clear=True):
+            reopened = self.cache(tmp_path)
+        assert reopened._store is not cache._store
+        for key in ('entry_count', 'size_bytes'):
+            assert reopened.get_stats()[key] == cache.get_stats()[key]
+        assert reopened._index == cache._index
+        assert reopened.get(self.QUERY, {'v': 0}) == {'n': 'rewritten'}
+        assert reopened.get_etag(self.QUERY, {'v': 3}) == '"3"'
+
+    def test_instances_share_database(self, tmp_path):
+        """Caches on one directory see each other's writes and deletes; TTLs stay per instance."""
+        short = self.cache(tmp_path, ttl_minutes=5)
+        long = self.cache(tmp_path, ttl_minutes=60)
+        with patch('utils.cache_helper.time.time', return_value=1000.0):
+            short.set(self.QUERY, {'n': 1})
+        with patch('utils.cache_helper.time.time', return_value=1000.0 + 600):
+            assert short.get(self.QUERY) is None
+            assert long.get(self.QUERY) == {'n': 1}
+        long.delete(self.QUERY)
+        assert short.get_stats()['entry_count'] == 0
+        assert short.stats['errors'] == long.stats['errors'] == 0
+
+    def test_cleanup_keeps_longest_retention(self, tmp_path):
+        """A short-TTL client's cleanup keeps entries another client keeps longer, even after a restart."""
+        from datetime import timedelta
+
+        long = self.cache(tmp_path)
+        long.cleanup_expired(max_age=timedelta(days=7))
+        with patch('utils.cache_helper.time.time', return_value=1000.0):
+            long.set(self.QUERY, {'n': 1})
+
+        with patch.dict('utils.cache_helper._stores', clear=True), \
+                patch('utils.cache_helper.time.time', return_value=1000.0 + 7200):
+            short = self.cache(tmp_path, ttl_minutes=5)
+            assert short.cleanup_expired() == 0
+            assert short.get(self.QUERY, ttl=timedelta(days=7)) == {'n': 1}
+
+        with patch('utils.cache_helper.time.time', return_value=1000.0 + 8 * 86400):
+            assert short.cleanup_expired() == 1
+
+    def test_row_deleted_elsewhere_is_a_miss(self, tmp_path):
+        """A row removed through another connection is a plain miss and leaves the index."""
+        import sqlite3
+
+        cache = self.cache(tmp_path)
+        cache.set(self.QUERY, {'n': 1})
+        with sqlite3.connect(cache.db_path) as other:
+            other.execute("DELETE FROM cache")
+
+        assert cache.get(self.QUERY) is None
+        assert cache.revalidate(self.QUERY) is None
+        assert cache.stats['errors'] == 0
+        stats = cache.get_stats()
+        assert (stats['entry_count'], stats['size_bytes']) == (0, 0)
+
+
+class TestRateLimiter:
+    """RateLimiter's sliding-window counter, driven by a fake monotonic clock."""
+
+    def limiter(self, **kwargs):
+        from utils.rate_limiter import RateLimiter
+
+        kwargs.setdefault('max_requests', 10)
+        kwargs.setdefault('window_seconds', 60)
+        return RateLimiter(**kwargs)
+
+    @pytest.fixture
+    def clock(self):
+        mock_time = MagicMock()
+        mock_time.monotonic.return_value = 600.0
+        with patch('utils.rate_limiter.time', mock_time):
+            yield mock_time.monotonic
+
+    def test_admits_up_to_limit(self, clock):
+        """max_requests are admitted in a window and the next is denied, per user."""
+        limiter = self.limiter()
+        assert all(limiter.is_allowed(1) for _ in range(10))
+        assert not limiter.is_allowed(1)
+        assert limiter.is_allowed(2)
+
+    def test_previous_window_carries_over(self, clock):
+        """The previous window's count weighs in by how much of it still overlaps."""
+        limiter = self.limiter()
+        for _ in range(10):
+            limiter.is_allowed(1)
+
+        # 30s into the next window half the previous count remains: 5 more fit
+        clock.return_value = 690.0
+        assert [limiter.is_allowed(1) for _ in range(6)] == [True] * 5 + [False]
+
+        # Two windows on, the old count no longer applies
+        clock.return_value = 780.0
+        assert all(limiter.is_allowed(1) for _ in range(10))
+
+    def test_wait_time_until_next_admit(self, clock):
+        """get_wait_time() is the whole seconds, rounded up, until is_allowed() passes again."""
+        limiter = self.limiter()
+        assert limiter.get_wait_time(1) == 0
+
+        for start in (600.0, 630.0, 665.5):
+            limiter = self.limiter()
+            clock.return_value = 600.0
+            for _ in range(10):
+                limiter.is_allowed(1)
+            clock.return_value = start
+            while limiter.is_allowed(1):
+                pass
+
+            wait = limiter.get_wait_time(1)
+            assert wait > 0
+            clock.return_value = start + wait - 1
+            assert not limiter.is_allowed(1)
+            clock.return_value = start + wait + 0.001
+            assert limiter.is_allowed(1)
+
+
+def _reference_top_traders(swaps_token0, swaps_token1, limit):
+    """The per-swap dict loop _aggregate_top_traders replaced."""
+    stats = {}
+    for swaps, amount in ((swaps_token0, 'amount0'), (swaps_token1, 'amount1')):
+        for swap in swaps:
+            trader = stats.setdefault(swap['origin'], {
+                'total_volume_usd': 0.0, 'trade_count': 0, 'buy_volume_usd': 0.0, 'sell_volume_usd': 0.0
+            })
+            volume = float(swap['amountUSD'])
+            trader['total_volume_usd'] += volume
+            trader['trade_count'] += 1
+            side = 'sell_volume_usd' if float(swap[amount]) > 0 else 'buy_volume_usd'
+            trader[side] += volume
+
+    top = [
+        {'address': address, 'total_volume_usd': round(s['total_volume_usd'], 2),
+         'trade_count': s['trade_count'], 'buy_volume_usd': round(s['buy_volume_usd'], 2),
+         'sell_volume_usd': round(s['sell_volume_usd'], 2)}
+        for address, s in stats.items()
+    ]
+    top.sort(key=lambda t: t['total_volume_usd'], reverse=True)
+    return top[:limit]
+
+
+class TestTopTraders:
+    """_aggregate_top_traders matches the per-swap loop, and swap pages merge by id."""
+
+    @staticmethod
+    def swap(origin, usd, amount, side=0):
+        return {'origin': origin, 'amountUSD': str(usd), f'amount{side}': str(amount)}
+
+    def test_buy_sell_by_token_side(self):
+        """A positive amount of the analysed token is a sell, on either side of the pair."""
+        from analytics.token_analytics import _aggregate_top_traders
+
+        token0 = [self.swap('0xa', 100, 5), self.swap('0xa', 50, -5)]
+        token1 = [self.swap('0xa', 25, 3, side=1), self.swap('0xb', 10, -3, side=1)]
+        assert _aggregate_top_traders(token0, token1, 10) == [
+            {'address': '0xa', 'total_volume_usd': 175.0, 'trade_count': 3,
+             'buy_volume_usd': 50.0, 'sell_volume_usd': 125.0},
+            {'address': '0xb', 'total_volume_usd': 10.0, 'trade_count': 1,
+             'buy_volume_usd': 10.0, 'sell_volume_usd': 0.0}
+        ]
+        assert _aggregate_top_traders([], [], 10) == []
+
+    def test_matches_reference_loop(self):
+        """Random swaps, with ties and limits below and above the trader count, agree with the loop."""
+        import random
+
+        from analytics.token_analytics import _aggregate_top_traders
+
+        rng = random.Random(7)
+        for _ in range(20):
+            origins = [f'0x{i:02x}' for i in range(rng.randint(1, 30))]
+
+            # Quarter-dollar amounts keep the float sums exact, so totals really tie
+            def swaps(side):
+                return [
+                    self.swap(rng.choice(origins), rng.randint(1, 40) / 4, rng.choice((-1, 1)), side)
+                    for _ in range(rng.randint(0, 80))
+                ]
+
+            token0, token1 = swaps(0), swaps(1)
+            for limit in (1, 3, 10, 50):
+                assert _aggregate_top_traders(token0, token1, limit) == \
+                    _reference_top_traders(token0, token1, limit)
+
+    def test_ties_in_first_seen_order(self):
+        """Traders tied at the cut are kept in the order they first traded."""
+        from analytics.token_analytics import _aggregate_top_traders
+
+        token0 = [self.swap(f'0x{i}', 5 if i == 150 else 1, 1) for i in range(200)]
+        top = _aggregate_top_traders(token0, [], 3)
+        assert [t['address'] for t in top] == ['0x150', '0x0', '0x1']
+
+    def test_merge_swap_page_skips_seen_ids(self):
+        """Swaps repeated at the boundary second are merged once; a repeat-only page ends the scan."""
+        from analytics.token_analytics import _merge_swap_page
+
+        def page(*ids_and_ts):
+            return [{'id': i, 'timestamp': ts} for i, ts in ids_and_ts]
+
+        rows, seen = [], set()
+        with patch('analytics.token_analytics.SWAPS_PAGE_SIZE', 3):
+            assert _merge_swap_page(rows, seen, page(('a', '9'), ('b', '8'), ('c', '7'))) == '7'
+            assert _merge_swap_page(rows, seen, page(('c', '7'), ('d', '7'), ('e', '6'))) == '6'
+            assert _merge_swap_page(rows, seen, page(('e', '6'), ('f', '5'))) is None
+            assert _merge_swap_page(rows, seen, page(('e', '6'), ('f', '5'), ('f', '5'))) is None
+        assert [r['id'] for r in rows] == ['a', 'b', 'c', 'd', 'e', 'f']
+
+
+class TestHyperLogLog:
+    """_HyperLogLog estimates and analyze_transfers switching to it."""
+
+    WALLET = "0x" + "cd" * 20
+
+    def test_large_estimate(self):
+        """About 200k distinct items are estimated within a few percent; repeats don't count."""
+        from analytics.transfers_analytics import _HyperLogLog
+
+        hll = _HyperLogLog()
+        for i in range(200000):
+            hll.add(f"0x{i:040x}")
+        for i in range(1000):
+            hll.add(f"0x{i:040x}")
+        assert abs(len(hll) - 200000) / 200000 < 0.03
+
+    def test_small_range_linear_counting(self):
+        """Few items are counted almost exactly by the linear-counting correction."""
+        from analytics.transfers_analytics import _HyperLogLog
+
+        hll = _HyperLogLog()
+        assert len(hll) == 0
+        for i in range(1000):
+            hll.add(f"0x{i:040x}")
+        assert abs(len(hll) - 1000) <= 10
+
+    def test_iterator_promotes_past_threshold(self):
+        """An iterator switches to HLL past HLL_THRESHOLD counterparties; sums and counts stay exact."""
+        from analytics.transfers_analytics import TransfersAnalytics, _HyperLogLog
+
+        def transfers():
+            for i in range(3000):
+                counterparty = f"0x{i % 1500:040x}"
+                if i % 3:
+                    yield {'from': counterparty, 'to': self.WALLET, 'value_raw': 10 ** 20 + i, 'decimals': 18}
+                else:
+                    yield {'from': self.WALLET, 'to': counterparty, 'value_raw': 10 ** 19 + i, 'decimals': 18}
+            yield {'from': "0x" + "ee" * 20, 'to': "0x" + "ff" * 20, 'value_raw': 1, 'decimals': 18}
+
+        expected_received = sum(10 ** 20 + i for i in range(3000) if i % 3)
+        expected_sent = sum(10 ** 19 + i for i in range(3000) if not i % 3)
+
+        analytics = TransfersAnalytics("http://localhost:8545")
+        with patch('analytics.transfers_analytics.HLL_THRESHOLD', 1000), \
+                patch('analytics.transfers_analytics._HyperLogLog', wraps=_HyperLogLog) as hll:
+            stats = analytics.analyze_transfers(transfers(), "0x" + "CD" * 20)
+            exact = analytics.analyze_transfers(list(transfers()), self.WALLET, use_hll=False)
+
+        assert hll.call_count == 1
+        assert abs(stats['unique_counterparties'] - 1500) <= 30
+        assert exact['unique_counterparties'] == 1500
+        for key in ('total_transfers', 'received_count', 'sent_count', 'total_received_raw', 'total_sent_raw',
+                    'total_received', 'total_sent', 'net_change', 'first_transfer', 'last_transfer'):
+            assert stats[key] == exact[key]
+        assert stats['total_transfers'] == 3001
+        assert (stats['received_count'], stats['sent_count']) == (2000, 1000)
+        assert (stats['total_received_raw'], stats['total_sent_raw']) == (expected_received, expected_sent)
+        assert stats['net_change'] == (expected_received - expected_sent) / 10 ** 18
+
+
+class TestVolumeDetail:
+    """The volume breakdown prints exact dollar figures."""
+
+    def test_large_volumes_not_rounded(self):
+        """Day volumes above float32 precision are shown to the dollar."""
+        import asyncio
+
+        import pandas as pd
+
+        from handlers import analytics_callbacks
+
+        volumes = [123456789.0] * 29 + [987654321.0]
+        df = pd.DataFrame({'date': pd.date_range('2026-01-01', periods=30).date, 'volume_usd': volumes})
+        query = MagicMock()
+        query.message.reply_text = AsyncMock()
+        with patch.object(analytics_callbacks, 'cached_token_info', return_value={'symbol': 'TKN'}), \
+                patch.object(analytics_callbacks, 'token_analytics') as token_analytics:
+            token_analytics.get_price_history.return_value = df
+            token_analytics.get_token_volume_24h.return_value = 0.0
+            asyncio.run(analytics_callbacks._handle_volume_detail(query, None, TOKEN))
+
+        text = query.message.reply_text.call_args.args[0]
+        assert "Peak Day: $987,654,321\n" in text
+        assert f"Total Volume: ${sum(volumes):,.0f}\n" in text
+        assert f"30d Avg: ${sum(volumes) / 30:,.0f}\n" in text
+
+
+class TestAdaptiveLogRange:
+    """_get_logs_adaptive splits rejected ranges and re-raises everything else."""
+
+    RANGE_ERROR = ValueError({'code': -32005, 'message': 'query returned more than 10000 results'})
+
+    def analytics(self, max_span=None, error=None):
+        """TransfersAnalytics whose get_logs rejects spans above max_span, or always raises error."""
+        from analytics.transfers_analytics import TransfersAnalytics
+
+        analytics = TransfersAnalytics("http://localhost:8545")
+        analytics.w3 = MagicMock()
+        spans = []
+
+        def get_logs(params):
+            spans.append((params['fromBlock'], params['toBlock']))
+            if error is not None:
+                raise error
+            if params['toBlock'] - params['fromBlock'] + 1 > max_span:
+                raise self.RANGE_ERROR
+            return list(range(params['fromBlock'], params['toBlock'] + 1))
+
+        analytics.w3.eth.get_logs.side_effect = get_logs
+        return analytics, spans
+
+    def test_bisects_rejected_range(self):
+        """A rejected range is bisected until it fits; the logs come back whole and in order."""
+        analytics, spans = self.analytics(max_span=30)
+        assert analytics._get_logs_adaptive({'fromBlock': 0, 'toBlock': 99}) == list(range(100))
+        assert analytics._log_range_limit == 25
+        assert spans[:3] == [(0, 99), (0, 49), (0, 24)]
+
+    def test_presplits_known_limit(self):
+        """Once a span is learned, later ranges are split up front without rejected calls."""
+        analytics, spans = self.analytics(max_span=30)
+        analytics._log_range_limit = 25
+        assert analytics._get_logs_adaptive({'fromBlock': 100, 'toBlock': 199}) == list(range(100, 200))
+        assert spans == [(100, 124), (125, 149), (150, 174), (175, 199)]
+
+    def test_limit_grows_back(self):
+        """After LOG_RANGE_GROW_AFTER calls at the learned span it doubles."""
+        from analytics.transfers_analytics import LOG_RANGE_GROW_AFTER
+
+        analytics, _ = self.analytics(max_span=1000)
+        analytics._log_range_limit = 10
+        for i in range(LOG_RANGE_GROW_AFTER):
+            analytics._get_logs_adaptive({'fromBlock': i * 10, 'toBlock': i * 10 + 9})
+        assert analytics._log_range_limit == 20
+
+    @pytest.mark.parametrize('error', [
+        requests.exceptions.RetryError(
+            "Max retries exceeded with url: / (Caused by ResponseError('too many 429 error responses'))"
+        ),
+        ValueError('429 Client Error: Too Many Requests for url: https://rpc.example'),
+        ValueError({'code': -32005, 'message': 'rate limit exceeded'}),
+        IndexError('list index out of range')
+    ])
+    def test_other_errors_raise(self, error):
+        """Rate limits, HTTP failures and unrelated errors are raised without splitting."""
+        analytics, spans = self.analytics(error=error)
+        with pytest.raises(type(error)):
+            analytics._get_logs_adaptive({'fromBlock': 0, 'toBlock': 99})
+        assert spans == [(0, 99)]
+        assert analytics._log_range_limit is None
+
+
+class TestSubgraphTransferUnits:
+    """Subgraph transfer values are converted with the schema's units, not guessed per row."""
+
+    VALUES = ['5', '1.5', '0.000000000000000001', '123456789012345678901234567890.123456789012345678']
+
+    def fetch(self, **kwargs):
+        from analytics.transfers_analytics import TransfersAnalytics
+
+        subgraph = FakeSubgraph(range(len(self.VALUES)))
+        for row, value in zip(subgraph.rows, self.VALUES):
+            row['value'] = value
+        analytics = TransfersAnalytics("http://localhost:8545", subgraph_client=subgraph, **kwargs)
+        with patch.object(TransfersAnalytics, '_token_meta', return_value=(18, 'TKN')):
+            return analytics._get_transfers_subgraph(TOKEN, None, 0, 100)
+
+    def test_bigdecimal_token_units(self):
+        """An integral BigDecimal ("5") is five tokens, and large values scale exactly."""
+        rows = self.fetch()
+        assert [t['value_raw'] for t in rows] == [
+            5 * 10 ** 18, 15 * 10 ** 17, 1, 123456789012345678901234567890123456789012345678
+        ]
+        assert rows[0]['value'] == 5.0
+
+    def test_bigint_base_units(self):
+        """With a BigInt schema the value is taken as base units."""
+        self.VALUES = ['5', str(10 ** 30)]
+        rows = self.fetch(subgraph_value_in_base_units=True)
+        assert [t['value_raw'] for t in rows] == [5, 10 ** 30]
+
+
+class TestChartWorkers:
+    """Chart workers start lazily and don't rebuild the bot's state."""
+
+    def test_bot_import_is_light(self):
+        """Importing bot.py (as every spawned worker does) opens no database or clients."""
+        import subprocess
+        import sys
+
+        heavy = ['utils.database', 'handlers.analytics_commands', 'utils.graph_helper']
+        script = f"import sys, bot; print([m for m in {heavy!r} if m in sys.modules])"
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == '[]'
+
+    def test_pool_started_on_demand(self):
+        """The pool is created on first use and shut down by shutdown_chart_pool()."""
+        from handlers import analytics_commands
+
+        analytics_commands.shutdown_chart_pool()
+        assert analytics_commands.chart_pool.cache_info().currsize == 0
+        pool = analytics_commands.chart_pool()
+        assert analytics_commands.chart_pool() is pool
+        assert pool._max_workers == analytics_commands.CHART_WORKERS
+        analytics_commands.shutdown_chart_pool()
+        assert analytics_commands.chart_pool.cache_info().currsize == 0
+
+
+class TestAsyncTTLCache:
+    """AsyncTTLCache caching, forced refreshes and fetch sharing."""
+
+    def test_force_refetches_and_coalesces(self):
+        """force skips a fresh entry; concurrent forced calls still share one fetch."""
+        import asyncio
+
+        from utils.cache_helper import AsyncTTLCache
+
+        calls = []
+
+        async def fetch():
+            calls.append(len(calls))
+            await asyncio.sleep(0)
+            return len(calls)
+
+        async def run():
+            cache = AsyncTTLCache()
+            first = await cache.get_or_fetch('k', 60, fetch)
+            cached = await cache.get_or_fetch('k', 60, fetch)
+            forced = await asyncio.gather(*(cache.get_or_fetch('k', 60, fetch, force=True) for _ in range(3)))
+            after = await cache.get_or_fetch('k', 60, fetch)
+            return first, cached, forced, after
+
+        assert asyncio.run(run()) == (1, 1, [2, 2, 2], 2)
+        assert len(calls) == 2
+
+
+class TestStreamingErrors:
+    """Streamed chunked scans handle errors like the list form."""
+
+    def test_stream_error_ends_iterator(self):
+        """An RPC error mid-stream ends the iterator instead of escaping to the caller."""
+        from analytics.transfers_analytics import TransfersAnalytics
+
+        analytics = TransfersAnalytics("http://localhost:8545")
+        analytics.w3 = MagicMock()
+        analytics.w3.eth.block_number = 100
+
+        def get_transfers_rpc(token, wallet, start, end, *args):
+            if start > 0:
+                raise ConnectionError("RPC down")
+            return [{'block_number': start, 'tx_hash': 'a'}]
+
+        with patch.object(analytics, '_get_transfers_rpc', side_effect=get_transfers_rpc):
+            listed = analytics.get_transfers_hybrid(TOKEN, from_block=0, to_block=100, max_blocks=10)
+            streamed = analytics.get_transfers_hybrid(
+                TOKEN, from_block=0, to_block=100, max_blocks=10, stream=True
+            )
+            assert listed == []
+            assert list(streamed) == [{'block_number': 0, 'tx_hash': 'a'}]
+
+
+class TestGraphClientControlFlow:
+    """GraphClient's circuit breaker, in-flight coalescing and 304 revalidation."""
+
+    QUERY = "query Q($id: ID!) { token(id: $id) { id } }"
+
+    def client(self, tmp_path=None, **kwargs):
+        from utils.graph_helper import GraphClient
+
+        if tmp_path is not None:
+            kwargs.update(cache_dir=str(tmp_path), cache_ttl_minutes=1)
+        return GraphClient(
+            "http://subgraph.invalid",
+            cache_enabled=tmp_path is not None,
+            rate_limit_per_second=0,
+            **kwargs
+        )
+
+    def test_breaker_opens_and_half_opens(self):
+        """BREAKER_THRESHOLD overload failures open the circuit; after the cooldown one trial decides."""
+        import time
+
+        from utils.graph_helper import (
+            BREAKER_COOLDOWN, BREAKER_THRESHOLD, CircuitOpenError, GraphClientError
+        )
+
+        clock = MagicMock(wraps=time)
+        clock.monotonic.return_value = 1000.0
+        client = self.client(max_retries=1)
+        overloaded = GraphClientError("503 Service Unavailable", overload=True)
+        with patch('utils.graph_helper.time', clock), \
+                patch.object(client, '_execute_request', side_effect=overloaded) as execute:
+            for _ in range(BREAKER_THRESHOLD):
+                with pytest.raises(GraphClientError):
+                    client.query(self.QUERY, {'id': '1'}, use_cache=False)
+            with pytest.raises(CircuitOpenError):
+                client.query(self.QUERY, {'id': '1'}, use_cache=False)
+            assert execute.call_count == BREAKER_THRESHOLD
+
+            # A failed trial re-opens the circuit for another cooldown
+            clock.monotonic.return_value += BREAKER_COOLDOWN + 1
+            with pytest.raises(GraphClientError):
+                client.query(self.QUERY, {'id': '1'}, use_cache=False)
+            assert execute.call_count == BREAKER_THRESHOLD + 1
+            with pytest.raises(CircuitOpenError):
+                client.query(self.QUERY, {'id': '1'}, use_cache=False)
+
+            # While the trial is in flight everyone else fails fast
+            clock.monotonic.return_value += BREAKER_COOLDOWN + 1
+            trial = client._concurrency.acquire()
+            assert trial is True
+            with pytest.raises(CircuitOpenError):
+                client._concurrency.acquire()
+
+            # A successful trial closes it
+            client._concurrency.release(trial, clock.monotonic(), None)
+            execute.side_effect = None
+            execute.return_value = ({'data': {}}, None)
+            assert client.query(self.QUERY, {'id': '1'}, use_cache=False) == {'data': {}}
+            assert client.query(self.QUERY, {'id': '1'}, use_cache=False) == {'data': {}}
+
+    def run_concurrently(self, client, send, callers=5):
+        """Run query() from several threads; the first enters send before the rest start."""
+        import threading
+        import time
+
+        entered, release = threading.Event(), threading.Event()
+        calls = []
+
+        def blocking_send(query, variables, etag=None):
+            calls.append(variables)
+            entered.set()
+            release.wait(5)
+            return send()
+
+        results = [None] * callers
+
+        def call(i):
+            try:
+                results[i] = client.query(self.QUERY, {'id': '1'})
+            except Exception as e:
+                results[i] = e
+
+        with patch.object(client, '_send', side_effect=blocking_send):
+            threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+            threads[0].start()
+            assert entered.wait(5)
+            for thread in threads[1:]:
+                thread.start()
+            # Let the followers reach the leader's Future
+            time.sleep(0.2)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+        return calls, results
+
+    def test_concurrent_queries_share_one_request(self, tmp_path):
+        """Identical concurrent queries send one request and all get its result."""
+        client = self.client(tmp_path)
+        result = {'data': {'token': {'id': '1'}}}
+        calls, results = self.run_concurrently(client, lambda: (result, None))
+        assert len(calls) == 1
+        assert all(r == result for r in results)
+
+    def test_leader_error_reaches_waiters(self, tmp_path):
+        """When the shared request fails, every waiter gets the leader's exception."""
+        from utils.graph_helper import GraphClientError
+
+        client = self.client(tmp_path, max_retries=1)
+
+        def fail():
+            raise GraphClientError("bad query")
+
+        calls, results = self.run_concurrently(client, fail)
+        assert len(calls) == 1
+        assert isinstance(results[0], GraphClientError)
+        assert all(r is results[0] for r in results)
+        assert not client._inflight
+
+    def test_not_modified_restarts_ttl(self, tmp_path):
+        """A 304 for a stale entry returns the cached body and makes it fresh again."""
+        from utils.graph_helper import NotModified
+
+        client = self.client(tmp_path)
+        body = {'data': {'token': {'id': '1'}}}
+        with patch('time.time', return_value=1000.0), \
+                patch.object(client, '_send', return_value=(body, '"v1"')):
+            assert client.query(self.QUERY, {'id': '1'}) == body
+
+        with patch('time.time', return_value=1000.0 + 120), \
+                patch.object(client, '_send', side_effect=NotModified("304")) as send:
+            assert client.query(self.QUERY, {'id': '1'}) == body
+            assert send.call_args.args == (self.QUERY, {'id': '1'}, '"v1"')
+            assert client.cache.get_entry(self.QUERY, {'id': '1'}) == (1120.0, body)
+
+            # Fresh again: served from the cache without a request
+            assert client.query(self.QUERY, {'id': '1'}) == body
+            assert send.call_count == 1
@@ -2,20 +2,132 @@
 """
 Enhanced caching system with compression, size limits, and cleanup
 """
-import json
+import asyncio
 import hashlib
-import gzip
 import logging
-from datetime import datetime, timedelta
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Awaitable, Callable, List, Tuple
+
+import orjson
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=256)
+def _query_digest(query: str) -> bytes:
+    """
+    BLAKE2b digest of a stripped GraphQL document
+    
+    Query documents are module-level constants issued over and over with
+    different variables, so each is stripped and hashed once.
+    """
+    return hashlib.blake2b(query.strip().encode(), digest_size=16).digest()
+
+
+def cache_key(query: str, variables: Optional[Dict] = None) -> str:
+    """
+    Cache key for a query and its variables
+    
+    The variables are serialized with orjson (sorted keys, so equal dicts
+    give equal keys) and hashed together with the memoized query digest,
+    so a repeat query costs one small hash over the variables only.
+    
+    Args:
+        query: GraphQL query string
+        variables: Query variables
+        
+    Returns:
+        32-character hex digest
+    """
+    query_digest = _query_digest(query)
+    if not variables:
+        return query_digest.hex()
+    digest = hashlib.blake2b(query_digest, digest_size=16)
+    digest.update(orjson.dumps(variables, option=orjson.OPT_SORT_KEYS))
+    return digest.hexdigest()
+
+
+# Eviction frees down to SIZE_CULL_TARGET of the size limit, so the next
+# few writes don't trigger another sweep
+SIZE_CULL_TARGET = 0.9
+
+# Payloads are JSON, which compresses well even at zlib's fastest level;
+# higher levels cost several times the CPU for a few percent of space
+COMPRESS_LEVEL = 1
+
+# Let SQLite read the cache database through a memory map of this size
+# instead of read() calls into its own page cache, so large payloads are
+# served from the OS page cache without an extra copy
+CACHE_MMAP_SIZE = 256 * 1024 * 1024
+
+# Threads used to unlink legacy cache files; unlink is I/O-bound, so
+# overlapping the calls helps on slow and network filesystems
+UNLINK_WORKERS = 8
+
+
+class _CacheStore:
+    """
+    Connection and in-memory index of one cache database
+    
+    Shared by every QueryCache on the same file (see _shared_store()), so
+    a write through one client is visible to the others and no client
+    keeps index entries for rows another one deleted.
+    """
+    
+    def __init__(self, db_path: Path):
+        # One connection shared by the worker threads the Graph client runs
+        # in; sqlite3 connections are not safe for concurrent use, so every
+        # statement runs under the lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        
+        # key -> (written_at, payload size, ETag), kept in step with every
+        # write and delete; size is the payload total. Kept in write order
+        # (oldest first), so eviction needs no sort.
+        self.index: Dict[str, Tuple[float, int, Optional[str]]] = {}
+        self.size = 0
+        # Longest max age passed to cleanup_expired() by any client (the
+        # meta table's 'retention'); younger entries are never dropped
+        self.retention = 0.0
+        self.loaded = False
+
+
+# Open cache databases by resolved path
+_stores: Dict[str, _CacheStore] = {}
+_stores_lock = threading.Lock()
+
+
+def _shared_store(db_path: Path) -> _CacheStore:
+    """The _CacheStore of a database file, opened on first use"""
+    path = str(db_path.resolve())
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = _CacheStore(db_path)
+        return store
+
+
 class QueryCache:
     """
-    File-based query cache with automatic cleanup and compression
+    SQLite-backed query cache with size limits, cleanup and compression
+    
+    All entries live in one database file inside cache_dir, so a lookup is
+    a single indexed SELECT on an open connection instead of a stat, open
+    and read of a file per entry. Write times and sizes are mirrored in
+    memory: misses and expired entries are answered without a query, and
+    cleanup, eviction and size accounting are dict scans.
+    
+    Instances on the same cache_dir share the connection and index; each
+    keeps its own TTL, size limit and statistics.
     """
     
     def __init__(
@@ -30,18 +142,32 @@ class QueryCache:
         Initialize QueryCache
         
         Args:
-            cache_dir: Directory to store cache files
+            cache_dir: Directory holding the cache database
             ttl_minutes: Time-to-live for cache entries in minutes
-            max_cache_size_mb: Maximum cache directory size in MB
-            compress: Enable gzip compression for cache files
+            max_cache_size_mb: Maximum total size of cached payloads in MB
+            compress: Enable zlib compression for cached payloads
             cleanup_on_init: Clean expired entries on initialization
         """
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True, parents=True)
-        self.ttl = timedelta(minutes=ttl_minutes)
+        self.db_path = self.cache_dir / "cache.db"
+        # Ages are compared as float seconds against time.time() write stamps
+        self.ttl_seconds = ttl_minutes * 60.0
         self.max_cache_size_bytes = max_cache_size_mb * 1024 * 1024
         self.compress = compress
         
+        self._store = _shared_store(self.db_path)
+        self._conn = self._store.conn
+        self._lock = self._store.lock
+        self._index = self._store.index
+        with self._lock:
+            first_open = not self._store.loaded
+            if first_open:
+                self._init_db()
+                self._store.loaded = True
+        if first_open:
+            self._remove_legacy_files()
+        
         # Statistics
         self.stats = {
             'hits': 0,
@@ -54,6 +180,101 @@ class QueryCache:
         if cleanup_on_init:
             self.cleanup_expired()
     
+    def _init_db(self):
+        """Create the cache tables if they don't exist and load the index (lock held)"""
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(f"PRAGMA mmap_size={CACHE_MMAP_SIZE}")
+            # Entries store their write time rather than an expiry, because
+            # callers pass per-query TTLs to get() and cleanup_expired()
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    written_at REAL NOT NULL,
+                    blob BLOB NOT NULL,
+                    etag TEXT
+                )
+            """)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cache)")}
+            if 'etag' not in columns:
+                self._conn.execute("ALTER TABLE cache ADD COLUMN etag TEXT")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_written_at ON cache (written_at)"
+            )
+            # Longest max age any client passed to cleanup_expired()
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL)"
+            )
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'retention'").fetchone()
+            self._store.retention = row[0] if row is not None else 0.0
+            
+            for key, written_at, size, etag in self._conn.execute(
+                "SELECT key, written_at, length(blob), etag FROM cache ORDER BY written_at"
+            ):
+                self._index[key] = (written_at, size, etag)
+                self._size += size
+    
+    @property
+    def _size(self) -> int:
+        """Payload total of the shared index"""
+        return self._store.size
+    
+    @_size.setter
+    def _size(self, value: int):
+        self._store.size = value
+    
+    @property
+    def ttl(self) -> timedelta:
+        """Default time-to-live as a timedelta"""
+        return timedelta(seconds=self.ttl_seconds)
+    
+    def max_age_seconds(self, ttl: Optional[timedelta] = None) -> float:
+        """Freshness limit in seconds for a per-lookup TTL (defaults to the cache TTL)"""
+        return ttl.total_seconds() if ttl else self.ttl_seconds
+    
+    def _remove_legacy_files(self):
+        """
+        Delete entry files left in cache_dir by the file-per-entry cache
+        
+        One os.scandir() pass collects the paths (the DirEntry objects already
+        carry the file type, so no per-file stat() is needed to skip the
+        database files), then the unlinks run on a small thread pool.
+        """
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                paths = [
+                    entry.path for entry in entries
+                    if entry.name.endswith(('.json', '.json.gz')) and entry.is_file(follow_symlinks=False)
+                ]
+        except OSError as e:
+            logger.error(f"Legacy cache cleanup error: {str(e)}")
+            return
+        
+        if not paths:
+            return
+        
+        def unlink(path: str) -> bool:
+            try:
+                os.unlink(path)
+                return True
+            except OSError as e:
+                logger.error(f"Legacy cache cleanup error: {str(e)}")
+                return False
+        
+        with ThreadPoolExecutor(max_workers=UNLINK_WORKERS) as executor:
+            removed = sum(executor.map(unlink, paths))
+        
+        if removed > 0:
+            logger.info(f"Removed {removed} legacy cache files")
+    
+    def _drop(self, keys: List[str]):
+        """Delete entries from the database and the index (lock held)"""
+        for key in keys:
+            self._size -= self._index.pop(key)[1]
+        with self._conn:
+            self._conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+    
     def _get_cache_key(self, query: str, variables: Optional[Dict] = None) -> str:
         """
         Generate cache key from query and variables
@@ -63,62 +284,158 @@ class QueryCache:
             variables: Query variables
             
         Returns:
-            MD5 hash as cache key
+            Hex digest as cache key (see cache_key())
         """
-        content = query.strip()
-        if variables:
-            content += json.dumps(variables, sort_keys=True)
-        return hashlib.md5(content.encode()).hexdigest()
+        return cache_key(query, variables)
     
-    def _get_cache_path(self, cache_key: str) -> Path:
-        """Get file path for cache key"""
-        extension = '.json.gz' if self.compress else '.json'
-        return self.cache_dir / f"{cache_key}{extension}"
+    def _encode(self, result: Dict[str, Any]) -> bytes:
+        """Serialize (and compress) a result for storage"""
+        # Graph responses are parsed with orjson, so they always round-trip
+        payload = orjson.dumps(result)
+        return zlib.compress(payload, COMPRESS_LEVEL) if self.compress else payload
     
-    def get(self, query: str, variables: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+    def _decode(self, blob: bytes) -> Dict[str, Any]:
+        """Inverse of _encode()"""
+        if self.compress:
+            blob = zlib.decompress(blob)
+        return orjson.loads(blob)
+    
+    def get(
+        self,
+        query: str,
+        variables: Optional[Dict] = None,
+        ttl: Optional[timedelta] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         Get cached result if fresh
         
         Args:
             query: GraphQL query string
             variables: Query variables
+            ttl: Freshness limit for this lookup (defaults to the cache TTL)
             
         Returns:
             Cached result or None if not found/expired
         """
+        entry = self.get_entry(query, variables, ttl)
+        return entry[1] if entry is not None else None
+    
+    def get_entry(
+        self,
+        query: str,
+        variables: Optional[Dict] = None,
+        ttl: Optional[timedelta] = None
+    ) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """
+        Like get(), but also return when the entry was written
+        
+        Args:
+            query: GraphQL query string
+            variables: Query variables
+            ttl: Freshness limit for this lookup (defaults to the cache TTL)
+            
+        Returns:
+            (written_at as a Unix timestamp, result) or None if not found/expired
+        """
         try:
             cache_key = self._get_cache_key(query, variables)
-            cache_file = self._get_cache_path(cache_key)
             
-            if not cache_file.exists():
-                self.stats['misses'] += 1
-                return None
-            
-            # Check if expired
-            modified_time = datetime.fromtimestamp(cache_file.stat().st_mtime)
-            if datetime.now() - modified_time > self.ttl:
-                self.stats['expired'] += 1
-                cache_file.unlink()  # Delete expired file
-                return None
+            with self._lock:
+                meta = self._index.get(cache_key)
+                if meta is None:
+                    self.stats['misses'] += 1
+                    return None
+                
+                # Check if expired; entries with an ETag are kept so the
+                # next request can revalidate them (see revalidate()), and
+                # so are those another client may still serve
+                written_at, _, etag = meta
+                age = time.time() - written_at
+                if age > self.max_age_seconds(ttl):
+                    self.stats['expired'] += 1
+                    if etag is None and age > self._store.retention:
+                        self._drop([cache_key])
+                    return None
+                
+                row = self._conn.execute(
+                    "SELECT blob FROM cache WHERE key = ?", (cache_key,)
+                ).fetchone()
+                if row is None:
+                    # Deleted by another process sharing the file
+                    self._size -= self._index.pop(cache_key)[1]
+                    self.stats['misses'] += 1
+                    return None
             
-            # Read cached data
-            if self.compress:
-                with gzip.open(cache_file, 'rt', encoding='utf-8') as f:
-                    data = json.load(f)
-            else:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+            data = self._decode(row[0])
             
             self.stats['hits'] += 1
             logger.debug(f"Cache hit: {cache_key}")
-            return data
+            return written_at, data
             
         except Exception as e:
             self.stats['errors'] += 1
             logger.error(f"Cache read error: {str(e)}")
             return None
     
-    def set(self, query: str, result: Dict[str, Any], variables: Optional[Dict] = None):
+    def get_etag(self, query: str, variables: Optional[Dict] = None) -> Optional[str]:
+        """
+        ETag the server sent with a cached result, fresh or not
+        
+        Args:
+            query: GraphQL query string
+            variables: Query variables
+            
+        Returns:
+            ETag or None if there is no entry or it has none
+        """
+        with self._lock:
+            meta = self._index.get(self._get_cache_key(query, variables))
+        return meta[2] if meta is not None else None
+    
+    def revalidate(self, query: str, variables: Optional[Dict] = None) -> Optional[float]:
+        """
+        Restart the TTL of an entry the server reported unchanged (HTTP 304)
+        
+        Args:
+            query: GraphQL query string
+            variables: Query variables
+            
+        Returns:
+            New written_at, or None if the entry is gone
+        """
+        try:
+            cache_key = self._get_cache_key(query, variables)
+            written_at = time.time()
+            
+            with self._lock:
+                if cache_key not in self._index:
+                    return None
+                with self._conn:
+                    updated = self._conn.execute(
+                        "UPDATE cache SET written_at = ? WHERE key = ?", (written_at, cache_key)
+                    ).rowcount
+                # Re-inserted, so the entry moves to the end like a rewrite
+                _, size, etag = self._index.pop(cache_key)
+                if not updated:
+                    self._size -= size
+                    return None
+                self._index[cache_key] = (written_at, size, etag)
+            
+            logger.debug(f"Cache revalidated: {cache_key}")
+            return written_at
+            
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Cache revalidate error: {str(e)}")
+            return None
+    
+    def set(
+        self,
+        query: str,
+        result: Dict[str, Any],
+        variables: Optional[Dict] = None,
+        etag: Optional[str] = None
+    ):
         """
         Cache query result
         
@@ -126,24 +443,31 @@ class QueryCache:
             query: GraphQL query string
             result: Query result to cache
             variables: Query variables
+            etag: ETag response header, for conditional refreshes
         """
         try:
             cache_key = self._get_cache_key(query, variables)
-            cache_file = self._get_cache_path(cache_key)
+            blob = self._encode(result)
             
             # Write to cache
-            if self.compress:
-                with gzip.open(cache_file, 'wt', encoding='utf-8') as f:
-                    json.dump(result, f)
-            else:
-                with open(cache_file, 'w', encoding='utf-8') as f:
-                    json.dump(result, f, indent=2)
+            written_at = time.time()
+            with self._lock:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO cache (key, written_at, blob, etag) VALUES (?, ?, ?, ?)",
+                        (cache_key, written_at, blob, etag)
+                    )
+                # Re-inserted, so a rewritten key moves to the end
+                old_size = self._index.pop(cache_key, (0, 0, None))[1]
+                self._index[cache_key] = (written_at, len(blob), etag)
+                self._size += len(blob) - old_size
             
             self.stats['writes'] += 1
             logger.debug(f"Cache write: {cache_key}")
             
             # Check size limits
-            self._enforce_size_limit()
+            if self._size > self.max_cache_size_bytes:
+                self._enforce_size_limit()
             
         except Exception as e:
             self.stats['errors'] += 1
@@ -162,13 +486,15 @@ class QueryCache:
         """
         try:
             cache_key = self._get_cache_key(query, variables)
-            cache_file = self._get_cache_path(cache_key)
             
-            if cache_file.exists():
-                cache_file.unlink()
+            with self._lock:
+                deleted = cache_key in self._index
+                if deleted:
+                    self._drop([cache_key])
+            
+            if deleted:
                 logger.debug(f"Cache deleted: {cache_key}")
-                return True
-            return False
+            return deleted
             
         except Exception as e:
             logger.error(f"Cache delete error: {str(e)}")
@@ -177,32 +503,46 @@ class QueryCache:
     def clear(self):
         """Clear all cache entries"""
         try:
-            for cache_file in self.cache_dir.glob('*'):
-                if cache_file.is_file():
-                    cache_file.unlink()
+            with self._lock:
+                with self._conn:
+                    self._conn.execute("DELETE FROM cache")
+                self._index.clear()
+                self._size = 0
             logger.info("Cache cleared")
         except Exception as e:
             logger.error(f"Cache clear error: {str(e)}")
     
-    def cleanup_expired(self) -> int:
+    def cleanup_expired(self, max_age: Optional[timedelta] = None) -> int:
         """
         Remove expired cache entries
         
+        Other clients of the same database may keep entries for longer, so
+        the age used is the longest any client has ever passed here; it is
+        stored in the database, so it holds across processes and restarts.
+        
+        Args:
+            max_age: Age after which an entry is removed (defaults to the cache TTL);
+                callers using per-query TTLs pass their longest one
+        
         Returns:
             Number of entries removed
         """
         removed = 0
         try:
-            now = datetime.now()
-            
-            for cache_file in self.cache_dir.glob('*'):
-                if not cache_file.is_file():
-                    continue
-                
-                modified_time = datetime.fromtimestamp(cache_file.stat().st_mtime)
-                if now - modified_time > self.ttl:
-                    cache_file.unlink()
-                    removed += 1
+            with self._lock:
+                cutoff = time.time() - self._retention(self.max_age_seconds(max_age))
+                expired = [
+                    key for key, (written_at, _, _) in self._index.items()
+                    if written_at < cutoff
+                ]
+                if expired:
+                    # One range delete on the written_at index rather than
+                    # a statement per key
+                    with self._conn:
+                        self._conn.execute("DELETE FROM cache WHERE written_at < ?", (cutoff,))
+                    for key in expired:
+                        self._size -= self._index.pop(key)[1]
+                removed = len(expired)
             
             if removed > 0:
                 logger.info(f"Cleaned up {removed} expired cache entries")
@@ -212,33 +552,41 @@ class QueryCache:
         
         return removed
     
+    def _retention(self, max_age: float) -> float:
+        """Record max_age and return the longest one recorded (lock held)"""
+        # Read back every time: another process may have raised it
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'retention'").fetchone()
+        if row is None or row[0] < max_age:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('retention', ?)", (max_age,)
+                )
+        else:
+            max_age = row[0]
+        self._store.retention = max_age
+        return max_age
+    
     def _enforce_size_limit(self):
         """Remove oldest entries if cache exceeds size limit"""
         try:
-            total_size = sum(f.stat().st_size for f in self.cache_dir.glob('*') if f.is_file())
-            
-            if total_size <= self.max_cache_size_bytes:
-                return
-            
-            # Get all files sorted by modification time (oldest first)
-            files = sorted(
-                [f for f in self.cache_dir.glob('*') if f.is_file()],
-                key=lambda f: f.stat().st_mtime
-            )
-            
-            # Remove oldest files until under limit
-            removed = 0
-            for cache_file in files:
+            with self._lock:
+                total_size = self._size
                 if total_size <= self.max_cache_size_bytes:
-                    break
+                    return
                 
-                file_size = cache_file.stat().st_size
-                cache_file.unlink()
-                total_size -= file_size
-                removed += 1
+                # Walk entries oldest first until enough is freed
+                target = self.max_cache_size_bytes * SIZE_CULL_TARGET
+                evict = []
+                for key, (_, size, _) in self._index.items():
+                    if total_size <= target:
+                        break
+                    evict.append(key)
+                    total_size -= size
+                
+                self._drop(evict)
             
-            if removed > 0:
-                logger.info(f"Removed {removed} old cache entries to enforce size limit")
+            if evict:
+                logger.info(f"Removed {len(evict)} old cache entries to enforce size limit")
                 
         except Exception as e:
             logger.error(f"Size limit enforcement error: {str(e)}")
@@ -261,11 +609,9 @@ class QueryCache:
         
         # Calculate cache size
         try:
-            cache_files = list(self.cache_dir.glob('*'))
-            stats['entry_count'] = len([f for f in cache_files if f.is_file()])
-            stats['size_bytes'] = sum(
-                f.stat().st_size for f in cache_files if f.is_file()
-            )
+            with self._lock:
+                stats['entry_count'] = len(self._index)
+                stats['size_bytes'] = self._size
             stats['size_mb'] = stats['size_bytes'] / (1024 * 1024)
         except Exception as e:
             logger.error(f"Error calculating cache stats: {str(e)}")
@@ -288,37 +634,42 @@ class QueryCache:
 
 class InMemoryCache:
     """
-    Simple in-memory cache for short-lived data
+    Simple bounded in-memory cache for short-lived data
+    
+    Entries are kept in write order (a write moves its key to the end) and
+    the oldest write is evicted first. With one TTL for every entry,
+    expired entries are always at the front, so cleanup stops at the first
+    live one.
     """
     
-    def __init__(self, ttl_seconds: int = 60):
+    def __init__(self, ttl_seconds: int = 60, max_entries: int = 1024):
         """
         Initialize in-memory cache
         
         Args:
             ttl_seconds: Time-to-live in seconds
+            max_entries: Maximum number of cached results
         """
-        self.cache = {}
-        self.ttl = timedelta(seconds=ttl_seconds)
+        self.cache: OrderedDict = OrderedDict()
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = max_entries
     
     def _get_cache_key(self, query: str, variables: Optional[Dict] = None) -> str:
         """Generate cache key"""
-        content = query.strip()
-        if variables:
-            content += json.dumps(variables, sort_keys=True)
-        return hashlib.md5(content.encode()).hexdigest()
+        return cache_key(query, variables)
     
     def get(self, query: str, variables: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
         """Get cached result"""
         key = self._get_cache_key(query, variables)
         
-        if key not in self.cache:
+        entry = self.cache.get(key)
+        if entry is None:
             return None
         
-        data, timestamp = self.cache[key]
+        data, timestamp = entry
         
         # Check if expired
-        if datetime.now() - timestamp > self.ttl:
+        if time.monotonic() - timestamp > self.ttl_seconds:
             del self.cache[key]
             return None
         
@@ -327,7 +678,92 @@ class InMemoryCache:
     def set(self, query: str, result: Dict[str, Any], variables: Optional[Dict] = None):
         """Set cached result"""
         key = self._get_cache_key(query, variables)
-        self.cache[key] = (result, datetime.now())
+        self.cache[key] = (result, time.monotonic())
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+    
+    def clear(self):
+        """Clear all cache entries"""
+        self.cache.clear()
+    
+    def cleanup_expired(self) -> int:
+        """Remove expired entries"""
+        cutoff = time.monotonic() - self.ttl_seconds
+        removed = 0
+        
+        for key, (_, timestamp) in list(self.cache.items()):
+            if timestamp >= cutoff:
+                break
+            del self.cache[key]
+            removed += 1
+        
+        return removed
+
+
+class AsyncTTLCache:
+    """
+    In-memory cache for results of async fetches, keyed by string
+    
+    Concurrent misses for one key share a single fetch: the first caller
+    starts it and later callers await the same task. Failed fetches are
+    not cached.
+    """
+    
+    def __init__(self, max_entries: int = 4096):
+        """
+        Initialize async TTL cache
+        
+        Args:
+            max_entries: Maximum number of cached results
+        """
+        self.max_entries = max_entries
+        self.cache: Dict[str, tuple] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    async def get_or_fetch(self, key: str, ttl_seconds: float,
+                           fetch: Callable[[], Awaitable[Any]], force: bool = False) -> Any:
+        """
+        Get the cached result for key, or fetch and cache it
+        
+        Args:
+            key: Cache key
+            ttl_seconds: How long a fetched result stays valid
+            fetch: Zero-argument callable returning the awaitable to run on a miss
+            force: Ignore a cached result (an explicit refresh); a fetch
+                already in flight is still shared
+            
+        Returns:
+            Cached or freshly fetched result
+        """
+        entry = self.cache.get(key)
+        if entry is not None:
+            result, expires_at = entry
+            if not force and time.monotonic() < expires_at:
+                return result
+            del self.cache[key]
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, ttl_seconds, t))
+        
+        # Shielded, so one cancelled caller doesn't cancel the shared fetch
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: str, ttl_seconds: float, task: asyncio.Task):
+        """Store a completed fetch and release its key"""
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        
+        if len(self.cache) >= self.max_entries:
+            self.cleanup_expired()
+            if len(self.cache) >= self.max_entries:
+                # Insertion order: the first key is the oldest
+                del self.cache[next(iter(self.cache))]
+        self.cache[key] = (task.result(), time.monotonic() + ttl_seconds)
     
     def clear(self):
         """Clear all cache entries"""
@@ -335,10 +771,10 @@ class InMemoryCache:
     
     def cleanup_expired(self) -> int:
         """Remove expired entries"""
-        now = datetime.now()
+        now = time.monotonic()
         expired_keys = [
-            key for key, (_, timestamp) in self.cache.items()
-            if now - timestamp > self.ttl
+            key for key, (_, expires_at) in self.cache.items()
+            if now >= expires_at
         ]
         
         for key in expired_keys:
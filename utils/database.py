@@ -3,8 +3,10 @@ Database management for tracked wallets.
 Uses SQLite (you know this from Week 6!).
 """
 import sqlite3
+import threading
 from datetime import datetime
-from typing import List, Optional
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
 
 class Database:
     """Database handler for bot data."""
@@ -12,11 +14,24 @@ class Database:
     def __init__(self, db_path: str):
         """Initialize database connection."""
         self.db_path = db_path
+        # One connection for the process instead of a connect per call; the
+        # handlers call in from worker threads, so statements run under a lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        # Tracked addresses per user, mirroring the table, so duplicate
+        # adds and unknown removals are answered without a query
+        self._tracked: Dict[int, Set[str]] = defaultdict(set)
         self.init_database()
     
     def init_database(self):
         """Create tables if they don't exist."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock, self.conn as conn:
+            # WAL with synchronous=NORMAL: commits append to the log without
+            # an fsync each, and readers don't block the writer
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS tracked_wallets (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -28,7 +43,17 @@ class Database:
                     UNIQUE(user_id, wallet_address)
                 )
             """)
-            conn.commit()
+            # Serves get_tracked_wallets' filter and ORDER BY without a sort;
+            # lookups by (user_id, wallet_address) use the UNIQUE index
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_tw_user
+                ON tracked_wallets (user_id, created_at DESC)
+            """)
+            
+            for user_id, wallet_address in conn.execute(
+                "SELECT user_id, wallet_address FROM tracked_wallets"
+            ):
+                self._tracked[user_id].add(wallet_address)
     
     def add_tracked_wallet(
         self,
@@ -37,8 +62,11 @@ class Database:
         label: Optional[str] = None
     ) -> bool:
         """Add a wallet to tracking list."""
+        if wallet_address in self._tracked[user_id]:
+            return False  # Already tracking
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._lock, self.conn as conn:
                 conn.execute(
                     """
                     INSERT INTO tracked_wallets (user_id, wallet_address, label)
@@ -46,16 +74,15 @@ class Database:
                     """,
                     (user_id, wallet_address, label)
                 )
-                conn.commit()
-                return True
+                self._tracked[user_id].add(wallet_address)
+            return True
         except sqlite3.IntegrityError:
             return False  # Already tracking
     
     def get_tracked_wallets(self, user_id: int) -> List[dict]:
         """Get all tracked wallets for a user."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute(
+        with self._lock:
+            cursor = self.conn.execute(
                 """
                 SELECT * FROM tracked_wallets
                 WHERE user_id = ?
@@ -67,7 +94,10 @@ class Database:
     
     def remove_tracked_wallet(self, user_id: int, wallet_address: str) -> bool:
         """Remove a wallet from tracking."""
-        with sqlite3.connect(self.db_path) as conn:
+        if wallet_address not in self._tracked[user_id]:
+            return False
+        
+        with self._lock, self.conn as conn:
             cursor = conn.execute(
                 """
                 DELETE FROM tracked_wallets
@@ -75,8 +105,8 @@ class Database:
                 """,
                 (user_id, wallet_address)
             )
-            conn.commit()
-            return cursor.rowcount > 0
+            self._tracked[user_id].discard(wallet_address)
+        return cursor.rowcount > 0
     
     def update_last_balance(
         self,
@@ -85,7 +115,7 @@ class Database:
         balance: float
     ):
         """Update the last known balance for a wallet."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock, self.conn as conn:
             conn.execute(
                 """
                 UPDATE tracked_wallets
@@ -94,7 +124,30 @@ class Database:
                 """,
                 (balance, user_id, wallet_address)
             )
-            conn.commit()
+    
+    def update_last_balances(self, user_id: int, balances: List[tuple]):
+        """
+        Update the last known balance of several wallets in one transaction.
+        
+        Args:
+            user_id: Telegram user ID
+            balances: (wallet_address, balance) pairs
+        """
+        with self._lock, self.conn as conn:
+            conn.executemany(
+                """
+                UPDATE tracked_wallets
+                SET last_balance = ?
+                WHERE user_id = ? AND wallet_address = ?
+                """,
+                [(balance, user_id, address) for address, balance in balances]
+            )
+    
+    def close(self):
+        """Refresh query planner statistics and close the connection."""
+        with self._lock:
+            self.conn.execute("PRAGMA optimize")
+            self.conn.close()
 
 # Global database instance
 from config import Config
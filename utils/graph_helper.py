@@ -2,20 +2,68 @@
 """
 Enhanced GraphQL client with caching, rate limiting, and error handling
 """
-import requests
+import asyncio
+import concurrent.futures
+import hashlib
+import threading
+import httpx
+import orjson
+import random
 import time
 import logging
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, Optional, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 
-from utils.cache_helper import QueryCache
+from utils.cache_helper import QueryCache, cache_key
+from utils.http_session import HTTP2_AVAILABLE, aclose_async_client, get_async_client
 
 logger = logging.getLogger(__name__)
 
+# Parsed results kept in memory in front of the on-disk QueryCache
+MEMORY_CACHE_MAX_ENTRIES = 128
+
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Retry delays: full jitter over an exponential window, so clients that
+# failed together don't retry together; Retry-After is honoured up to the cap
+RETRY_BACKOFF_BASE = 1.0
+RETRY_BACKOFF_CAP = 30.0
+
+# Adaptive concurrency (AIMD): the in-flight request limit grows by
+# CONCURRENCY_INCREASE after each success faster than LATENCY_TARGET and is
+# multiplied by CONCURRENCY_DECREASE when the server reports overload
+CONCURRENCY_INITIAL = 8
+CONCURRENCY_MIN = 1
+CONCURRENCY_MAX = 32
+CONCURRENCY_INCREASE = 0.5
+CONCURRENCY_DECREASE = 0.5
+LATENCY_TARGET = 2.0
+
+# Circuit breaker: after BREAKER_THRESHOLD overload failures in a row,
+# requests fail fast for BREAKER_COOLDOWN seconds; then a single trial
+# request decides whether the circuit closes again
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+# The health check never changes, so its request body is serialized once
+_HEALTH_QUERY = "{ __schema { queryType { name } } }"
+_HEALTH_BODY = orjson.dumps({'query': _HEALTH_QUERY, 'variables': {}})
+
 
 class GraphClientError(Exception):
     """Custom exception for GraphClient errors"""
-    pass
+    
+    def __init__(self, message: str = "", retry_after: Optional[float] = None,
+                 overload: bool = False):
+        super().__init__(message)
+        # Seconds the server asked us to wait before retrying, if it said
+        self.retry_after = retry_after
+        # Whether the failure means the server is overloaded or down (429,
+        # 5xx, timeouts, connection errors), as opposed to a bad query
+        self.overload = overload
 
 
 class RateLimitError(GraphClientError):
@@ -23,6 +71,177 @@ class RateLimitError(GraphClientError):
     pass
 
 
+class CircuitOpenError(GraphClientError):
+    """Raised without sending a request while the circuit breaker is open"""
+    pass
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _request_headers(etag: Optional[str]) -> Dict[str, str]:
+    """Request headers, conditional on etag when one is given"""
+    if etag is None:
+        return _JSON_HEADERS
+    return {**_JSON_HEADERS, 'If-None-Match': etag}
+
+
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    """Delay before retrying after error on the given (0-based) attempt"""
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is not None:
+        return min(retry_after, RETRY_BACKOFF_CAP)
+    return random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * 2 ** attempt))
+
+
+def _should_raise_now(error: Exception, attempt: int, max_attempts: int) -> bool:
+    """
+    Whether a rate limit error is passed straight to the caller
+    
+    A 429 is only retried when the server says how long to wait; an open
+    circuit is never retried.
+    """
+    if isinstance(error, CircuitOpenError):
+        return True
+    if not isinstance(error, RateLimitError):
+        return False
+    return (error.retry_after is None
+            or error.retry_after > RETRY_BACKOFF_CAP
+            or attempt == max_attempts - 1)
+
+
+def _http_error_overload(error: httpx.HTTPError) -> bool:
+    """Whether an httpx error is the server's fault (5xx or no response at all)"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return True
+
+
+class _AdaptiveConcurrency:
+    """
+    AIMD limit on concurrent requests, plus a consecutive-failure circuit
+    breaker, shared by the blocking and async request paths
+    """
+    
+    def __init__(self):
+        self.limit = float(CONCURRENCY_INITIAL)
+        self._inflight = 0
+        self._failures = 0
+        self._open_until = 0.0
+        self._trial_inflight = False
+        self._cond = threading.Condition()
+    
+    def _try_admit(self) -> Optional[bool]:
+        """
+        Take a request slot if one is free (lock held)
+        
+        Returns:
+            None when no slot is free, else whether this is the breaker's trial request
+            
+        Raises:
+            CircuitOpenError: While the breaker is open or its trial is running
+        """
+        trial = self._failures >= BREAKER_THRESHOLD
+        if trial:
+            remaining = self._open_until - time.monotonic()
+            if remaining > 0 or self._trial_inflight:
+                raise CircuitOpenError(
+                    "Circuit open: subgraph is failing, not sending requests",
+                    retry_after=max(remaining, 0.0)
+                )
+        if self._inflight >= int(self.limit):
+            return None
+        self._inflight += 1
+        self._trial_inflight = trial
+        return trial
+    
+    def acquire(self) -> bool:
+        """Block until a request slot is free; returns the trial flag for release()"""
+        with self._cond:
+            while True:
+                trial = self._try_admit()
+                if trial is not None:
+                    return trial
+                self._cond.wait()
+    
+    async def aacquire(self) -> bool:
+        """Async acquire(); polls because the slots are shared with blocking callers"""
+        while True:
+            with self._cond:
+                trial = self._try_admit()
+            if trial is not None:
+                return trial
+            await asyncio.sleep(0.01)
+    
+    def release(self, trial: bool, started: float, error: Optional[BaseException]):
+        """Free a slot and adapt the limit to how the request went"""
+        latency = time.monotonic() - started
+        with self._cond:
+            self._inflight -= 1
+            if trial:
+                self._trial_inflight = False
+            if getattr(error, 'overload', False):
+                self.limit = max(CONCURRENCY_MIN, self.limit * CONCURRENCY_DECREASE)
+                self._failures += 1
+                if self._failures >= BREAKER_THRESHOLD:
+                    if self._failures == BREAKER_THRESHOLD or trial:
+                        logger.warning(f"Circuit open for {BREAKER_COOLDOWN:.0f}s after repeated failures")
+                    self._open_until = time.monotonic() + BREAKER_COOLDOWN
+            else:
+                # Any answer that isn't overload (including GraphQL errors)
+                # shows the server is up
+                self._failures = 0
+                if error is None and latency < LATENCY_TARGET:
+                    self.limit = min(CONCURRENCY_MAX, self.limit + CONCURRENCY_INCREASE)
+            self._cond.notify_all()
+
+
+def _loop_running() -> bool:
+    """Whether the calling thread is running an asyncio event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class NotModified(GraphClientError):
+    """Raised when a conditional request finds the cached result unchanged (HTTP 304)"""
+    pass
+
+
+class PersistedQueryNotFound(GraphClientError):
+    """Raised when the server does not know a persisted query hash yet"""
+    pass
+
+
+class PersistedQueryNotSupported(GraphClientError):
+    """Raised when the server does not support persisted queries"""
+    pass
+
+
+@lru_cache(maxsize=256)
+def query_hash(query: str) -> str:
+    """
+    SHA-256 of a GraphQL document, as used by automatic persisted queries
+    
+    Query documents are module-level constants, so each is hashed once.
+    """
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
 class GraphClient:
     """
     GraphQL client with built-in caching, rate limiting, and retry logic
@@ -36,7 +255,8 @@ class GraphClient:
         cache_dir: str = "cache",
         rate_limit_per_second: float = 10.0,
         max_retries: int = 3,
-        timeout: int = 30
+        timeout: int = 30,
+        persisted_queries: bool = False
     ):
         """
         Initialize GraphClient
@@ -49,23 +269,47 @@ class GraphClient:
             rate_limit_per_second: Maximum requests per second
             max_retries: Maximum retry attempts for failed requests
             timeout: Request timeout in seconds
+            persisted_queries: Send automatic persisted query hashes instead of
+                the full document (only for servers that support APQ)
         """
         self.endpoint = endpoint
         self.timeout = timeout
+        self.persisted_queries = persisted_queries
         self.max_retries = max_retries
         
         # Caching
         self.cache_enabled = cache_enabled
         if cache_enabled:
-            self.cache = QueryCache(cache_dir=cache_dir, ttl_minutes=cache_ttl_minutes)
+            self.cache = QueryCache(
+                cache_dir=cache_dir,
+                ttl_minutes=cache_ttl_minutes,
+                cleanup_on_init=False
+            )
+            # Entries written with a longer per-query TTL must survive restarts
+            self.cache.cleanup_expired(max_age=self._longest_ttl())
         else:
             self.cache = None
         
+        # In-memory LRU in front of self.cache: key -> (written_at, result).
+        # Hot queries are answered without decompressing and parsing the
+        # stored payload; results are shared, so callers must not mutate them.
+        self._mem: OrderedDict = OrderedDict()
+        self._mem_lock = threading.Lock()
+        
         # Rate limiting
         self.rate_limit_per_second = rate_limit_per_second
         self.min_request_interval = 1.0 / rate_limit_per_second if rate_limit_per_second > 0 else 0
         self.last_request_time = 0
         
+        # Backpressure: adaptive in-flight limit and circuit breaker
+        self._concurrency = _AdaptiveConcurrency()
+        
+        # Blocking queries being fetched, by cache key: concurrent callers of
+        # the same query wait for the first one's result instead of
+        # sending their own request
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._inflight_lock = threading.Lock()
+        
         # Statistics
         self.stats = {
             'total_queries': 0,
@@ -80,7 +324,8 @@ class GraphClient:
         query: str,
         variables: Optional[Dict] = None,
         use_cache: bool = True,
-        retry_on_error: bool = True
+        retry_on_error: bool = True,
+        cache_ttl: Optional[timedelta] = None
     ) -> Dict[str, Any]:
         """
         Execute GraphQL query with caching and retry logic
@@ -90,6 +335,7 @@ class GraphClient:
             variables: Query variables
             use_cache: Whether to use cache for this query
             retry_on_error: Whether to retry on failure
+            cache_ttl: Freshness limit for cached results (defaults to the cache TTL)
             
         Returns:
             Query result as dictionary
@@ -102,16 +348,57 @@ class GraphClient:
         
         # Check cache first
         if self.cache_enabled and use_cache:
-            cached_result = self.cache.get(query, variables)
+            cached_result = self._cache_get(query, variables, cache_ttl)
             if cached_result is not None:
                 self.stats['cache_hits'] += 1
                 logger.debug(f"Cache hit for query: {query[:50]}...")
                 return cached_result
             self.stats['cache_misses'] += 1
         
+        if not use_cache:
+            return self._fetch(query, variables, use_cache, retry_on_error)
+        
+        key = cache_key(query, variables)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = concurrent.futures.Future()
+        
+        if not leader:
+            logger.debug(f"Joining in-flight query: {query[:50]}...")
+            return future.result()
+        
+        try:
+            result = self._fetch(query, variables, use_cache, retry_on_error)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+    
+    def _fetch(
+        self,
+        query: str,
+        variables: Dict,
+        use_cache: bool,
+        retry_on_error: bool
+    ) -> Dict[str, Any]:
+        """
+        Send a query with retry logic and cache the result (query() after the cache check)
+        
+        Raises:
+            GraphClientError: On query failure after retries
+        """
         # Execute query with retry logic
         max_attempts = self.max_retries if retry_on_error else 1
         last_error = None
+        # A stale entry with an ETag is refreshed with a conditional request
+        etag = self.cache.get_etag(query, variables) if self.cache_enabled and use_cache else None
         
         for attempt in range(max_attempts):
             try:
@@ -119,28 +406,34 @@ class GraphClient:
                 self._enforce_rate_limit()
                 
                 # Make request
-                result = self._execute_request(query, variables)
+                try:
+                    result, etag = self._send(query, variables, etag)
+                except NotModified:
+                    result = self._cache_revalidated(query, variables)
+                    if result is not None:
+                        return result
+                    # Evicted since the ETag was read: fetch it in full
+                    self._enforce_rate_limit()
+                    result, etag = self._send(query, variables)
                 
                 # Cache successful result
                 if self.cache_enabled and use_cache and result:
-                    self.cache.set(query, result, variables)
+                    self._cache_set(query, variables, result, etag)
                 
                 return result
                 
-            except RateLimitError:
-                # Don't retry rate limit errors, just wait
-                raise
-                
             except Exception as e:
+                if _should_raise_now(e, attempt, max_attempts):
+                    raise
                 last_error = e
                 self.stats['retry_count'] += 1
                 
                 if attempt < max_attempts - 1:
-                    # Exponential backoff
-                    wait_time = (2 ** attempt) * 1.0
+                    # Jittered exponential backoff, or the server's Retry-After
+                    wait_time = _backoff_delay(attempt, e)
                     logger.warning(
                         f"Query failed (attempt {attempt + 1}/{max_attempts}), "
-                        f"retrying in {wait_time}s: {str(e)}"
+                        f"retrying in {wait_time:.1f}s: {str(e)}"
                     )
                     time.sleep(wait_time)
                 else:
@@ -150,60 +443,406 @@ class GraphClient:
         self.stats['failed_queries'] += 1
         raise GraphClientError(f"Query failed after {max_attempts} attempts: {str(last_error)}")
     
-    def _execute_request(self, query: str, variables: Dict) -> Dict[str, Any]:
+    async def aquery(
+        self,
+        query: str,
+        variables: Optional[Dict] = None,
+        use_cache: bool = True,
+        retry_on_error: bool = True,
+        cache_ttl: Optional[timedelta] = None
+    ) -> Dict[str, Any]:
+        """
+        Async counterpart of query() using a shared httpx.AsyncClient
+        
+        Caching, rate limiting, retries and statistics behave exactly like
+        query(), so independent queries can be awaited concurrently.
+        
+        Args:
+            query: GraphQL query string
+            variables: Query variables
+            use_cache: Whether to use cache for this query
+            retry_on_error: Whether to retry on failure
+            cache_ttl: Freshness limit for cached results (defaults to the cache TTL)
+            
+        Returns:
+            Query result as dictionary
+            
+        Raises:
+            GraphClientError: On query failure after retries
+        """
+        self.stats['total_queries'] += 1
+        variables = variables or {}
+        
+        # Check cache first
+        if self.cache_enabled and use_cache:
+            cached_result = self._cache_get(query, variables, cache_ttl)
+            if cached_result is not None:
+                self.stats['cache_hits'] += 1
+                logger.debug(f"Cache hit for query: {query[:50]}...")
+                return cached_result
+            self.stats['cache_misses'] += 1
+        
+        max_attempts = self.max_retries if retry_on_error else 1
+        last_error = None
+        etag = self.cache.get_etag(query, variables) if self.cache_enabled and use_cache else None
+        
+        for attempt in range(max_attempts):
+            try:
+                await self._aenforce_rate_limit()
+                try:
+                    result, etag = await self._asend(query, variables, etag)
+                except NotModified:
+                    result = self._cache_revalidated(query, variables)
+                    if result is not None:
+                        return result
+                    await self._aenforce_rate_limit()
+                    result, etag = await self._asend(query, variables)
+                
+                if self.cache_enabled and use_cache and result:
+                    self._cache_set(query, variables, result, etag)
+                
+                return result
+                
+            except Exception as e:
+                if _should_raise_now(e, attempt, max_attempts):
+                    raise
+                last_error = e
+                self.stats['retry_count'] += 1
+                
+                if attempt < max_attempts - 1:
+                    wait_time = _backoff_delay(attempt, e)
+                    logger.warning(
+                        f"Query failed (attempt {attempt + 1}/{max_attempts}), "
+                        f"retrying in {wait_time:.1f}s: {str(e)}"
+                    )
+                    await asyncio.sleep(wait_time)
+                else:
+                    logger.error(f"Query failed after {max_attempts} attempts: {str(e)}")
+        
+        self.stats['failed_queries'] += 1
+        raise GraphClientError(f"Query failed after {max_attempts} attempts: {str(last_error)}")
+    
+    def _build_payload(self, query: str, variables: Dict, include_query: bool) -> bytes:
+        """
+        Serialize the request body
+        
+        With persisted queries enabled the document hash is always sent, and
+        the document itself only when include_query is set.
+        """
+        payload = {'variables': variables}
+        if include_query or not self.persisted_queries:
+            payload['query'] = query
+        if self.persisted_queries:
+            payload['extensions'] = {
+                'persistedQuery': {'version': 1, 'sha256Hash': query_hash(query)}
+            }
+        return orjson.dumps(payload)
+    
+    def _send(
+        self,
+        query: str,
+        variables: Dict,
+        etag: Optional[str] = None
+    ) -> tuple[Dict[str, Any], Optional[str]]:
+        """_execute_request() within the adaptive concurrency limit"""
+        trial = self._concurrency.acquire()
+        started = time.monotonic()
+        error = None
+        try:
+            return self._execute_request(query, variables, etag)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._concurrency.release(trial, started, error)
+    
+    async def _asend(
+        self,
+        query: str,
+        variables: Dict,
+        etag: Optional[str] = None
+    ) -> tuple[Dict[str, Any], Optional[str]]:
+        """_aexecute_request() within the adaptive concurrency limit"""
+        trial = await self._concurrency.aacquire()
+        started = time.monotonic()
+        error = None
+        try:
+            return await self._aexecute_request(query, variables, etag)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._concurrency.release(trial, started, error)
+    
+    def _execute_request(
+        self,
+        query: str,
+        variables: Dict,
+        etag: Optional[str] = None
+    ) -> tuple[Dict[str, Any], Optional[str]]:
         """
         Execute the actual HTTP request
         
         Args:
             query: GraphQL query string
             variables: Query variables
+            etag: ETag of a cached result to send as If-None-Match
             
         Returns:
-            Response data
+            Response data and the response's ETag header (if any)
             
         Raises:
+            NotModified: When etag is given and the server answers 304
             GraphClientError: On request failure
         """
-        headers = {
-            'Content-Type': 'application/json',
-        }
-        
-        payload = {
-            'query': query,
-            'variables': variables
-        }
+        client = self._get_sync_client()
+        headers = _request_headers(etag)
         
         try:
-            response = requests.post(
+            response = client.post(
                 self.endpoint,
-                json=payload,
+                content=self._build_payload(query, variables, include_query=False),
                 headers=headers,
                 timeout=self.timeout
             )
+            try:
+                return self._handle_response(response), response.headers.get('ETag')
+            except (PersistedQueryNotFound, PersistedQueryNotSupported):
+                # Register the document (or fall back to plain queries)
+                response = client.post(
+                    self.endpoint,
+                    content=self._build_payload(query, variables, include_query=True),
+                    headers=headers,
+                    timeout=self.timeout
+                )
+                return self._handle_response(response), response.headers.get('ETag')
             
-            # Check for HTTP errors
-            if response.status_code == 429:
-                raise RateLimitError("Rate limit exceeded")
-            
-            response.raise_for_status()
-            
-            # Parse response
-            data = response.json()
+        except httpx.TimeoutException:
+            raise GraphClientError(f"Request timeout after {self.timeout}s", overload=True)
+        except httpx.HTTPError as e:
+            raise GraphClientError(f"Request failed: {str(e)}", overload=_http_error_overload(e))
+        except ValueError as e:
+            raise GraphClientError(f"Invalid JSON response: {str(e)}")
+    
+    async def _aexecute_request(
+        self,
+        query: str,
+        variables: Dict,
+        etag: Optional[str] = None
+    ) -> tuple[Dict[str, Any], Optional[str]]:
+        """
+        Execute the HTTP request on the shared async client
+        
+        Args:
+            query: GraphQL query string
+            variables: Query variables
+            etag: ETag of a cached result to send as If-None-Match
             
-            # Check for GraphQL errors
-            if 'errors' in data:
-                error_messages = [e.get('message', str(e)) for e in data['errors']]
-                raise GraphClientError(f"GraphQL errors: {'; '.join(error_messages)}")
+        Returns:
+            Response data and the response's ETag header (if any)
             
-            return data
+        Raises:
+            NotModified: When etag is given and the server answers 304
+            GraphClientError: On request failure
+        """
+        client = self._get_async_client()
+        headers = _request_headers(etag)
+        
+        try:
+            response = await client.post(
+                self.endpoint,
+                content=self._build_payload(query, variables, include_query=False),
+                headers=headers,
+                timeout=self.timeout
+            )
+            try:
+                return self._handle_response(response), response.headers.get('ETag')
+            except (PersistedQueryNotFound, PersistedQueryNotSupported):
+                response = await client.post(
+                    self.endpoint,
+                    content=self._build_payload(query, variables, include_query=True),
+                    headers=headers,
+                    timeout=self.timeout
+                )
+                return self._handle_response(response), response.headers.get('ETag')
             
-        except requests.exceptions.Timeout:
-            raise GraphClientError(f"Request timeout after {self.timeout}s")
-        except requests.exceptions.RequestException as e:
-            raise GraphClientError(f"Request failed: {str(e)}")
+        except httpx.TimeoutException:
+            raise GraphClientError(f"Request timeout after {self.timeout}s", overload=True)
+        except httpx.HTTPError as e:
+            raise GraphClientError(f"Request failed: {str(e)}", overload=_http_error_overload(e))
         except ValueError as e:
             raise GraphClientError(f"Invalid JSON response: {str(e)}")
     
+    def _handle_response(self, response) -> Dict[str, Any]:
+        """
+        Validate an httpx response and return its data
+        
+        Raises:
+            NotModified: On HTTP 304
+            RateLimitError: On HTTP 429
+            GraphClientError: On HTTP 503 or GraphQL errors in the payload
+        """
+        if response.status_code == 304:
+            raise NotModified("Not modified")
+        
+        # Check for HTTP errors
+        if response.status_code == 429:
+            raise RateLimitError(
+                "Rate limit exceeded",
+                retry_after=_parse_retry_after(response.headers.get('Retry-After')),
+                overload=True
+            )
+        if response.status_code == 503:
+            raise GraphClientError(
+                "Service unavailable",
+                retry_after=_parse_retry_after(response.headers.get('Retry-After')),
+                overload=True
+            )
+        
+        response.raise_for_status()
+        
+        # Parse response (orjson.JSONDecodeError is a ValueError)
+        data = orjson.loads(response.content)
+        
+        # Check for GraphQL errors
+        if 'errors' in data:
+            error_messages = [e.get('message', str(e)) for e in data['errors']]
+            if self.persisted_queries:
+                if 'PersistedQueryNotSupported' in error_messages:
+                    logger.warning("Server does not support persisted queries, disabling them")
+                    self.persisted_queries = False
+                    raise PersistedQueryNotSupported(error_messages[0])
+                if 'PersistedQueryNotFound' in error_messages:
+                    raise PersistedQueryNotFound(error_messages[0])
+            raise GraphClientError(f"GraphQL errors: {'; '.join(error_messages)}")
+        
+        return data
+    
+    # One blocking client per endpoint, shared by every GraphClient (and so
+    # every TokenAnalytics instance) so keep-alive connections are reused
+    _sync_clients: Dict[str, httpx.Client] = {}
+    _sync_clients_lock = threading.Lock()
+    
+    def _get_sync_client(self) -> httpx.Client:
+        """Return the shared blocking client for this endpoint"""
+        client = GraphClient._sync_clients.get(self.endpoint)
+        if client is None or client.is_closed:
+            with GraphClient._sync_clients_lock:
+                client = GraphClient._sync_clients.get(self.endpoint)
+                if client is None or client.is_closed:
+                    client = httpx.Client(
+                        http2=HTTP2_AVAILABLE,
+                        limits=httpx.Limits(max_keepalive_connections=10)
+                    )
+                    GraphClient._sync_clients[self.endpoint] = client
+        return client
+    
+    @staticmethod
+    def _get_async_client() -> httpx.AsyncClient:
+        """Return the process-wide AsyncClient of the running loop (see utils.http_session)"""
+        return get_async_client()
+    
+    @staticmethod
+    async def aclose():
+        """Close the shared AsyncClient of the running loop"""
+        await aclose_async_client()
+    
+    async def _aenforce_rate_limit(self):
+        """Async version of _enforce_rate_limit()"""
+        if self.min_request_interval > 0:
+            current_time = time.time()
+            time_since_last = current_time - self.last_request_time
+            
+            if time_since_last < self.min_request_interval:
+                wait_time = self.min_request_interval - time_since_last
+                # Reserve the slot before sleeping so concurrent callers queue up
+                self.last_request_time = current_time + wait_time
+                logger.debug(f"Rate limiting: waiting {wait_time:.3f}s")
+                await asyncio.sleep(wait_time)
+            else:
+                self.last_request_time = current_time
+    
+    def _longest_ttl(self) -> timedelta:
+        """Longest TTL any query of this client may be cached with"""
+        return self.cache.ttl
+    
+    def _cache_get(
+        self,
+        query: str,
+        variables: Dict,
+        ttl: Optional[timedelta]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a fresh result in the memory cache, then in self.cache
+        
+        Args:
+            query: GraphQL query string
+            variables: Query variables
+            ttl: Freshness limit for this lookup (defaults to the cache TTL)
+            
+        Returns:
+            Cached result or None if not found/expired
+        """
+        key = cache_key(query, variables)
+        max_age = self.cache.max_age_seconds(ttl)
+        
+        with self._mem_lock:
+            entry = self._mem.get(key)
+            if entry is not None and time.time() - entry[0] <= max_age:
+                self._mem.move_to_end(key)
+                return entry[1]
+        
+        entry = self.cache.get_entry(query, variables, ttl=ttl)
+        if entry is None:
+            return None
+        self._mem_put(key, entry)
+        return entry[1]
+    
+    def _cache_set(
+        self,
+        query: str,
+        variables: Dict,
+        result: Dict[str, Any],
+        etag: Optional[str] = None
+    ):
+        """Store a result in self.cache and the memory cache"""
+        self.cache.set(query, result, variables, etag=etag)
+        self._mem_put(cache_key(query, variables), (time.time(), result))
+    
+    def _cache_revalidated(self, query: str, variables: Dict) -> Optional[Dict[str, Any]]:
+        """
+        Restart the TTL of a cached result the server reported unchanged
+        
+        The stale result is taken from the memory cache when it is still
+        there, so a 304 costs no decompression or parsing.
+        
+        Returns:
+            The cached result, or None if the entry is gone
+        """
+        written_at = self.cache.revalidate(query, variables)
+        if written_at is None:
+            return None
+        
+        key = cache_key(query, variables)
+        with self._mem_lock:
+            entry = self._mem.get(key)
+        if entry is None:
+            entry = self.cache.get_entry(query, variables)
+            if entry is None:
+                return None
+        
+        self._mem_put(key, (written_at, entry[1]))
+        logger.debug(f"Cache revalidated for query: {query[:50]}...")
+        return entry[1]
+    
+    def _mem_put(self, key: str, entry: tuple):
+        """Insert into the memory cache, evicting the least recently used entry"""
+        with self._mem_lock:
+            self._mem[key] = entry
+            self._mem.move_to_end(key)
+            if len(self._mem) > MEMORY_CACHE_MAX_ENTRIES:
+                self._mem.popitem(last=False)
+    
     def _enforce_rate_limit(self):
         """Enforce rate limiting between requests"""
         if self.min_request_interval > 0:
@@ -231,16 +870,16 @@ class GraphClient:
         
         if query is None:
             # Clear all cache
-            import shutil
-            shutil.rmtree(self.cache.cache_dir)
-            self.cache.cache_dir.mkdir(exist_ok=True)
+            with self._mem_lock:
+                self._mem.clear()
+            self.cache.clear()
             logger.info("Cleared all cache")
         else:
             # Clear specific query
-            cache_key = self.cache._get_cache_key(query, variables or {})
-            cache_file = self.cache.cache_dir / f"{cache_key}.json"
-            if cache_file.exists():
-                cache_file.unlink()
+            variables = variables or {}
+            with self._mem_lock:
+                self._mem.pop(cache_key(query, variables), None)
+            if self.cache.delete(query, variables):
                 logger.info(f"Cleared cache for query: {query[:50]}...")
     
     def get_stats(self) -> Dict[str, Any]:
@@ -292,11 +931,25 @@ class GraphClient:
         Args:
             queries: List of (query, variables) tuples
             use_cache: Whether to use cache
-            delay_between: Additional delay between queries (seconds)
+            delay_between: Additional delay between queries (seconds); when
+                set, queries run one at a time, otherwise concurrently via
+                abatch_query(). Called from a running event loop (where
+                asyncio.run() is not allowed) the queries also run one at a
+                time; coroutines should await abatch_query() instead.
             
         Returns:
             List of results in same order
         """
+        if delay_between <= 0 and not _loop_running():
+            # Nothing to space out: overlap the requests instead
+            async def run_batch():
+                try:
+                    return await self.abatch_query(queries, use_cache=use_cache)
+                finally:
+                    await self.aclose()
+            
+            return asyncio.run(run_batch())
+        
         results = []
         
         for i, (query, variables) in enumerate(queries):
@@ -315,6 +968,47 @@ class GraphClient:
         
         return results
     
+    async def abatch_query(
+        self,
+        queries: list[tuple[str, Optional[Dict]]],
+        use_cache: bool = True,
+        max_concurrency: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
+        """
+        Execute multiple queries concurrently
+        
+        Requests still go through aquery(), so the rate limit spaces out
+        their start times; the semaphore bounds how many are in flight.
+        
+        Args:
+            queries: List of (query, variables) tuples
+            use_cache: Whether to use cache
+            max_concurrency: Maximum requests in flight (defaults to the
+                per-second rate limit)
+            
+        Returns:
+            List of results in same order ({'error': ...} for failed queries)
+        """
+        if max_concurrency is None:
+            if self.rate_limit_per_second > 0:
+                max_concurrency = int(self.rate_limit_per_second)
+            else:
+                max_concurrency = len(queries)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def run_one(i: int, query: str, variables: Optional[Dict]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return await self.aquery(query, variables, use_cache=use_cache)
+                except Exception as e:
+                    logger.error(f"Batch query {i + 1} failed: {str(e)}")
+                    return {'error': str(e)}
+        
+        logger.info(f"Executing {len(queries)} batch queries")
+        return list(await asyncio.gather(
+            *(run_one(i, query, variables) for i, (query, variables) in enumerate(queries))
+        ))
+    
     def health_check(self) -> bool:
         """
         Check if the GraphQL endpoint is accessible
@@ -322,19 +1016,15 @@ class GraphClient:
         Returns:
             True if healthy, False otherwise
         """
-        test_query = """
-        {
-            __schema {
-                queryType {
-                    name
-                }
-            }
-        }
-        """
-        
         try:
-            result = self.query(test_query, use_cache=False, retry_on_error=False)
-            return 'data' in result
+            self._enforce_rate_limit()
+            response = self._get_sync_client().post(
+                self.endpoint,
+                content=_HEALTH_BODY,
+                headers=_JSON_HEADERS,
+                timeout=self.timeout
+            )
+            return 'data' in self._handle_response(response)
         except Exception as e:
             logger.error(f"Health check failed: {str(e)}")
             return False
@@ -349,15 +1039,21 @@ class CachedGraphClient(GraphClient):
         """Initialize with longer default cache TTL"""
         if 'cache_ttl_minutes' not in kwargs:
             kwargs['cache_ttl_minutes'] = 15  # 15 minutes default
-        super().__init__(*args, **kwargs)
         
-        # Custom TTLs for different query types
+        # Custom TTLs for different query types (set before the cache is
+        # created so start-up cleanup keeps long-lived entries)
         self.custom_ttls = {
             'token_info': timedelta(hours=24),      # Token info changes rarely
+            'finalized': timedelta(days=7),          # UTC days closed more than a day ago
             'historical': timedelta(hours=6),        # Historical data is immutable
             'current_price': timedelta(minutes=1),   # Prices change quickly
             'volume': timedelta(minutes=5),          # Volume updates moderately
         }
+        super().__init__(*args, **kwargs)
+    
+    def _longest_ttl(self) -> timedelta:
+        """Longest TTL any query of this client may be cached with"""
+        return max(self.cache.ttl, *self.custom_ttls.values())
     
     def query_with_custom_ttl(
         self,
@@ -376,16 +1072,23 @@ class CachedGraphClient(GraphClient):
         Returns:
             Query result
         """
-        # Temporarily adjust TTL if custom type specified
-        original_ttl = self.cache.ttl if self.cache else None
-        
-        if self.cache and query_type in self.custom_ttls:
-            self.cache.ttl = self.custom_ttls[query_type]
+        return self.query(query, variables, cache_ttl=self.custom_ttls.get(query_type))
+    
+    async def aquery_with_custom_ttl(
+        self,
+        query: str,
+        variables: Optional[Dict] = None,
+        query_type: str = 'default'
+    ) -> Dict[str, Any]:
+        """
+        Async counterpart of query_with_custom_ttl()
         
-        try:
-            result = self.query(query, variables)
-            return result
-        finally:
-            # Restore original TTL
-            if self.cache and original_ttl:
-                self.cache.ttl = original_ttl
+        Args:
+            query: GraphQL query
+            variables: Query variables
+            query_type: Type of query for TTL selection
+            
+        Returns:
+            Query result
+        """
+        return await self.aquery(query, variables, cache_ttl=self.custom_ttls.get(query_type))
@@ -3,7 +3,10 @@
 Minimal GraphQL client - enough to make the bot run
 For full version with caching, see graph_helper.py in outputs folder
 """
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, Optional, Any
 
 class GraphClient:
@@ -23,6 +26,19 @@ class GraphClient:
         self.endpoint = endpoint
         self.timeout = timeout
         self.max_retries = max_retries
+        # Reused across queries so the connection to the endpoint stays open;
+        # transient gateway errors are retried (queries are idempotent reads,
+        # so POST is retried too)
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.3,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset({'POST'})
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         
         # Stats tracking
         self.stats = {
@@ -54,7 +70,7 @@ class GraphClient:
         }
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 self.endpoint,
                 json=payload,
                 headers=headers,
@@ -62,7 +78,7 @@ class GraphClient:
             )
             
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
             # Check for GraphQL errors
             if 'errors' in data:
@@ -75,6 +91,16 @@ class GraphClient:
             self.stats['failed_queries'] += 1
             raise Exception(f"Query failed: {str(e)}")
     
+    def close(self):
+        """Release the pooled connections"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get client statistics"""
         stats = self.stats.copy()
@@ -0,0 +1,49 @@
+# utils/http_session.py
+"""
+Process-wide async HTTP client shared by the subgraph and price fetchers
+
+Connections are bound to the event loop that opened them, so there is one
+httpx.AsyncClient per running loop. Every caller on that loop (GraphClient,
+Web3Helper) shares its connection pool and keep-alive connections.
+"""
+import asyncio
+import importlib.util
+import weakref
+
+import httpx
+
+# HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# Pool sizes across all hosts, and idle connections kept per client
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 30
+KEEPALIVE_EXPIRY = 75.0
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the AsyncClient shared on the running loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            )
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aclose_async_client():
+    """Close the running loop's shared AsyncClient (it is recreated if used again)"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
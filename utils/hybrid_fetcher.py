@@ -1,17 +1,82 @@
 # utils/hybrid_fetcher.py
+import asyncio
+from decimal import Decimal
+import pandas as pd
 from web3 import Web3
 from utils.graph_helper import GraphClient
-from typing import List, Dict
+from utils.web3_helper import shared_provider
+from typing import AsyncIterator, Iterator, List, Dict, Optional
 import time
 
+# Heads move once per block (~12s), so bursts of requests share one lookup
+SUBGRAPH_HEAD_TTL = 5.0
+CHAIN_HEAD_TTL = 2.0
+
+# Transfers per subgraph page
+HYBRID_PAGE_SIZE = 1000
+
+# Per-call values are variables, so the document text is the same for
+# every call and the subgraph can reuse its parsed form. Pages are walked
+# forward with ($fromBlock, $skip) as the cursor: $skip counts the rows of
+# $fromBlock already returned (graph-node breaks blockNumber ties by id).
+# The first page also selects _meta, so the subgraph head arrives in the
+# same round-trip (and from the same snapshot) as the transfers.
+_TRANSFERS_PAGE = """
+query HybridTransfers($fromBlock: BigInt!, $toBlock: BigInt!, $token: String!,
+                      $first: Int!, $skip: Int!) {%s
+  transfers(
+    first: $first,
+    skip: $skip,
+    where: {
+      blockNumber_gte: $fromBlock,
+      blockNumber_lte: $toBlock,
+      token: $token
+    }
+    orderBy: blockNumber,
+    orderDirection: asc
+  ) {
+    id
+    from
+    to
+    amount
+    blockNumber
+    timestamp
+  }
+}
+"""
+_META_FIELD = """
+  _meta {
+    block {
+      number
+    }
+  }"""
+_TRANSFERS_QUERY = _TRANSFERS_PAGE % ''
+_FIRST_TRANSFERS_QUERY = _TRANSFERS_PAGE % _META_FIELD
+
+# Columns of get_transfers_df(), in selection order
+_TRANSFER_COLUMNS = ('id', 'from', 'to', 'amount', 'blockNumber', 'timestamp')
+
+
+def _exact_amount(value: str):
+    """int for BigInt amounts, Decimal for BigDecimal ones; never float"""
+    try:
+        return int(value)
+    except ValueError:
+        return Decimal(value)
+
+
 class HybridDataFetcher:
-    def __init__(self, subgraph_url: str, rpc_url: str):
+    def __init__(self, subgraph_url: str, rpc_url: str, provider=None):
         self.graph = GraphClient(subgraph_url)
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        # The RPC provider (and its connection pool) is shared with Web3Helper
+        self.w3 = Web3(provider or shared_provider(rpc_url))
+        # (monotonic time fetched, block number) of the last head lookups
+        self._meta_ts = 0.0
+        self._meta_block = 0
+        self._head_ts = 0.0
+        self._head_block = 0
     
-    def get_subgraph_latest_block(self) -> int:
-        """Get the latest block indexed by subgraph"""
-        query = """
+    META_QUERY = """
         {
           _meta {
             block {
@@ -20,46 +85,59 @@ class HybridDataFetcher:
           }
         }
         """
-        result = self.graph.query(query)
-        return result['data']['_meta']['block']['number']
     
-    def get_transfers_hybrid(self, token_address: str, 
-                            from_block: int, to_block: int = None) -> List[Dict]:
+    def _store_meta(self, result: Dict) -> int:
+        """Remember the subgraph head from a META_QUERY result"""
+        self._meta_block = result['data']['_meta']['block']['number']
+        self._meta_ts = time.monotonic()
+        return self._meta_block
+    
+    def get_subgraph_latest_block(self) -> int:
         """
-        Get transfers combining indexed + real-time data
+        Get the latest block indexed by subgraph
+        
+        Reused for SUBGRAPH_HEAD_TTL seconds; the query bypasses the
+        GraphClient cache, whose TTL is far longer than a block.
         """
-        latest_indexed = self.get_subgraph_latest_block()
-        current_block = self.w3.eth.block_number
+        if time.monotonic() - self._meta_ts < SUBGRAPH_HEAD_TTL:
+            return self._meta_block
+        return self._store_meta(self.graph.query(self.META_QUERY, use_cache=False))
+    
+    async def aget_subgraph_latest_block(self) -> int:
+        """Async version of get_subgraph_latest_block()"""
+        if time.monotonic() - self._meta_ts < SUBGRAPH_HEAD_TTL:
+            return self._meta_block
+        return self._store_meta(await self.graph.aquery(self.META_QUERY, use_cache=False))
+    
+    def get_chain_head(self) -> int:
+        """Latest chain block number, reused for CHAIN_HEAD_TTL seconds"""
+        if time.monotonic() - self._head_ts >= CHAIN_HEAD_TTL:
+            self._head_block = self.w3.eth.block_number
+            self._head_ts = time.monotonic()
+        return self._head_block
+    
+    def iter_transfers_hybrid(self, token_address: str,
+                              from_block: int, to_block: int = None) -> Iterator[Dict]:
+        """
+        Stream transfers combining indexed + real-time data
         
+        Indexed transfers are fetched and yielded one page at a time, so
+        memory stays flat for wide ranges and callers can stop early.
+        """
         if to_block is None:
-            to_block = current_block
-        
-        results = []
+            to_block = self.get_chain_head()
         
         # Part 1: Get indexed data from The Graph
-        if from_block < latest_indexed:
-            indexed_end = min(to_block, latest_indexed)
-            query = """
-            {
-              transfers(
-                where: {
-                  blockNumber_gte: %d,
-                  blockNumber_lte: %d,
-                  token: "%s"
-                }
-                orderBy: blockNumber
-              ) {
-                from
-                to
-                amount
-                blockNumber
-                timestamp
-              }
-            }
-            """ % (from_block, indexed_end, token_address.lower())
-            
-            indexed_data = self.graph.query(query)
-            results.extend(indexed_data['data']['transfers'])
+        variables = self._first_page_variables(token_address, from_block, to_block)
+        data = self.graph.query(_FIRST_TRANSFERS_QUERY, variables=variables)['data']
+        latest_indexed = data['_meta']['block']['number']
+        page = data['transfers']
+        while True:
+            yield from page
+            variables = self._next_page(variables, page)
+            if variables is None:
+                break
+            page = self.graph.query(_TRANSFERS_QUERY, variables=variables)['data']['transfers']
         
         # Part 2: Get recent data from RPC
         if to_block > latest_indexed:
@@ -67,5 +145,88 @@ class HybridDataFetcher:
             # Fetch events using web3.py
             # (Implementation depends on your existing code)
             pass
+    
+    def get_transfers_hybrid(self, token_address: str, 
+                            from_block: int, to_block: int = None) -> List[Dict]:
+        """
+        Get transfers combining indexed + real-time data
+        """
+        return list(self.iter_transfers_hybrid(token_address, from_block, to_block))
+    
+    def get_transfers_df(self, token_address: str,
+                         from_block: int, to_block: int = None) -> pd.DataFrame:
+        """
+        Transfers as a DataFrame with one column per field, for columnar
+        aggregation (df['amount'].sum(), groupby on 'from'/'to', ...)
+        
+        Pages are appended straight into column lists, so no list of row
+        dicts is built. blockNumber and timestamp are int64; amount stays
+        exact (object dtype) since uint256 values overflow int64 and lose
+        precision as float.
+        """
+        columns = {name: [] for name in _TRANSFER_COLUMNS}
+        for row in self.iter_transfers_hybrid(token_address, from_block, to_block):
+            for name, column in columns.items():
+                column.append(row[name])
+        
+        columns['amount'] = [_exact_amount(v) for v in columns['amount']]
+        df = pd.DataFrame(columns, columns=list(_TRANSFER_COLUMNS))
+        return df.astype({'amount': object, 'blockNumber': 'int64', 'timestamp': 'int64'})
+    
+    async def aiter_transfers_hybrid(self, token_address: str,
+                                     from_block: int, to_block: int = None) -> AsyncIterator[Dict]:
+        """Async version of iter_transfers_hybrid()"""
+        if to_block is None:
+            to_block = await asyncio.to_thread(self.get_chain_head)
+        
+        variables = self._first_page_variables(token_address, from_block, to_block)
+        data = (await self.graph.aquery(_FIRST_TRANSFERS_QUERY, variables=variables))['data']
+        latest_indexed = data['_meta']['block']['number']
+        page = data['transfers']
+        while True:
+            for row in page:
+                yield row
+            variables = self._next_page(variables, page)
+            if variables is None:
+                break
+            result = await self.graph.aquery(_TRANSFERS_QUERY, variables=variables)
+            page = result['data']['transfers']
+        
+        # Blocks past latest_indexed would come from RPC, as in
+        # iter_transfers_hybrid()
+    
+    async def aget_transfers_hybrid(self, token_address: str,
+                                    from_block: int, to_block: int = None) -> List[Dict]:
+        """Async version of get_transfers_hybrid()"""
+        return [row async for row in self.aiter_transfers_hybrid(token_address, from_block, to_block)]
+    
+    def _first_page_variables(self, token_address: str, from_block: int, to_block: int) -> Dict:
+        """
+        Variables for the first transfers page
+        
+        The range is not capped at the subgraph head: blocks past it have no
+        indexed transfers, so the subgraph returns nothing for them.
+        """
+        return {
+            'fromBlock': str(from_block),
+            'toBlock': str(to_block),
+            'token': token_address.lower(),
+            'first': HYBRID_PAGE_SIZE,
+            'skip': 0
+        }
+    
+    @staticmethod
+    def _next_page(variables: Dict, page: List[Dict]) -> Optional[Dict]:
+        """_TRANSFERS_QUERY variables for the page after this one (None after the last page)"""
+        # A short page is the last one
+        if len(page) < variables['first']:
+            return None
+        
+        last_block = page[-1]['blockNumber']
+        if page[0]['blockNumber'] == last_block and int(last_block) == int(variables['fromBlock']):
+            # The whole page is the cursor block: move further into it
+            return {**variables, 'skip': variables['skip'] + len(page)}
         
-        return results
+        # Resume at the last block, past its rows on this page
+        in_last_block = sum(1 for row in page if row['blockNumber'] == last_block)
+        return {**variables, 'fromBlock': last_block, 'skip': in_last_block}
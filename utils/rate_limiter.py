@@ -1,11 +1,32 @@
 """
 Simple rate limiting to prevent abuse.
 """
-from datetime import datetime, timedelta
-from collections import defaultdict
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+# Lock shards for RateLimiter (a power of two, picked by user_id bits)
+RATE_LIMIT_SHARDS = 16
 
 class RateLimiter:
-    """Rate limit users to prevent spam."""
+    """
+    Rate limit users to prevent spam.
+    
+    Uses the sliding-window-counter approximation: per user only the
+    request counts of the previous and the current fixed window are kept,
+    and the previous count is weighted by how much of it still overlaps
+    the sliding window. Memory per user is constant.
+    
+    Users are split over RATE_LIMIT_SHARDS lock-guarded shards, so
+    concurrent checks are atomic per user without a single global lock.
+    """
     
     def __init__(self, max_requests: int = 10, window_seconds: int = 60):
         """
@@ -16,8 +37,34 @@ class RateLimiter:
             window_seconds: Time window in seconds
         """
         self.max_requests = max_requests
-        self.window = timedelta(seconds=window_seconds)
-        self.requests = defaultdict(list)
+        self.window = float(window_seconds)
+        # Per shard: user_id -> (previous window count, current window
+        # count, current window index), and the lock guarding it
+        self._shards = [({}, threading.Lock()) for _ in range(RATE_LIMIT_SHARDS)]
+        self._next_gc = time.monotonic() + self.window
+    
+    def _shard(self, user_id: int) -> Tuple[Dict[int, Tuple[int, int, int]], threading.Lock]:
+        """The (buckets, lock) shard holding user_id."""
+        return self._shards[user_id & (RATE_LIMIT_SHARDS - 1)]
+    
+    def _counts(self, buckets: Dict, user_id: int, now: float) -> Tuple[int, int, int]:
+        """Return the user's (prev, curr, window) counts shifted to now."""
+        win = int(now // self.window)
+        prev, curr, cw = buckets.get(user_id, (0, 0, win))
+        if win != cw:
+            prev = curr if win == cw + 1 else 0
+            curr = 0
+        return prev, curr, win
+    
+    def _gc(self, now: float):
+        """Drop users idle for long enough that both their windows expired."""
+        self._next_gc = now + self.window
+        win = int(now // self.window)
+        for buckets, lock in self._shards:
+            with lock:
+                stale = [uid for uid, (_, _, cw) in buckets.items() if win - cw >= 2]
+                for uid in stale:
+                    del buckets[uid]
     
     def is_allowed(self, user_id: int) -> bool:
         """
@@ -29,29 +76,213 @@ class RateLimiter:
         Returns:
             True if allowed, False if rate limited
         """
-        now = datetime.now()
-        
-        # Clean old requests
-        self.requests[user_id] = [
-            req_time for req_time in self.requests[user_id]
-            if now - req_time < self.window
-        ]
+        now = time.monotonic()
+        if now >= self._next_gc:
+            self._gc(now)
         
-        # Check if under limit
-        if len(self.requests[user_id]) < self.max_requests:
-            self.requests[user_id].append(now)
-            return True
+        overlap = 1 - (now % self.window) / self.window
+        buckets, lock = self._shard(user_id)
         
-        return False
+        with lock:
+            prev, curr, win = self._counts(buckets, user_id, now)
+            
+            # Check if under limit
+            if curr + prev * overlap < self.max_requests:
+                buckets[user_id] = (prev, curr + 1, win)
+                return True
+            
+            buckets[user_id] = (prev, curr, win)
+            return False
     
     def get_wait_time(self, user_id: int) -> int:
         """Get seconds until user can make another request."""
-        if not self.requests[user_id]:
-            return 0
+        now = time.monotonic()
+        buckets, lock = self._shard(user_id)
+        with lock:
+            prev, curr, _ = self._counts(buckets, user_id, now)
+        elapsed = now % self.window
+        wait = 0.0
+        
+        # A full current window only frees up as it slides into the past
+        if curr >= self.max_requests:
+            wait = self.window - elapsed
+            prev, curr, elapsed = curr, 0, 0.0
+        
+        # Wait until the previous window's weighted share is small enough
+        if prev and curr + prev * (1 - elapsed / self.window) >= self.max_requests:
+            needed = 1 - (self.max_requests - curr) / prev
+            wait += needed * self.window - elapsed
         
-        oldest = min(self.requests[user_id])
-        wait = (oldest + self.window - datetime.now()).total_seconds()
-        return max(0, int(wait))
+        # Round up: a truncated wait can read 0 while still limited
+        return max(0, math.ceil(wait))
+
+class AsyncRateLimiter:
+    """
+    Async leaky-bucket limiter: at most max_rate acquisitions per
+    time_period, waiting (not failing) when the bucket is full.
+    
+    Waiters are served in arrival order.
+    """
+    
+    def __init__(self, max_rate: float, time_period: float = 1.0):
+        """
+        Initialize async rate limiter.
+        
+        Args:
+            max_rate: Acquisitions allowed per time period (also the burst size)
+            time_period: Period length in seconds
+        """
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._level = 0.0
+        self._last_check = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _leak(self):
+        """Drain the bucket for the time elapsed since the last check."""
+        now = time.monotonic()
+        elapsed = now - self._last_check
+        self._level = max(0.0, self._level - elapsed * self.max_rate / self.time_period)
+        self._last_check = now
+    
+    def is_idle(self) -> bool:
+        """Whether the bucket has fully drained and nobody is waiting on it."""
+        if self._lock.locked():
+            return False
+        elapsed = time.monotonic() - self._last_check
+        return self._level - elapsed * self.max_rate / self.time_period <= 0
+    
+    async def acquire(self):
+        """Wait until one more acquisition fits in the bucket."""
+        async with self._lock:
+            self._leak()
+            while self._level + 1 > self.max_rate:
+                overflow = self._level + 1 - self.max_rate
+                await asyncio.sleep(overflow * self.time_period / self.max_rate)
+                self._leak()
+            self._level += 1
+    
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        return None
+
+
+class TelegramRateLimiter(BaseRateLimiter):
+    """
+    Application-level limiter for every outgoing Bot API request.
+    
+    Requests are held to a bot-wide rate, and requests to one chat to a
+    per-chat rate (lower for groups). A RetryAfter from Telegram pauses all
+    requests for the advertised time before the call is retried.
+    """
+    
+    def __init__(
+        self,
+        overall_max_rate: float = 28,
+        overall_time_period: float = 1,
+        chat_max_rate: float = 3,
+        chat_time_period: float = 3,
+        group_max_rate: float = 20,
+        group_time_period: float = 60,
+        max_retries: int = 3
+    ):
+        """
+        Initialize Telegram rate limiter.
+        
+        Args:
+            overall_max_rate: Requests per overall_time_period for the whole bot
+            overall_time_period: Period of the bot-wide limit in seconds
+            chat_max_rate: Requests per chat_time_period to one private chat
+            chat_time_period: Period of the private chat limit in seconds
+            group_max_rate: Requests per group_time_period to one group
+            group_time_period: Period of the group limit in seconds
+            max_retries: Retries after a RetryAfter before giving up
+        """
+        self.max_retries = max_retries
+        self._overall = AsyncRateLimiter(overall_max_rate, overall_time_period)
+        self._chat_rate = (chat_max_rate, chat_time_period)
+        self._group_rate = (group_max_rate, group_time_period)
+        # Per-chat limiters in least recently used order; drained ones are
+        # dropped, since a fresh limiter behaves the same
+        self._chats: OrderedDict = OrderedDict()
+        self._groups: OrderedDict = OrderedDict()
+        # Monotonic time until which no request is sent (Telegram flood wait)
+        self._paused_until = 0.0
+    
+    async def initialize(self) -> None:
+        """Nothing to set up."""
+    
+    async def shutdown(self) -> None:
+        """Nothing to clean up."""
+    
+    @staticmethod
+    def _limiter(table: OrderedDict, key: Any, rate: Tuple[float, float]) -> AsyncRateLimiter:
+        """Limiter for key in table, evicting idle least recently used ones."""
+        limiter = table.get(key)
+        if limiter is None:
+            limiter = table[key] = AsyncRateLimiter(*rate)
+        else:
+            table.move_to_end(key)
+        
+        # The front holds the longest-unused limiters; stop at the first busy one
+        while len(table) > 1:
+            oldest_key, oldest = next(iter(table.items()))
+            if oldest_key == key or not oldest.is_idle():
+                break
+            del table[oldest_key]
+        return limiter
+    
+    def _chat_limiter(self, chat_id: Any) -> Optional[AsyncRateLimiter]:
+        """Limiter for the request's target chat, if it has one."""
+        if chat_id is None:
+            return None
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            # @channelusername
+            return self._limiter(self._groups, chat_id, self._group_rate)
+        if chat_id < 0:
+            return self._limiter(self._groups, chat_id, self._group_rate)
+        return self._limiter(self._chats, chat_id, self._chat_rate)
+    
+    async def _wait_for_pause(self):
+        """Sleep until the shared flood-wait deadline has passed (it may be extended meanwhile)."""
+        delay = self._paused_until - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._paused_until - time.monotonic()
+    
+    async def process_request(self, callback, args, kwargs, endpoint, data,
+                              rate_limit_args: Optional[int]):
+        """
+        Run one Bot API request within the limits.
+        
+        Args:
+            rate_limit_args: Retries after a RetryAfter, overriding max_retries
+        """
+        max_retries = rate_limit_args or self.max_retries
+        chat_limiter = self._chat_limiter(data.get('chat_id'))
+        
+        for attempt in range(max_retries + 1):
+            try:
+                if chat_limiter is not None:
+                    await chat_limiter.acquire()
+                await self._overall.acquire()
+                await self._wait_for_pause()
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == max_retries:
+                    raise
+                wait = e.retry_after
+                if isinstance(wait, timedelta):
+                    wait = wait.total_seconds()
+                # Every request, this one included, holds off until the
+                # deadline; the retry waits for it at the top of the loop
+                self._paused_until = max(self._paused_until, time.monotonic() + wait + 0.1)
+
 
 # Global rate limiter
 rate_limiter = RateLimiter(max_requests=20, window_seconds=60)
@@ -4,6 +4,13 @@ Ensures user input is safe and correctly formatted.
 """
 import re
 
+# 0x followed by exactly 40 hex digits
+_ETH_ADDRESS_MATCH = re.compile(r'0x[0-9a-fA-F]{40}').fullmatch
+
+# Format specs for the common amount formats, so they aren't rebuilt per call
+_ETH_FMT = '.4f'
+_USD_FMT = ',.2f'
+
 class Validators:
     """Input validation methods."""
     
@@ -21,6 +28,11 @@ class Validators:
         # Remove whitespace
         address = address.strip()
         
+        # Fast path: one regex call accepts any well-formed address; the
+        # checks below only pick the error message
+        if _ETH_ADDRESS_MATCH(address):
+            return True, ""
+        
         # Check if starts with 0x
         if not address.startswith('0x'):
             return False, "Address must start with '0x'"
@@ -29,21 +41,20 @@ class Validators:
         if len(address) != 42:
             return False, f"Address must be 42 characters (got {len(address)})"
         
-        # Check if valid hex
-        if not re.match(r'^0x[0-9a-fA-F]{40}$', address):
-            return False, "Address contains invalid characters"
-        
-        return True, ""
+        # Right prefix and length, so the hex digits are wrong
+        return False, "Address contains invalid characters"
     
     @staticmethod
     def format_eth_amount(amount: float, decimals: int = 4) -> str:
         """Format ETH amount for display."""
+        if decimals == 4:
+            return format(amount, _ETH_FMT)
         return f"{amount:.{decimals}f}"
     
     @staticmethod
     def format_usd_amount(amount: float) -> str:
         """Format USD amount for display."""
-        return f"${amount:,.2f}"
+        return '$' + format(amount, _USD_FMT)
     
     @staticmethod
     def sanitize_input(text: str, max_length: int = 100) -> str:
@@ -57,8 +68,11 @@ class Validators:
         Returns:
             Sanitized text
         """
-        # Remove control characters
-        sanitized = ''.join(char for char in text if char.isprintable())
+        # Remove control characters; str.isprintable() scans in C, so the
+        # usual all-printable input skips the per-character filter
+        sanitized = text
+        if not text.isprintable():
+            sanitized = ''.join(char for char in text if char.isprintable())
         
         # Trim whitespace
         sanitized = sanitized.strip()
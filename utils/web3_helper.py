@@ -2,18 +2,94 @@
 Web3 utility functions for blockchain interactions.
 Leverages your previous web3.py experience from Weeks 2-5.
 """
+import threading
+import time
+from functools import lru_cache
+from types import MappingProxyType
+
+import httpx
+import orjson
 import requests
-from web3 import Web3
+from eth_utils import to_checksum_address
+from requests.adapters import HTTPAdapter
+from web3 import HTTPProvider, Web3
 from config import Config
+from utils.http_session import get_async_client
+from utils.validators import _ETH_ADDRESS_MATCH
+
+COINGECKO_PRICE_URL = "https://api.coingecko.com/api/v3/simple/price"
+# CoinGecko refreshes simple/price about every 30s, so a price is reused
+# for that long instead of being fetched again per command
+PRICE_CACHE_TTL = 30
+
+# JSON-RPC connection pool shared by every Web3 instance on the same node
+RPC_POOL_SIZE = 20
+RPC_TIMEOUT_SECONDS = 30
+
+
+@lru_cache(maxsize=4096)
+def _to_checksum(address: str) -> str:
+    """EIP-55 checksum address, memoized (keyed on the lowercased address)"""
+    return to_checksum_address(address)
+
+
+@lru_cache(maxsize=None)
+def shared_provider(rpc_url: str) -> HTTPProvider:
+    """
+    HTTPProvider shared by Web3Helper and HybridDataFetcher for one RPC URL
+    
+    Every Web3 built on it sends requests over the same keep-alive
+    session instead of opening its own connection pool.
+    """
+    adapter = HTTPAdapter(pool_connections=RPC_POOL_SIZE, pool_maxsize=RPC_POOL_SIZE)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return HTTPProvider(
+        rpc_url,
+        request_kwargs={'timeout': RPC_TIMEOUT_SECONDS},
+        session=session
+    )
+
 
 class Web3Helper:
     """Helper class for Web3 operations."""
     
-    def __init__(self):
-        """Initialize Web3 connection."""
-        self.w3 = Web3(Web3.HTTPProvider(Config.RPC_URL))
+    # Map common symbols to CoinGecko IDs
+    _SYMBOL_MAP = MappingProxyType({
+        'ETH': 'ethereum',
+        'BTC': 'bitcoin',
+        'USDC': 'usd-coin',
+        'USDT': 'tether',
+        'DAI': 'dai',
+        'WETH': 'weth',
+        'UNI': 'uniswap',
+        'LINK': 'chainlink'
+    })
+    
+    # simple/price parameters shared by every request; only 'ids' varies
+    _BASE_PARAMS = MappingProxyType({
+        'vs_currencies': 'usd',
+        'include_24hr_change': 'true',
+        'include_market_cap': 'true'
+    })
+    
+    def __init__(self, provider: HTTPProvider = None):
+        """
+        Initialize Web3 connection.
+        
+        Args:
+            provider: Web3 provider (defaults to the shared one for Config.RPC_URL)
+        """
+        self.w3 = Web3(provider or shared_provider(Config.RPC_URL))
         if not self.w3.is_connected():
             raise ConnectionError("Failed to connect to Ethereum node")
+        # Keep-alive session for the price API, so repeat lookups reuse the
+        # TLS connection instead of a handshake per request
+        self.session = requests.Session()
+        # symbol -> (monotonic fetch time, price dict)
+        self._price_cache = {}
+        self._price_lock = threading.Lock()
     
     def get_eth_balance(self, address: str) -> float:
         """
@@ -27,7 +103,7 @@ class Web3Helper:
         """
         try:
             # Convert to checksum address
-            checksum_address = self.w3.to_checksum_address(address)
+            checksum_address = _to_checksum(address.lower())
             # Get balance in Wei
             balance_wei = self.w3.eth.get_balance(checksum_address)
             # Convert to ETH
@@ -44,21 +120,17 @@ class Web3Helper:
             Dict with slow, average, fast gas prices
         """
         try:
-            # Get latest base fee
-            latest_block = self.w3.eth.get_block('latest')
-            base_fee = latest_block.get('baseFeePerGas', 0)
-            
-            # Get suggested priority fee
-            max_priority_fee = self.w3.eth.max_priority_fee
+            # One eth_feeHistory round-trip returns the base fee and the
+            # priority fees paid in the latest block at the 25th/50th/75th
+            # percentiles (slow/average/fast). baseFeePerGas ends with the
+            # next block's base fee, which is what a transaction sent now pays.
+            history = self.w3.eth.fee_history(1, 'latest', [25, 50, 75])
+            base_fee = history['baseFeePerGas'][-1]
+            slow_tip, average_tip, fast_tip = history['reward'][0]
             
-            # Calculate gas prices for different speeds
-            # Slow: base + (priority fee * 0.5) - cheaper, slower
-            # Average: base + suggested priority - normal speed
-            # Fast: base + (priority fee * 2.0) - more expensive, faster
-            
-            slow = self.w3.from_wei(base_fee + int(max_priority_fee * 0.5), 'gwei')
-            average = self.w3.from_wei(base_fee + max_priority_fee, 'gwei')
-            fast = self.w3.from_wei(base_fee + int(max_priority_fee * 2.0), 'gwei')
+            slow = self.w3.from_wei(base_fee + slow_tip, 'gwei')
+            average = self.w3.from_wei(base_fee + average_tip, 'gwei')
+            fast = self.w3.from_wei(base_fee + fast_tip, 'gwei')
             
             return {
                 'slow': float(slow),
@@ -69,6 +141,97 @@ class Web3Helper:
         except Exception as e:
             raise ValueError(f"Error fetching gas prices: {str(e)}")
     
+    def _coin_id(self, symbol: str) -> str:
+        """CoinGecko coin ID for a symbol."""
+        return self._SYMBOL_MAP.get(symbol.upper(), symbol.lower())
+    
+    def _price_params(self, symbols: list) -> dict:
+        """simple/price query parameters covering all symbols in one request."""
+        ids = ','.join(dict.fromkeys(self._coin_id(s) for s in symbols))
+        return {**self._BASE_PARAMS, 'ids': ids}
+    
+    def _parse_prices(self, symbols: list, data: dict) -> dict:
+        """
+        Price dicts keyed by upper-cased symbol from a simple/price
+        response, caching each one. Symbols CoinGecko does not know are
+        left out.
+        """
+        prices = {}
+        for symbol in symbols:
+            token_data = data.get(self._coin_id(symbol))
+            if token_data is None:
+                continue
+            prices[symbol.upper()] = self._store_price({
+                'symbol': symbol.upper(),
+                'price': token_data['usd'],
+                'change_24h': token_data.get('usd_24h_change', 0),
+                'market_cap': token_data.get('usd_market_cap', 0)
+            })
+        return prices
+    
+    def _split_cached(self, symbols: list) -> tuple:
+        """(cached price dicts, symbols that still need fetching)."""
+        prices = {}
+        misses = []
+        for symbol in dict.fromkeys(s.upper() for s in symbols):
+            cached = self._cached_price(symbol)
+            if cached is not None:
+                prices[symbol] = cached
+            else:
+                misses.append(symbol)
+        return prices, misses
+    
+    def _cached_price(self, symbol: str):
+        """Price dict for symbol if fetched within PRICE_CACHE_TTL, else None."""
+        with self._price_lock:
+            entry = self._price_cache.get(symbol.upper())
+        if entry is not None and time.monotonic() - entry[0] < PRICE_CACHE_TTL:
+            return entry[1]
+        return None
+    
+    def _store_price(self, price: dict) -> dict:
+        """Remember a freshly fetched price dict and return it."""
+        with self._price_lock:
+            self._price_cache[price['symbol']] = (time.monotonic(), price)
+        return price
+    
+    @staticmethod
+    def _pick(symbol: str, prices: dict) -> dict:
+        """The price dict for symbol from a get_token_prices() result."""
+        price = prices.get(symbol.upper())
+        if price is None:
+            raise ValueError(f"Token '{symbol}' not found")
+        return price
+    
+    def get_token_prices(self, symbols: list) -> dict:
+        """
+        Get prices for several tokens with one CoinGecko request.
+        
+        Symbols priced within the last PRICE_CACHE_TTL seconds are served
+        from cache; only the rest are fetched, batched into a single call.
+        
+        Args:
+            symbols: Token symbols (ETH, BTC, etc.)
+            
+        Returns:
+            Dict of upper-cased symbol -> price data; unknown tokens are omitted
+        """
+        prices, misses = self._split_cached(symbols)
+        if not misses:
+            return prices
+        
+        try:
+            response = self.session.get(
+                COINGECKO_PRICE_URL, params=self._price_params(misses), timeout=10
+            )
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+        except (requests.RequestException, ValueError) as e:
+            raise ValueError(f"Error fetching price data: {str(e)}")
+        
+        prices.update(self._parse_prices(misses, data))
+        return prices
+    
     def get_token_price(self, symbol: str) -> dict:
         """
         Get token price from CoinGecko API.
@@ -79,53 +242,57 @@ class Web3Helper:
         Returns:
             Dict with price data
         """
-        # Map common symbols to CoinGecko IDs
-        symbol_map = {
-            'ETH': 'ethereum',
-            'BTC': 'bitcoin',
-            'USDC': 'usd-coin',
-            'USDT': 'tether',
-            'DAI': 'dai',
-            'WETH': 'weth',
-            'UNI': 'uniswap',
-            'LINK': 'chainlink'
-        }
+        return self._pick(symbol, self.get_token_prices([symbol]))
+    
+    async def aget_token_prices(self, symbols: list) -> dict:
+        """
+        Async version of get_token_prices() on the shared keep-alive httpx.AsyncClient,
+        so handlers await the request instead of holding a worker thread.
         
-        symbol_upper = symbol.upper()
-        coin_id = symbol_map.get(symbol_upper, symbol.lower())
+        Args:
+            symbols: Token symbols (ETH, BTC, etc.)
+            
+        Returns:
+            Dict of upper-cased symbol -> price data; unknown tokens are omitted
+        """
+        prices, misses = self._split_cached(symbols)
+        if not misses:
+            return prices
         
         try:
-            url = f"https://api.coingecko.com/api/v3/simple/price"
-            params = {
-                'ids': coin_id,
-                'vs_currencies': 'usd',
-                'include_24hr_change': 'true',
-                'include_market_cap': 'true'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
+            # Process-wide client, pooled with the subgraph requests
+            response = await get_async_client().get(
+                COINGECKO_PRICE_URL, params=self._price_params(misses), timeout=10
+            )
             response.raise_for_status()
-            data = response.json()
-            
-            if coin_id not in data:
-                raise ValueError(f"Token '{symbol}' not found")
-            
-            token_data = data[coin_id]
-            
-            return {
-                'symbol': symbol_upper,
-                'price': token_data['usd'],
-                'change_24h': token_data.get('usd_24h_change', 0),
-                'market_cap': token_data.get('usd_market_cap', 0)
-            }
-            
-        except requests.RequestException as e:
+            data = orjson.loads(response.content)
+        except (httpx.HTTPError, ValueError) as e:
             raise ValueError(f"Error fetching price data: {str(e)}")
+        
+        prices.update(self._parse_prices(misses, data))
+        return prices
+    
+    async def aget_token_price(self, symbol: str) -> dict:
+        """
+        Async version of get_token_price().
+        
+        Args:
+            symbol: Token symbol (ETH, BTC, etc.)
+            
+        Returns:
+            Dict with price data
+        """
+        return self._pick(symbol, await self.aget_token_prices([symbol]))
     
     def is_valid_address(self, address: str) -> bool:
-        """Check if address is valid Ethereum address."""
+        """Check if address is valid Ethereum address (including its EIP-55 checksum if mixed-case)."""
         return self.w3.is_address(address)
     
+    @staticmethod
+    def is_valid_address_fast(address: str) -> bool:
+        """Check that address is 0x plus 40 hex digits, without verifying the checksum."""
+        return _ETH_ADDRESS_MATCH(address) is not None
+    
     def get_latest_block(self) -> int:
         """Get latest block number."""
         return self.w3.eth.block_number